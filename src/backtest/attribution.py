@@ -0,0 +1,199 @@
+"""
+PnL and inventory attribution of a backtest.
+
+Works on the fill log of a BacktestResult and the mid prices of the replayed
+day, marked the way run_backtest marks PnL (the last known mid). Per product:
+
+    pnl               cash + position * mid at the end of the day
+    spread_capture    sum over fills of signed quantity * (mid - fill price):
+                      the edge taken against the mid when trading
+    inventory_drift   sum over ticks of position held * mid change: what
+                      holding the inventory made or lost
+                      (pnl == spread_capture + inventory_drift)
+    realized          PnL of closed quantity against the average entry price
+    unrealized        position * (mid - average entry price) at the end
+                      (pnl == realized + unrealized)
+    max_drawdown      largest drop of the PnL curve from its running peak,
+                      with the ticks it took from peak to trough
+    time_long_limit / time_short_limit
+                      share of ticks ending at +limit / -limit
+
+Everything is over numpy arrays of the tick grid; only the average entry
+price walks the fills (a few hundred per day), so a day takes milliseconds.
+
+Usage:
+    python src/backtest/attribution.py src/round1/trading.py 1
+    python src/backtest/sweep.py src/round1/trading.py 1 --attribution
+"""
+import argparse
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from backtest import (DEFAULT_POSITION_LIMIT, POSITION_LIMITS, BacktestResult, DayData, load_day, load_trader,
+                      run_backtest)
+from matching import SUBMISSION
+from tickstore import available_days
+
+
+def mid_series(data: DayData, products: List[str], ticks: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Mid price per tick and product, carrying the last known mid over one-sided books (0 before the first).
+    """
+    timestamps = data.timestamps if ticks is None else data.timestamps[:ticks]
+    mids = {}
+    for product in products:
+        raw = np.array([_mid(data.books[timestamp].get(product)) for timestamp in timestamps], dtype=np.float64)
+        known = ~np.isnan(raw)
+        # Index of the last known mid at or before every tick
+        last = np.maximum.accumulate(np.where(known, np.arange(len(raw)), -1))
+        mids[product] = np.where(last >= 0, raw[np.maximum(last, 0)], 0.0)
+    return mids
+
+
+def _mid(book) -> float:
+    if book is None or book[2] is None:
+        return np.nan
+    return book[2]
+
+
+def _average_cost_pnl(quantities: np.ndarray, prices: np.ndarray):
+    """
+    (realized PnL, average entry price of the open position) after the fills, in order.
+    """
+    position = 0
+    average = 0.0
+    realized = 0.0
+    for quantity, price in zip(quantities.tolist(), prices.tolist()):
+        if position == 0 or (position > 0) == (quantity > 0):
+            average = (average * position + price * quantity) / (position + quantity)
+            position += quantity
+            continue
+        closed = min(abs(quantity), abs(position))
+        realized += closed * (price - average) * (1 if position > 0 else -1)
+        position += quantity
+        if position == 0:
+            average = 0.0
+        elif (position > 0) == (quantity > 0):
+            # Flipped through zero, the rest opens at the fill price
+            average = price
+    return realized, average
+
+
+def _drawdown(pnl: np.ndarray):
+    """
+    (max drawdown, ticks from the peak to the trough).
+    """
+    if len(pnl) == 0:
+        return 0.0, 0
+    peaks = np.maximum.accumulate(pnl)
+    drops = peaks - pnl
+    trough = int(np.argmax(drops))
+    if drops[trough] <= 0:
+        return 0.0, 0
+    peak = int(np.argmax(pnl[:trough + 1] == peaks[trough]))
+    return float(drops[trough]), trough - peak
+
+
+def attribute(result: BacktestResult, data: DayData, position_limits: Optional[Dict[str, int]] = None,
+              mids: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Attribution per product of a backtest over data, plus a "total" row summing the PnL terms
+    (its drawdown is the drawdown of the summed PnL curve). mids may pass the mid_series of
+    the day in, for callers attributing many backtests of the same day.
+    """
+    if position_limits is None:
+        position_limits = POSITION_LIMITS
+    timestamps = np.array(data.timestamps[:result.ticks], dtype=np.int64)
+    products = sorted(data.products)
+    if mids is None:
+        mids = mid_series(data, products, result.ticks)
+    else:
+        mids = {product: series[:result.ticks] for product, series in mids.items()}
+
+    fills_by_product = {product: [] for product in products}
+    for fill in result.fills:
+        quantity = fill.quantity if fill.buyer == SUBMISSION else -fill.quantity
+        fills_by_product.setdefault(fill.symbol, []).append((fill.timestamp, fill.price, quantity))
+
+    rows = {}
+    total_curve = np.zeros(len(timestamps))
+    for product in products:
+        mid = mids[product]
+        fills = np.array(fills_by_product[product], dtype=np.float64).reshape(-1, 3)
+        fill_ticks = np.searchsorted(timestamps, fills[:, 0].astype(np.int64))
+        prices = fills[:, 1]
+        quantities = fills[:, 2]
+
+        # Position and cash at the end of every tick
+        position = np.cumsum(np.bincount(fill_ticks, weights=quantities, minlength=len(timestamps)))
+        cash = np.cumsum(np.bincount(fill_ticks, weights=-prices * quantities, minlength=len(timestamps)))
+        curve = cash + position * mid
+        total_curve += curve
+
+        spread_capture = float(np.sum(quantities * (mid[fill_ticks] - prices)))
+        held = np.concatenate(([0.0], position[:-1]))
+        inventory_drift = float(np.sum(held[1:] * np.diff(mid)))
+
+        realized, average = _average_cost_pnl(quantities.astype(np.int64), prices)
+        final_position = float(position[-1]) if len(position) else 0.0
+        final_mid = float(mid[-1]) if len(mid) else 0.0
+        drawdown, drawdown_ticks = _drawdown(curve)
+        limit = position_limits.get(product, DEFAULT_POSITION_LIMIT)
+        ticks = max(1, len(timestamps))
+        rows[product] = {
+            "pnl": float(curve[-1]) if len(curve) else 0.0,
+            "spread_capture": spread_capture,
+            "inventory_drift": inventory_drift,
+            "realized": realized,
+            "unrealized": final_position * (final_mid - average) if final_position else 0.0,
+            "max_drawdown": drawdown,
+            "drawdown_ticks": drawdown_ticks,
+            "fills": len(quantities),
+            "volume": float(np.abs(quantities).sum()),
+            "final_position": final_position,
+            "time_long_limit": float(np.count_nonzero(position >= limit)) / ticks,
+            "time_short_limit": float(np.count_nonzero(position <= -limit)) / ticks,
+        }
+
+    total = {name: sum(row[name] for row in rows.values())
+             for name in ("pnl", "spread_capture", "inventory_drift", "realized", "unrealized", "fills", "volume")}
+    total["max_drawdown"], total["drawdown_ticks"] = _drawdown(total_curve)
+    rows["total"] = total
+    return rows
+
+
+def print_attribution(rows: Dict[str, Dict[str, float]]) -> None:
+    print(f"  {'product':<18} {'PnL':>10} {'spread':>10} {'drift':>10} {'realized':>10} {'unreal.':>10} "
+          f"{'max DD':>9} {'DD ticks':>8} {'@+lim':>6} {'@-lim':>6}")
+    for product, row in rows.items():
+        limits = ""
+        if "time_long_limit" in row:
+            limits = f" {row['time_long_limit']:>6.1%} {row['time_short_limit']:>6.1%}"
+        print(f"  {product:<18} {row['pnl']:>10,.1f} {row['spread_capture']:>10,.1f} "
+              f"{row['inventory_drift']:>10,.1f} {row['realized']:>10,.1f} {row['unrealized']:>10,.1f} "
+              f"{row['max_drawdown']:>9,.1f} {row['drawdown_ticks']:>8}" + limits)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backtest and attribute the PnL per product")
+    parser.add_argument("algorithm", help="path to the file defining Trader")
+    parser.add_argument("round", type=int)
+    parser.add_argument("days", type=int, nargs="*", help="days to replay (default: all)")
+    parser.add_argument("--max-ticks", type=int, default=None)
+    args = parser.parse_args()
+
+    trader_class = load_trader(args.algorithm)
+    for day in args.days or available_days(args.round):
+        data = load_day(args.round, day)
+        result = run_backtest(trader_class(), data, max_ticks=args.max_ticks)
+        start = time.perf_counter()
+        rows = attribute(result, data)
+        print(f"Round {args.round} day {day}: {result.ticks} ticks, attribution in "
+              f"{(time.perf_counter() - start) * 1000:.1f} ms")
+        print_attribution(rows)
+
+
+if __name__ == "__main__":
+    main()
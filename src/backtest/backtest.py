@@ -0,0 +1,464 @@
+"""
+Local backtester. Replays the prices_/trades_ CSVs of a round through a
+Trader tick by tick and reports the PnL per product.
+
+Usage:
+    python src/backtest/backtest.py src/round1/trading.py 1
+    python src/backtest/backtest.py src/round1/trading.py 1 -2 0 --print-output
+"""
+import argparse
+import csv
+import importlib.util
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DATA_DIR = os.path.join(ROOT, "data")
+COMMON_DIR = os.path.join(ROOT, "src", "common")
+
+# The submission platform puts datamodel next to the algorithm, mimic that.
+# The shared helpers in src/common get bundled with the algorithm the same way.
+for path in (DATA_DIR, COMMON_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# The backtester builds its objects from the slotted variant, attribute-compatible with datamodel
+from fastmodel import Listing, Observation, Trade, TradingState, order_depth_over, trades_from_columns
+from matching import FILL_MODELS, SUBMISSION, MatchingEngine, exceeds_limit
+from profiler import PhaseProfiler
+from shmserver import SharedBooks, SharedTrades, attach
+from tickstore import StoreDay, available_days, day_store_path, is_converted, prices_path, trades_path
+
+CURRENCY = "SEASHELLS"
+TICK = 100
+
+POSITION_LIMITS = {
+    "RAINFOREST_RESIN": 50,
+    "SQUID_INK": 50,
+    "KELP": 50,
+}
+DEFAULT_POSITION_LIMIT = 50
+
+
+class DayData:
+    """
+    Market data of a single day, grouped by tick.
+
+    books maps timestamp -> {product: (buy_orders, sell_orders, mid_price)}
+    where the order dicts follow the OrderDepth convention (sell volumes are
+    negative). trades maps timestamp -> list of market Trades.
+
+    run_backtest only needs round, day, products and ticks(), so streamed
+    days (stream.StreamedDay) replay the same way.
+    """
+
+    def __init__(self, round_num: int, day: int, products: List[str], timestamps: List[int],
+                 books: Dict[int, Dict[str, tuple]], trades: Dict[int, List[Trade]]) -> None:
+        self.round = round_num
+        self.day = day
+        self.products = products
+        self.timestamps = timestamps
+        self.books = books
+        self.trades = trades
+
+    def ticks(self, max_ticks: Optional[int] = None):
+        """
+        (timestamp, {product: (buy_orders, sell_orders, mid_price)}, [Trade]) per tick in order.
+        """
+        timestamps = self.timestamps if max_ticks is None else self.timestamps[:max_ticks]
+        for timestamp in timestamps:
+            yield timestamp, self.books[timestamp], self.trades.get(timestamp, ())
+
+
+def parse_price_row(row: List[str]):
+    """
+    (product, buy_orders, sell_orders, mid_price) of a prices CSV row.
+    """
+    buy_orders = {}
+    sell_orders = {}
+    # Three levels per side: (price, volume) pairs at columns 3-8 and 9-14
+    for i in (3, 5, 7):
+        if row[i]:
+            buy_orders[int(row[i])] = int(row[i + 1])
+    for i in (9, 11, 13):
+        if row[i]:
+            sell_orders[int(row[i])] = -int(row[i + 1])
+    mid_price = float(row[15]) if row[15] else None
+    return row[2], buy_orders, sell_orders, mid_price
+
+
+def parse_trade_row(row: List[str]) -> Trade:
+    return Trade(row[3], int(float(row[5])), int(row[6]), row[1], row[2], int(row[0]))
+
+
+def read_prices(path: str):
+    """
+    Parses a prices_round_R_day_D.csv file into (products, timestamps, books).
+    """
+    books: Dict[int, Dict[str, tuple]] = {}
+    products = set()
+    with open(path, newline="") as f:
+        reader = csv.reader(f, delimiter=";")
+        next(reader)
+        for row in reader:
+            timestamp = int(row[1])
+            product, buy_orders, sell_orders, mid_price = parse_price_row(row)
+            tick = books.get(timestamp)
+            if tick is None:
+                tick = books[timestamp] = {}
+            tick[product] = (buy_orders, sell_orders, mid_price)
+            products.add(product)
+    return sorted(products), sorted(books), books
+
+
+def read_trades(path: str) -> Dict[int, List[Trade]]:
+    """
+    Parses a trades_round_R_day_D.csv file into timestamp -> list of Trades.
+    """
+    trades: Dict[int, List[Trade]] = {}
+    if not os.path.exists(path):
+        return trades
+    with open(path, newline="") as f:
+        reader = csv.reader(f, delimiter=";")
+        next(reader)
+        for row in reader:
+            trade = parse_trade_row(row)
+            timestamp = trade.timestamp
+            tick = trades.get(timestamp)
+            if tick is None:
+                tick = trades[timestamp] = []
+            tick.append(trade)
+    return trades
+
+
+def day_data_from_store(store_day: StoreDay) -> DayData:
+    """
+    Builds a DayData from a converted day of the tick store.
+    """
+    books: Dict[int, Dict[str, tuple]] = {}
+    trades: Dict[int, List[Trade]] = {}
+    for product in store_day.products:
+        columns = store_day.prices(product)
+        levels = [(columns[f"bid_price_{i}"].tolist(), columns[f"bid_volume_{i}"].tolist(),
+                   columns[f"ask_price_{i}"].tolist(), columns[f"ask_volume_{i}"].tolist())
+                  for i in range(1, 4)]
+        mids = columns["mid_price"].tolist()
+        for row, timestamp in enumerate(columns["timestamp"].tolist()):
+            buy_orders = {}
+            sell_orders = {}
+            for bid_prices, bid_volumes, ask_prices, ask_volumes in levels:
+                if bid_prices[row]:
+                    buy_orders[bid_prices[row]] = bid_volumes[row]
+                if ask_prices[row]:
+                    sell_orders[ask_prices[row]] = -ask_volumes[row]
+            mid_price = mids[row]
+            tick = books.get(timestamp)
+            if tick is None:
+                tick = books[timestamp] = {}
+            tick[product] = (buy_orders, sell_orders, None if mid_price != mid_price else mid_price)
+
+        columns = store_day.trades(product)
+        traders = store_day.traders
+        for trade in trades_from_columns(
+                product, [int(price) for price in columns["price"].tolist()], columns["quantity"].tolist(),
+                [traders[buyer] for buyer in columns["buyer"].tolist()],
+                [traders[seller] for seller in columns["seller"].tolist()], columns["timestamp"].tolist()):
+            trades.setdefault(trade.timestamp, []).append(trade)
+
+    return DayData(store_day.round, store_day.day, sorted(store_day.products), sorted(books), books, trades)
+
+
+def shared_day_data(round_num: int, day: int) -> Optional[DayData]:
+    """
+    A DayData replaying the day straight from the block of the shared-memory server
+    (shmserver.py), without a private copy of the books and trades, or None if no server
+    publishes the day.
+    """
+    shared = attach(round_num, day)
+    if shared is None:
+        return None
+    return DayData(round_num, day, sorted(shared.products), shared.timestamps().tolist(), SharedBooks(shared),
+                   SharedTrades(shared))
+
+
+def load_day(round_num: int, day: int) -> DayData:
+    """
+    Loads a single day: shared_day_data if the shared-memory server
+    publishes it, from the tick store if it has been converted and from the
+    CSVs otherwise.
+    """
+    data = shared_day_data(round_num, day)
+    if data is not None:
+        return data
+    if is_converted(round_num, day):
+        return day_data_from_store(StoreDay(day_store_path(round_num, day)))
+    products, timestamps, books = read_prices(prices_path(round_num, day))
+    trades = read_trades(trades_path(round_num, day))
+    return DayData(round_num, day, products, timestamps, books, trades)
+
+
+def load_trader(path: str):
+    """
+    Imports an algorithm file and returns its Trader class.
+    """
+    path = os.path.abspath(path)
+    # Sibling modules of the algorithm must be importable, as on the platform
+    directory = os.path.dirname(path)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module.Trader
+
+
+class _NullWriter:
+    """
+    Swallows everything the trader prints, used when output is not wanted.
+    """
+
+    def write(self, text: str) -> int:
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+class BacktestResult:
+
+    def __init__(self, round_num: int, day: int, pnl: Dict[str, float], positions: Dict[str, int],
+                 fills: List[Trade], ticks: int, elapsed: float, rejected: int) -> None:
+        self.round = round_num
+        self.day = day
+        self.pnl = pnl
+        self.positions = positions
+        self.fills = fills
+        self.ticks = ticks
+        self.elapsed = elapsed
+        self.rejected = rejected
+
+    @property
+    def total_pnl(self) -> float:
+        return sum(self.pnl.values())
+
+
+def _copy_trades(trades: Dict[str, List[Trade]]) -> Dict[str, List[Trade]]:
+    return {product: [Trade(trade.symbol, trade.price, trade.quantity, trade.buyer, trade.seller, trade.timestamp)
+                      for trade in product_trades]
+            for product, product_trades in trades.items()}
+
+
+class ReplayState:
+    """
+    Everything run_backtest carries from one tick to the next, as it stands
+    before tick number `tick` of the day: positions, cash and last mid per
+    product, the own and market trades the next state shows and the traderData
+    the trader returned last. run_backtest(resume=...) continues from it.
+    """
+
+    __slots__ = ("tick", "position", "cash", "last_mid", "own_trades", "market_trades", "trader_data")
+
+    def __init__(self, tick: int, position: Dict[str, int], cash: Dict[str, float], last_mid: Dict[str, float],
+                 own_trades: Dict[str, List[Trade]], market_trades: Dict[str, List[Trade]],
+                 trader_data: str) -> None:
+        self.tick = tick
+        self.position = position
+        self.cash = cash
+        self.last_mid = last_mid
+        self.own_trades = own_trades
+        self.market_trades = market_trades
+        self.trader_data = trader_data
+
+
+def run_backtest(trader, data: DayData, position_limits: Optional[Dict[str, int]] = None,
+                 max_ticks: Optional[int] = None, output=None,
+                 profiler: Optional[PhaseProfiler] = None,
+                 engine: Optional[MatchingEngine] = None, resume: Optional[ReplayState] = None,
+                 checkpoint_every: Optional[int] = None,
+                 checkpoints: Optional[List[ReplayState]] = None,
+                 enforce_budgets: bool = False) -> BacktestResult:
+    """
+    Replays a day through trader.run and returns the resulting PnL.
+    Everything the trader prints goes to output (discarded if None).
+    With a profiler, every trader.run call is recorded as the "run()" phase.
+    Orders are filled by engine (default: MatchingEngine()).
+    A trader's StrategyExecutor (trader.executor) only reports overruns unless
+    enforce_budgets, so the result does not depend on the machine's load.
+
+    With resume, data holds the ticks from resume.tick on and the replay
+    continues from there (the trader only gets resume.trader_data to pick up
+    from). With checkpoint_every, the ReplayState before every tick number that
+    is a multiple of it is appended to checkpoints, also when the trader raises.
+    """
+    if position_limits is None:
+        position_limits = POSITION_LIMITS
+    if engine is None:
+        engine = MatchingEngine()
+    executor = getattr(trader, "executor", None)
+    if executor is not None:
+        executor.deterministic = not enforce_budgets
+    products = data.products
+    listings = {product: Listing(product, product, CURRENCY) for product in products}
+    observations = Observation({}, {})
+
+    position = {}
+    cash = {product: 0.0 for product in products}
+    last_mid = {product: 0.0 for product in products}
+    own_trades: Dict[str, List[Trade]] = {}
+    market_trades: Dict[str, List[Trade]] = {}
+    trader_data = ""
+    tick = 0
+    if resume is not None:
+        position = dict(resume.position)
+        cash.update(resume.cash)
+        last_mid.update(resume.last_mid)
+        for product in resume.cash:
+            listings.setdefault(product, Listing(product, product, CURRENCY))
+        own_trades = _copy_trades(resume.own_trades)
+        market_trades = _copy_trades(resume.market_trades)
+        trader_data = resume.trader_data
+        tick = resume.tick
+    all_fills = []
+    rejected = 0
+
+    ticks = 0
+    stdout = sys.stdout
+    sys.stdout = output if output is not None else _NullWriter()
+    start = time.perf_counter()
+    try:
+        for timestamp, books, trades in data.ticks(max_ticks):
+            if checkpoint_every and tick % checkpoint_every == 0 and ticks:
+                checkpoints.append(ReplayState(tick, dict(position), dict(cash), dict(last_mid),
+                                               _copy_trades(own_trades), _copy_trades(market_trades), trader_data))
+            ticks += 1
+            tick += 1
+            order_depths = {}
+            for product, (buy_orders, sell_orders, mid_price) in books.items():
+                if product not in listings:
+                    # Listed after the first tick (a streamed day only knows the products seen so far)
+                    listings[product] = Listing(product, product, CURRENCY)
+                    cash[product] = 0.0
+                    last_mid[product] = 0.0
+                # Copied on first read, so a trader changing its book cannot change the loaded data
+                order_depths[product] = order_depth_over(buy_orders, sell_orders)
+                if mid_price is not None:
+                    last_mid[product] = mid_price
+
+            state = TradingState(trader_data, timestamp, listings, order_depths, own_trades,
+                                 market_trades, dict(position), observations)
+            if profiler is None:
+                orders, _conversions, trader_data = trader.run(state)
+            else:
+                call_start = time.perf_counter_ns()
+                orders, _conversions, trader_data = trader.run(state)
+                profiler.stats("run()").record(time.perf_counter_ns() - call_start)
+
+            # Copy the market trades so matching does not eat into the loaded data
+            tick_trades: Dict[str, List[Trade]] = {}
+            for trade in trades:
+                tick_trades.setdefault(trade.symbol, []).append(
+                    Trade(trade.symbol, trade.price, trade.quantity, trade.buyer, trade.seller, trade.timestamp))
+
+            own_trades = {}
+            for product, product_orders in orders.items():
+                if not product_orders or product not in order_depths:
+                    continue
+                current = position.get(product, 0)
+                if exceeds_limit(product_orders, current, position_limits.get(product, DEFAULT_POSITION_LIMIT)):
+                    rejected += len(product_orders)
+                    continue
+                fills = engine.match(product_orders, order_depths[product], tick_trades.get(product, []), timestamp)
+                if not fills:
+                    continue
+                for fill in fills:
+                    if fill.buyer == SUBMISSION:
+                        current += fill.quantity
+                        cash[product] -= fill.price * fill.quantity
+                    else:
+                        current -= fill.quantity
+                        cash[product] += fill.price * fill.quantity
+                position[product] = current
+                own_trades[product] = fills
+                all_fills.extend(fills)
+
+            # Market trades the trader sees next tick are the ones we did not take
+            market_trades = {}
+            for product, product_trades in tick_trades.items():
+                left = [trade for trade in product_trades if trade.quantity > 0]
+                if left:
+                    market_trades[product] = left
+    finally:
+        sys.stdout = stdout
+    elapsed = time.perf_counter() - start
+
+    pnl = {product: cash[product] + position.get(product, 0) * last_mid[product] for product in sorted(cash)}
+    return BacktestResult(data.round, data.day, pnl, position, all_fills, ticks, elapsed, rejected)
+
+
+def print_results(results: List[BacktestResult]) -> None:
+    total = 0.0
+    for result in results:
+        print(f"Round {result.round} day {result.day}: {result.ticks} ticks in {result.elapsed:.2f}s, "
+              f"{len(result.fills)} fills, {result.rejected} rejected orders")
+        for product, pnl in sorted(result.pnl.items()):
+            print(f"  {product:<20} position {result.positions.get(product, 0):>4}  PnL {pnl:>12,.1f}")
+        print(f"  {'Total':<20} {'':>13}  PnL {result.total_pnl:>12,.1f}")
+        total += result.total_pnl
+    if len(results) > 1:
+        print(f"Total PnL {total:,.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay round data through a Trader")
+    parser.add_argument("algorithm", help="path to the file defining Trader")
+    parser.add_argument("round", type=int)
+    parser.add_argument("days", type=int, nargs="*", help="days to replay (default: all)")
+    parser.add_argument("--max-ticks", type=int, default=None, help="only replay the first N ticks of each day")
+    parser.add_argument("--print-output", action="store_true", help="show what the trader prints")
+    parser.add_argument("--fill-model", choices=FILL_MODELS, default="all",
+                        help="how resting orders fill against market trades")
+    parser.add_argument("--queue-position", action="store_true",
+                        help="queue resting orders behind the displayed volume at their price")
+    parser.add_argument("--fill-probability", type=float, default=0.5,
+                        help="with --fill-model probabilistic, chance a trade at our price fills us")
+    parser.add_argument("--profile", action="store_true", help="report per-phase latency of Trader.run")
+    parser.add_argument("--enforce-budgets", action="store_true",
+                        help="drop the orders of strategies over their time budget, as live (not reproducible)")
+    parser.add_argument("--histograms", action="store_true", help="with --profile, also print latency histograms")
+    args = parser.parse_args()
+
+    trader_class = load_trader(args.algorithm)
+    days = args.days or available_days(args.round)
+    results = []
+    for day in days:
+        data = load_day(args.round, day)
+        output = sys.stdout if args.print_output else None
+        trader = trader_class()
+        profiler = None
+        if args.profile:
+            profiler = PhaseProfiler(len(data.timestamps))
+            # Traders with phase hooks report their phases too, others only run()
+            if hasattr(trader, "profiler"):
+                trader.profiler = profiler
+        engine = MatchingEngine(args.fill_model, args.queue_position, args.fill_probability)
+        results.append(run_backtest(trader, data, max_ticks=args.max_ticks, output=output,
+                                    profiler=profiler, engine=engine, enforce_budgets=args.enforce_budgets))
+        if profiler is not None:
+            print(f"Round {args.round} day {day} Trader.run latency:")
+            print(profiler.report(args.histograms))
+            # Traders running their strategies through a StrategyExecutor also report those
+            executor = getattr(trader, "executor", None)
+            if executor is not None:
+                print(executor.report())
+            order_sizer = getattr(trader, "order_sizer", None)
+            if order_sizer is not None:
+                print(order_sizer.report())
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,524 @@
+"""
+Benchmarks.
+
+replay: every bundled day through each Trader (src/round1/trading.py and
+examples/tutorialAlg.py), one fresh process per (trader, day): ticks/sec,
+p50/p99 latency of a Trader.run call, peak RSS and the largest traderData.
+
+micro: per-call time of the indicator functions of the round 1 Trader
+(compute_pcr, compute_modified_rsi, calculate_volatility, get_mid_price)
+with all windows set to each of WINDOW_SIZES.
+
+codec: encode/decode time and payload size of the statecodec format
+against json and jsonpickle (as used by datamodel.py) for the same state.
+
+datamodel: per-tick construction time and allocated bytes of the backtester's
+TradingState, toJSON and Observation.__str__, official datamodel against the
+slotted fastmodel.
+
+Every run appends its results to a JSON history file and compares them with
+the previous entry; with --threshold 0.2 a metric 20% worse than last time is
+a regression and the exit status is 1.
+
+Usage:
+    python src/backtest/bench.py all
+    python src/backtest/bench.py replay --days 0 --threshold 0.2
+    python src/backtest/bench.py micro --no-history
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+from backtest import ROOT, load_day, load_trader, run_backtest
+import datamodel
+import fastmodel
+from profiler import PhaseProfiler
+from statecodec import pack_trader_state, unpack_trader_state
+from tickstore import available_days
+
+try:
+    import jsonpickle
+except ImportError:
+    jsonpickle = None
+
+ALGORITHM = os.path.join(ROOT, "src", "round1", "trading.py")
+REPLAY_ALGORITHMS = (ALGORITHM, os.path.join(ROOT, "examples", "tutorialAlg.py"))
+WINDOW_SIZES = (50, 500, 5000)
+MICRO_PRODUCT = "SQUID_INK"
+HISTORY_PATH = os.path.join(ROOT, "bench_history.json")
+DEFAULT_THRESHOLD = 0.25
+
+
+def time_call(function, repeat: int) -> float:
+    """
+    Mean wall time of function() in microseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def warm_trader(trader_class, round_num: int = 1, day: int = 0, ticks: int = 1000, configure=None):
+    """
+    A Trader that has seen the first ticks of a day, so its windows are full.
+    configure(trader) runs on the fresh Trader first.
+    """
+    trader = trader_class()
+    if configure is not None:
+        configure(trader)
+    run_backtest(trader, load_day(round_num, day), max_ticks=ticks)
+    return trader
+
+
+def trader_state_dict(trader, products) -> dict:
+    """
+    Exactly the state pack_trader_state packs, as plain JSON-able data.
+    """
+    state = {
+        "round": trader.round,
+        "cash": trader.cash,
+        "volatility": trader.volatility,
+        "last_high_volatility_tick": trader.last_high_volatility_tick,
+        "high_volatility_price": trader.high_volatility_price,
+        "high_volatility_direction": trader.high_volatility_direction,
+        "high_volatility_position": trader.high_volatility_position,
+        "ema_prices": {product: trader.ema_prices[product] for product in products},
+        "past_prices": {product: trader.indicators[product].history()
+                        for product in products if product in trader.indicators},
+    }
+    fair_values = getattr(trader, "fair_values", None)
+    if fair_values is not None:
+        state["fair_values"] = {}
+        for product in trader.fair_value_products():
+            model = fair_values.models[product]
+            state["fair_values"][product] = {
+                "mid": model.mid, "ema": model.ema, "fair": model.fair, "features": model.features,
+                "theta": model.rls.theta, "P": [row[i:] for i, row in enumerate(model.rls.P)],
+            }
+    trade_flow = getattr(trader, "trade_flow", None)
+    if trade_flow is not None:
+        state["trade_flow"] = {}
+        for product in trader.trade_flow_products():
+            flow = trade_flow.flows[product]
+            state["trade_flow"][product] = {
+                "window": flow.window, "ticks": flow.ticks, "mid": flow.mid, "last_price": flow.last_price,
+                "last_side": flow.last_side, "buy": flow.buy, "sell": flow.sell, "volume": flow.volume,
+                "trades": flow.trades, "notional": flow.notional,
+            }
+    return state
+
+
+def _use_every_model(trader) -> None:
+    fair_value = sys.modules[type(trader).__module__].FAIR_VALUE
+    for product in trader.fair_values.products:
+        trader.reference_price[product] = fair_value
+    trader.use_trade_flow = True
+
+
+def bench_codec(repeat: int = 2000) -> dict:
+    """
+    Per format, encode/decode time and size of the state of the round 1 Trader as configured
+    ("statecodec", "json", "jsonpickle") and with the fair value and trade flow models of every
+    product in use (the same with an "_all" suffix).
+    """
+    trader_class = load_trader(ALGORITHM)
+    products = sys.modules[trader_class.__module__].PRODUCTS
+    results = {}
+    for suffix, configure in (("", None), ("_all", _use_every_model)):
+        trader = warm_trader(trader_class, configure=configure)
+        state = trader_state_dict(trader, products)
+        packed = pack_trader_state(trader, products)
+        fresh = trader_class()
+        if configure is not None:
+            configure(fresh)
+        results["statecodec" + suffix] = {
+            "encode_us": time_call(lambda: pack_trader_state(trader, products), repeat),
+            "decode_us": time_call(lambda: unpack_trader_state(fresh, packed, products), repeat),
+            "bytes": len(packed),
+        }
+        encoded = json.dumps(state)
+        results["json" + suffix] = {
+            "encode_us": time_call(lambda: json.dumps(state), repeat),
+            "decode_us": time_call(lambda: json.loads(encoded), repeat),
+            "bytes": len(encoded),
+        }
+        if jsonpickle is not None:
+            encoded = jsonpickle.encode(state)
+            results["jsonpickle" + suffix] = {
+                "encode_us": time_call(lambda: jsonpickle.encode(state), repeat),
+                "decode_us": time_call(lambda: jsonpickle.decode(encoded), repeat),
+                "bytes": len(encoded),
+            }
+    return results
+
+
+def print_codec(results: dict) -> None:
+    print(f"{'format':<16} {'encode us':>10} {'decode us':>10} {'bytes':>8}")
+    for name, row in results.items():
+        print(f"{name:<16} {row['encode_us']:>10.1f} {row['decode_us']:>10.1f} {row['bytes']:>8}")
+    print("(statecodec decode includes restoring the Trader and refilling its indicators, json only parses)")
+
+
+class _TraderDataMeter:
+    """
+    Wraps a Trader and records the size of the traderData it returns.
+    """
+
+    def __init__(self, trader) -> None:
+        self.trader = trader
+        self.max_bytes = 0
+        self.last_bytes = 0
+
+    def run(self, state):
+        result = self.trader.run(state)
+        self.last_bytes = len(result[2].encode()) if result[2] else 0
+        if self.last_bytes > self.max_bytes:
+            self.max_bytes = self.last_bytes
+        return result
+
+
+def _replay_case(case) -> dict:
+    """
+    One (algorithm, round, day) replay, run in its own process so ru_maxrss is its own peak.
+    """
+    algorithm, round_num, day = case
+    trader_class = load_trader(algorithm)
+    data = load_day(round_num, day)
+    profiler = PhaseProfiler(len(data.timestamps))
+    meter = _TraderDataMeter(trader_class())
+    result = run_backtest(meter, data, profiler=profiler)
+    run_stats = profiler.summary()["run()"]
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        peak_rss *= 1024
+    return {
+        "ticks": result.ticks,
+        "ticks_per_sec": result.ticks / result.elapsed,
+        "run_mean_us": run_stats["mean_us"],
+        "run_p50_us": run_stats["p50_us"],
+        "run_p99_us": run_stats["p99_us"],
+        "peak_rss_mb": peak_rss / 2 ** 20,
+        "trader_data_max_bytes": meter.max_bytes,
+        "trader_data_last_bytes": meter.last_bytes,
+        "pnl": result.total_pnl,
+    }
+
+
+def bench_replay(round_num: int = 1, days: Optional[List[int]] = None, algorithms=REPLAY_ALGORITHMS) -> dict:
+    """
+    {algorithm name: {"day_<d>": metrics}} for every algorithm and day.
+    """
+    days = days or available_days(round_num)
+    cases = [(algorithm, round_num, day) for algorithm in algorithms for day in days]
+    # A fresh forked worker per case keeps the RSS of one replay out of the next
+    context = multiprocessing.get_context("fork")
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        rows = pool.map(_replay_case, cases, chunksize=1)
+    results = {}
+    for (algorithm, _, day), row in zip(cases, rows):
+        name = os.path.splitext(os.path.basename(algorithm))[0]
+        results.setdefault(name, {})[f"day_{day}"] = row
+    return results
+
+
+def print_replay(results: dict) -> None:
+    print(f"{'algorithm':<14} {'day':>6} {'ticks/s':>9} {'mean us':>9} {'p99 us':>9} {'RSS MB':>8} "
+          f"{'data B':>8} {'PnL':>12}")
+    for name, days in results.items():
+        for day, row in days.items():
+            print(f"{name:<14} {day[4:]:>6} {row['ticks_per_sec']:>9.0f} {row['run_mean_us']:>9.1f} "
+                  f"{row['run_p99_us']:>9.1f} {row['peak_rss_mb']:>8.1f} {row['trader_data_max_bytes']:>8} "
+                  f"{row['pnl']:>12,.1f}")
+
+
+def _tick_state(model, data, timestamp: int, listings, observations, trader_data: str = ""):
+    """
+    The TradingState the backtester builds for a tick, from the classes of model (datamodel or fastmodel).
+    """
+    order_depths = {}
+    for product, (buy_orders, sell_orders, _) in data.books[timestamp].items():
+        depth = model.OrderDepth()
+        depth.buy_orders = dict(buy_orders)
+        depth.sell_orders = dict(sell_orders)
+        order_depths[product] = depth
+    market_trades = {}
+    for trade in data.trades.get(timestamp, ()):
+        market_trades.setdefault(trade.symbol, []).append(
+            model.Trade(trade.symbol, trade.price, trade.quantity, trade.buyer, trade.seller, trade.timestamp))
+    return model.TradingState(trader_data, timestamp, listings, order_depths, {}, market_trades, {}, observations)
+
+
+def _fast_tick_state(data, timestamp: int, listings, observations, trader_data: str = ""):
+    """
+    _tick_state through the fastmodel construction path the backtester uses.
+    """
+    over = fastmodel.order_depth_over
+    trade_class = fastmodel.Trade
+    order_depths = {product: over(buy_orders, sell_orders)
+                    for product, (buy_orders, sell_orders, _) in data.books[timestamp].items()}
+    market_trades = {}
+    for trade in data.trades.get(timestamp, ()):
+        market_trades.setdefault(trade.symbol, []).append(
+            trade_class(trade.symbol, trade.price, trade.quantity, trade.buyer, trade.seller, trade.timestamp))
+    return fastmodel.TradingState(trader_data, timestamp, listings, order_depths, {}, market_trades, {},
+                                  observations)
+
+
+def _micro_states(data, count: int) -> List[fastmodel.TradingState]:
+    """
+    count TradingStates with the books of the first ticks of a day.
+    """
+    listings = {product: fastmodel.Listing(product, product, "SEASHELLS") for product in data.products}
+    observations = fastmodel.Observation({}, {})
+    return [_fast_tick_state(data, timestamp, listings, observations) for timestamp in data.timestamps[:count]]
+
+
+def bench_datamodel(round_num: int = 1, day: int = 0, ticks: int = 2000) -> dict:
+    """
+    {"official" / "fast": {"build_us", "build_bytes", "read_bytes", "to_json_us", "observation_str_us"}} per tick,
+    read_bytes being the allocation once every book of the state has been read.
+    """
+    data = load_day(round_num, day)
+    timestamps = data.timestamps[:ticks]
+    # A traderData of the size the round 1 Trader sends
+    trader_data = "A" * 1400
+    builders = {
+        "official": lambda timestamp, listings, observations: _tick_state(datamodel, data, timestamp, listings,
+                                                                          observations, trader_data),
+        "fast": lambda timestamp, listings, observations: _fast_tick_state(data, timestamp, listings,
+                                                                           observations, trader_data),
+    }
+    results = {}
+    for name, model in (("official", datamodel), ("fast", fastmodel)):
+        build = builders[name]
+        listings = {product: model.Listing(product, product, "SEASHELLS") for product in data.products}
+        observations = model.Observation({"SUNLIGHT": 2500}, {"ORCHIDS": model.ConversionObservation(
+            1000.5, 1002.0, 1.5, 9.5, -5.0, 200.0, 2500.0)})
+        start = time.perf_counter()
+        states = [build(timestamp, listings, observations) for timestamp in timestamps]
+        build_us = (time.perf_counter() - start) / len(timestamps) * 1e6
+        del states
+        tracemalloc.start()
+        states = [build(timestamp, listings, observations) for timestamp in timestamps]
+        build_bytes = tracemalloc.get_traced_memory()[0] / len(timestamps)
+        # A trader reading every book, which makes the fast model copy them
+        for state in states:
+            for depth in state.order_depths.values():
+                depth.buy_orders
+                depth.sell_orders
+        read_bytes = tracemalloc.get_traced_memory()[0] / len(timestamps)
+        tracemalloc.stop()
+        start = time.perf_counter()
+        for state in states:
+            state.toJSON()
+        to_json_us = (time.perf_counter() - start) / len(states) * 1e6
+        results[name] = {
+            "build_us": build_us,
+            "build_bytes": build_bytes,
+            "read_bytes": read_bytes,
+            "to_json_us": to_json_us,
+            "observation_str_us": time_call(lambda: str(observations), 200),
+        }
+    return results
+
+
+def print_datamodel(results: dict) -> None:
+    print(f"{'model':<10} {'build us':>9} {'bytes':>8} {'read bytes':>11} {'toJSON us':>10} {'obs str us':>11}")
+    for name, row in results.items():
+        print(f"{name:<10} {row['build_us']:>9.2f} {row['build_bytes']:>8.0f} {row['read_bytes']:>11.0f} "
+              f"{row['to_json_us']:>10.2f} {row['observation_str_us']:>11.2f}")
+
+
+def _call_stats(samples_ns: List[int]) -> dict:
+    samples_ns.sort()
+    return {
+        "mean_us": sum(samples_ns) / len(samples_ns) / 1000,
+        "p99_us": samples_ns[min(len(samples_ns) - 1, int(round(0.99 * (len(samples_ns) - 1))))] / 1000,
+    }
+
+
+def bench_micro(round_num: int = 1, day: int = 0, calls: int = 2000, window_sizes=WINDOW_SIZES) -> dict:
+    """
+    {function: {"window_<n>": {"mean_us", "p99_us"}}}. Each window size gets a
+    Trader with RSI, PCR and volatility windows set to n whose history is
+    filled first; then every timed tick appends one price and calls each
+    function once, so the running indicator state moves as it does in run().
+    """
+    trader_class = load_trader(ALGORITHM)
+    data = load_day(round_num, day)
+    states = _micro_states(data, max(window_sizes) + calls)
+    functions = ("compute_pcr", "compute_modified_rsi", "calculate_volatility", "get_mid_price")
+    results = {function: {} for function in functions}
+    clock = time.perf_counter_ns
+    for window in window_sizes:
+        trader = trader_class()
+        trader.RSI_WINDOW_TICKS = trader.PCR_WINDOW_TICKS = trader.volatility_window = window
+        product = MICRO_PRODUCT
+        for state in states[:window]:
+            trader.update_price_history(state.timestamp, trader.get_mid_price(product, state), product)
+
+        samples = {function: [] for function in functions}
+        for state in states[window:window + calls]:
+            timestamp = state.timestamp
+            start = clock()
+            price = trader.get_mid_price(product, state)
+            samples["get_mid_price"].append(clock() - start)
+            trader.update_price_history(timestamp, price, product)
+            start = clock()
+            trader.compute_pcr(timestamp, product)
+            samples["compute_pcr"].append(clock() - start)
+            start = clock()
+            trader.compute_modified_rsi(timestamp, price, product)
+            samples["compute_modified_rsi"].append(clock() - start)
+            start = clock()
+            trader.calculate_volatility(product, state)
+            samples["calculate_volatility"].append(clock() - start)
+        for function in functions:
+            results[function][f"window_{window}"] = _call_stats(samples[function])
+    return results
+
+
+def print_micro(results: dict) -> None:
+    windows = list(next(iter(results.values())))
+    print(f"{'function':<22}" + "".join(f" {window[7:] + ' mean/p99 us':>22}" for window in windows))
+    for function, rows in results.items():
+        print(f"{function:<22}" + "".join(
+            f" {rows[window]['mean_us']:>10.2f} /{rows[window]['p99_us']:>9.2f}" for window in windows))
+
+
+def flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    """
+    Nested results as {"suite.a.b.metric": value}, numbers only.
+    """
+    metrics = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            metrics.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[name] = value
+    return metrics
+
+
+def _higher_is_better(metric: str) -> bool:
+    return metric.endswith("_per_sec")
+
+
+def _compared(metric: str) -> bool:
+    # PnL and tick counts describe the run, they are not performance
+    return not metric.endswith((".pnl", ".ticks", "_last_bytes"))
+
+
+def regressions(previous: Dict[str, float], current: Dict[str, float], threshold: float) -> List[str]:
+    """
+    Descriptions of the metrics that got worse than previous by more than threshold (a fraction).
+    """
+    found = []
+    for metric, value in current.items():
+        old = previous.get(metric)
+        if old is None or not _compared(metric) or old <= 0:
+            continue
+        change = (value - old) / old
+        worse = -change if _higher_is_better(metric) else change
+        if worse > threshold:
+            found.append(f"{metric}: {old:.4g} -> {value:.4g} ({change:+.1%})")
+    return found
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path: str) -> List[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_history(path: str, history: List[dict]) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(history, file, indent=1)
+    os.replace(tmp_path, path)
+
+
+def previous_metrics(history: List[dict], metrics: Dict[str, float]) -> Dict[str, float]:
+    """
+    The latest recorded value of every metric, so runs of different suites compare against each other.
+    """
+    previous = {}
+    for entry in reversed(history):
+        for metric, value in entry["metrics"].items():
+            if metric in metrics and metric not in previous:
+                previous[metric] = value
+        if len(previous) == len(metrics):
+            break
+    return previous
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks")
+    parser.add_argument("suite", choices=["all", "replay", "micro", "codec", "datamodel"])
+    parser.add_argument("--round", type=int, default=1)
+    parser.add_argument("--days", type=int, nargs="*", help="days to replay (default: all)")
+    parser.add_argument("--calls", type=int, default=2000, help="timed calls per function and window size")
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--history", default=HISTORY_PATH, help="JSON file the results are appended to")
+    parser.add_argument("--no-history", action="store_true", help="do not read or write the history file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="fraction a metric may get worse than the previous run before it is a regression")
+    args = parser.parse_args()
+
+    results = {}
+    if args.suite in ("all", "replay"):
+        results["replay"] = bench_replay(args.round, args.days)
+        print_replay(results["replay"])
+    if args.suite in ("all", "micro"):
+        results["micro"] = bench_micro(args.round, calls=args.calls)
+        print_micro(results["micro"])
+    if args.suite in ("all", "codec"):
+        results["codec"] = bench_codec(args.repeat)
+        print_codec(results["codec"])
+    if args.suite in ("all", "datamodel"):
+        results["datamodel"] = bench_datamodel(args.round)
+        print_datamodel(results["datamodel"])
+
+    if args.no_history:
+        return
+    metrics = flatten(results)
+    history = load_history(args.history)
+    found = regressions(previous_metrics(history, metrics), metrics, args.threshold)
+    history.append({
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "suite": args.suite,
+        "metrics": metrics,
+    })
+    save_history(args.history, history)
+    print(f"Results appended to {args.history} ({len(history)} runs)")
+    if found:
+        print(f"{len(found)} regressions beyond {args.threshold:.0%}:")
+        for line in found:
+            print(f"  {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
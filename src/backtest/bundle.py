@@ -0,0 +1,420 @@
+"""
+Submission bundler: one self-contained file from a strategy and src/common.
+
+The platform takes a single file, with only datamodel importable next to it.
+The bundle is the strategy module with every `from <helper> import ...` of a
+src/common module replaced by the helper code it actually needs:
+
+  - tree shaking: starting from the names the strategy uses, only the
+    functions, classes and constants of the helpers reachable from them are
+    kept, together with the imports they use; everything else is dropped
+  - heavy imports (HEAVY_MODULES) only used inside functions are moved into
+    those functions, so importing the bundle does not pay for them
+  - docstrings are stripped unless --keep-docstrings, comments always go
+    (the code is regenerated from the syntax tree)
+  - datamodel stays an import, the platform provides it and passes its own
+    objects; --inline-datamodel inlines data/datamodel.py too, for running
+    the bundle without the repository
+
+The report gives the bundle size against --max-size and the sources it was
+built from, and the cold-start time of a fresh interpreter importing the
+bundle and building the Trader, next to the original module, plus the slowest
+imports. --check backtests bundle and original on the first ticks of a day and
+fails if the PnL differs.
+
+For src/round1/trading.py the bundle is 53,190 bytes against 78,365 for the
+strategy and the helpers it imports, mostly the docstrings and comments. It
+does not start measurably faster: 116-166 ms for either over six runs, the
+ranges overlapping, with 105-110 ms of it spent in the platform's datamodel
+importing jsonpickle, which the platform pays anyway. With --inline-datamodel
+the bundler defers that import into Observation.__str__ (its only user) and
+the bundle starts in 52-58 ms.
+data/datamodel.py itself is kept as the platform ships it.
+
+Usage:
+    python src/backtest/bundle.py src/round1/trading.py
+    python src/backtest/bundle.py src/round1/trading.py -o dist/round1.py --check 1000
+"""
+import argparse
+import ast
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Optional, Set, Tuple
+
+from backtest import COMMON_DIR, DATA_DIR, ROOT, load_day, load_trader, run_backtest
+from tickstore import available_days
+
+DIST_DIR = os.path.join(ROOT, "dist")
+# Upload limit of the platform is not published, stay well below what has been accepted
+DEFAULT_MAX_SIZE = 100_000
+HEAVY_MODULES = ("jsonpickle", "numpy", "pandas", "scipy", "statistics")
+COLD_START_RUNS = 5
+
+
+class BundleError(Exception):
+    pass
+
+
+class _Definition:
+    """
+    A top-level statement of a module, with the names it binds and the names it reads
+    (split into those read when the module runs and those only read inside functions).
+    """
+
+    def __init__(self, module: str, node: ast.stmt, binds: List[str]) -> None:
+        self.module = module
+        self.node = node
+        self.binds = binds
+        self.module_level: Set[str] = set()
+        self.in_functions: Set[str] = set()
+        _collect_names(node, self.module_level, self.in_functions)
+
+
+def _collect_names(node: ast.AST, module_level: Set[str], in_functions: Set[str]) -> None:
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+        # Decorators, defaults and annotations run at definition time, the body when called
+        for child in getattr(node, "decorator_list", []):
+            _collect_names(child, module_level, in_functions)
+        args = node.args
+        for child in [*args.defaults, *[d for d in args.kw_defaults if d is not None]]:
+            _collect_names(child, module_level, in_functions)
+        for arg in [*args.posonlyargs, *args.args, *args.kwonlyargs, args.vararg, args.kwarg]:
+            if arg is not None and arg.annotation is not None:
+                _collect_names(arg.annotation, module_level, in_functions)
+        if getattr(node, "returns", None) is not None:
+            _collect_names(node.returns, module_level, in_functions)
+        body = node.body if isinstance(node.body, list) else [node.body]
+        for child in body:
+            _collect_names(child, in_functions, in_functions)
+        return
+    if isinstance(node, ast.Name):
+        module_level.add(node.id)
+    for child in ast.iter_child_nodes(node):
+        _collect_names(child, module_level, in_functions)
+
+
+def _bound_names(node: ast.stmt) -> List[str]:
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return [node.name]
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        return [alias.asname or alias.name.split(".")[0] for alias in node.names]
+    targets = []
+    if isinstance(node, ast.Assign):
+        targets = node.targets
+    elif isinstance(node, (ast.AnnAssign, ast.AugAssign)):
+        targets = [node.target]
+    names = []
+    for target in targets:
+        for child in ast.walk(target):
+            if isinstance(child, ast.Name):
+                names.append(child.id)
+    return names
+
+
+def _is_docstring(node: ast.stmt) -> bool:
+    return isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)
+
+
+def _is_main_guard(node: ast.stmt) -> bool:
+    return (isinstance(node, ast.If) and isinstance(node.test, ast.Compare)
+            and isinstance(node.test.left, ast.Name) and node.test.left.id == "__name__")
+
+
+class Bundler:
+
+    def __init__(self, strategy_path: str, inline_datamodel: bool = False, keep_docstrings: bool = False) -> None:
+        self.strategy_path = os.path.abspath(strategy_path)
+        self.search_path = [COMMON_DIR] + ([DATA_DIR] if inline_datamodel else [])
+        self.keep_docstrings = keep_docstrings
+        # module -> its definitions, and (module, name) -> (source module, name) for local from-imports
+        self.definitions: Dict[str, List[_Definition]] = {}
+        self.local_imports: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        self.order: List[str] = []
+        self.strategy = "__strategy__"
+
+    def source_paths(self) -> List[str]:
+        """
+        The strategy and every module bundled into it, once build() or shake() ran.
+        """
+        return [self.strategy_path if module == self.strategy else self._module_path(module)
+                for module in self.order]
+
+    def _module_path(self, name: str) -> Optional[str]:
+        for directory in self.search_path:
+            path = os.path.join(directory, name + ".py")
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _load(self, module: str, path: str) -> None:
+        if module in self.definitions:
+            return
+        self.definitions[module] = []
+        with open(path) as f:
+            tree = ast.parse(f.read(), path)
+        for node in tree.body:
+            if _is_docstring(node) or _is_main_guard(node):
+                continue
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    if self._module_path(alias.name) is not None:
+                        raise BundleError(f"{path}: 'import {alias.name}' of a bundled module, "
+                                          f"use 'from {alias.name} import ...'")
+            if isinstance(node, ast.ImportFrom) and node.level == 0 and self._module_path(node.module):
+                self._load(node.module, self._module_path(node.module))
+                for alias in node.names:
+                    self.local_imports[(module, alias.asname or alias.name)] = (node.module, alias.name)
+                continue
+            self.definitions[module].append(_Definition(module, node, _bound_names(node)))
+        # Dependencies first
+        self.order.append(module)
+
+    def _providers(self, module: str, name: str) -> List[Tuple[str, _Definition]]:
+        source = self.local_imports.get((module, name))
+        if source is not None:
+            return self._providers(*source)
+        return [(module, definition) for definition in self.definitions.get(module, ())
+                if name in definition.binds]
+
+    def shake(self) -> Dict[str, List[_Definition]]:
+        """
+        The definitions of every module reachable from the strategy, in module order.
+        """
+        self._load(self.strategy, self.strategy_path)
+        kept: Set[int] = set()
+        work = [(self.strategy, definition) for definition in self.definitions[self.strategy]]
+        while work:
+            module, definition = work.pop()
+            if id(definition) in kept:
+                continue
+            kept.add(id(definition))
+            for name in definition.module_level | definition.in_functions:
+                work.extend(self._providers(module, name))
+        shaken = {module: [definition for definition in self.definitions[module] if id(definition) in kept]
+                  for module in self.order}
+        self._check_collisions(shaken)
+        return shaken
+
+    def _check_collisions(self, shaken: Dict[str, List[_Definition]]) -> None:
+        owners: Dict[str, str] = {}
+        for module, definitions in shaken.items():
+            for definition in definitions:
+                if isinstance(definition.node, (ast.Import, ast.ImportFrom)):
+                    continue
+                for name in definition.binds:
+                    owner = owners.setdefault(name, module)
+                    if owner != module:
+                        raise BundleError(f"'{name}' is defined in both {owner} and {module}, rename one")
+
+    def _heavy_names(self, shaken: Dict[str, List[_Definition]]) -> Dict[str, ast.stmt]:
+        """
+        Names bound by heavy imports that no kept code reads at module level, with their import.
+        """
+        heavy = {}
+        for definitions in shaken.values():
+            for definition in definitions:
+                node = definition.node
+                if isinstance(node, ast.Import):
+                    modules = [alias.name for alias in node.names]
+                elif isinstance(node, ast.ImportFrom):
+                    modules = [node.module or ""]
+                else:
+                    continue
+                if any(module.split(".")[0] in HEAVY_MODULES for module in modules):
+                    for name in definition.binds:
+                        heavy[name] = node
+        for definitions in shaken.values():
+            for definition in definitions:
+                for name in definition.module_level:
+                    heavy.pop(name, None)
+        return heavy
+
+    def build(self) -> str:
+        shaken = self.shake()
+        heavy = self._heavy_names(shaken)
+        used = {name for definitions in shaken.values() for definition in definitions
+                for name in definition.module_level | definition.in_functions}
+        # Plain imports, and the names imported from every module, merged across the bundled modules
+        imports: List[str] = []
+        from_imports: Dict[str, List[str]] = {}
+        bodies: List[str] = []
+        for module, definitions in shaken.items():
+            source = self.strategy_path if module == self.strategy else self._module_path(module)
+            code = []
+            for definition in definitions:
+                node = definition.node
+                if isinstance(node, (ast.Import, ast.ImportFrom)):
+                    for alias, name in zip(node.names, definition.binds):
+                        if name in heavy or name not in used:
+                            continue
+                        if isinstance(node, ast.Import):
+                            line = ast.unparse(ast.Import(names=[alias]))
+                            if line not in imports:
+                                imports.append(line)
+                            continue
+                        names = from_imports.setdefault("." * node.level + (node.module or ""), [])
+                        imported = ast.unparse(alias)
+                        if imported not in names:
+                            names.append(imported)
+                    continue
+                node = _DeferImports(heavy).visit(node)
+                if not self.keep_docstrings:
+                    _strip_docstrings(node)
+                code.append(ast.unparse(ast.fix_missing_locations(node)))
+            if code:
+                bodies.append(f"# --- {os.path.relpath(source, ROOT)} ---\n" + "\n\n".join(code))
+        imports.extend(f"from {module} import {', '.join(names)}" for module, names in from_imports.items())
+        header = (f"# Bundled from {os.path.relpath(self.strategy_path, ROOT)} by src/backtest/bundle.py,"
+                  f" do not edit\n")
+        return header + "\n".join(imports) + "\n\n" + "\n\n\n".join(bodies) + "\n"
+
+
+class _DeferImports(ast.NodeTransformer):
+    """
+    Puts the import of every heavy name a function reads at the top of that function.
+    """
+
+    def __init__(self, heavy: Dict[str, ast.stmt]) -> None:
+        self.heavy = heavy
+
+    def visit_FunctionDef(self, node):
+        self.generic_visit(node)
+        used = {child.id for child in ast.walk(node) if isinstance(child, ast.Name)}
+        imports = []
+        for name, statement in self.heavy.items():
+            if name in used and statement not in imports:
+                imports.append(statement)
+        if imports:
+            at = 1 if node.body and _is_docstring(node.body[0]) else 0
+            node.body[at:at] = [ast.parse(ast.unparse(statement)).body[0] for statement in imports]
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+
+def _strip_docstrings(node: ast.AST) -> None:
+    for child in ast.walk(node):
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and child.body:
+            if _is_docstring(child.body[0]):
+                child.body = child.body[1:] or [ast.Pass()]
+
+
+def _stage(files: List[str], directory: str) -> None:
+    for path in files:
+        shutil.copy(path, directory)
+
+
+def _run_fresh(files: List[str], script: str, *options: str) -> subprocess.CompletedProcess:
+    """
+    Runs script in a fresh interpreter that finds files in a directory of their own, without
+    bytecode caches, so they get compiled from source as on a first import.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        _stage(files, directory)
+        script = f"import sys\nsys.path.insert(0, {directory!r})\n" + script
+        env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+        return subprocess.run([sys.executable, *options, "-c", script], capture_output=True, text=True,
+                              check=True, env=env)
+
+
+def cold_start(module: str, files: List[str], runs: int = COLD_START_RUNS) -> float:
+    """
+    Median seconds for a fresh interpreter to import module (one of files) and build its Trader.
+    """
+    script = ("import time\n"
+              "start = time.perf_counter()\n"
+              f"import {module}\n"
+              f"{module}.Trader()\n"
+              "print(time.perf_counter() - start)\n")
+    times = [float(_run_fresh(files, script).stdout.strip().splitlines()[-1]) for _ in range(runs)]
+    return sorted(times)[len(times) // 2]
+
+
+def slowest_imports(module: str, files: List[str], count: int = 5) -> List[Tuple[int, str]]:
+    """
+    (cumulative microseconds, name) of module itself and of the slowest imports it makes, per -X importtime.
+    """
+    output = _run_fresh(files, f"import {module}\n", "-X", "importtime")
+    children: List[Tuple[int, str]] = []
+    for line in output.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self, cumulative, name = line[len("import time:"):].split("|")
+        # One leading space, then two more per level of nesting
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if depth == 1:
+            children.append((int(cumulative), name))
+        elif depth == 0:
+            # Nested imports are printed before the module importing them
+            if name == module:
+                return [(int(cumulative), name)] + sorted(children, reverse=True)[:count]
+            children = []
+    return []
+
+
+def check(strategy_path: str, bundle_path: str, round_num: int, ticks: int) -> Tuple[float, float]:
+    day = available_days(round_num)[0]
+    data = load_day(round_num, day)
+    original = run_backtest(load_trader(strategy_path)(), data, max_ticks=ticks).total_pnl
+    bundled = run_backtest(load_trader(bundle_path)(), data, max_ticks=ticks).total_pnl
+    return original, bundled
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bundle a strategy and its src/common helpers into one file")
+    parser.add_argument("strategy", help="path to the file defining Trader")
+    parser.add_argument("-o", "--output", help="bundle path (default: dist/<round dir>_<name>.py)")
+    parser.add_argument("--inline-datamodel", action="store_true", help="inline data/datamodel.py as well")
+    parser.add_argument("--keep-docstrings", action="store_true")
+    parser.add_argument("--max-size", type=int, default=DEFAULT_MAX_SIZE, help="warn above this many bytes")
+    parser.add_argument("--check", type=int, metavar="TICKS", default=0,
+                        help="backtest bundle and original on the first TICKS ticks of round --round")
+    parser.add_argument("--round", type=int, default=1, help="round whose data --check replays")
+    args = parser.parse_args()
+
+    strategy = os.path.abspath(args.strategy)
+    output = args.output
+    if output is None:
+        name = os.path.splitext(os.path.basename(strategy))[0]
+        output = os.path.join(DIST_DIR, f"{os.path.basename(os.path.dirname(strategy))}_{name}.py")
+    bundler = Bundler(strategy, args.inline_datamodel, args.keep_docstrings)
+    try:
+        source = bundler.build()
+    except BundleError as e:
+        sys.exit(f"bundle: {e}")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        f.write(source)
+
+    size = len(source.encode())
+    sources = bundler.source_paths()
+    sources_size = sum(os.path.getsize(path) for path in sources)
+    print(f"{os.path.relpath(output)}: {size:,} bytes ({size / args.max_size:.0%} of {args.max_size:,}), "
+          f"built from {len(sources)} files of {sources_size:,} bytes")
+    if size > args.max_size:
+        print(f"  over --max-size by {size - args.max_size:,} bytes")
+
+    platform = [] if args.inline_datamodel else [os.path.join(DATA_DIR, "datamodel.py")]
+    bundle_module = os.path.splitext(os.path.basename(output))[0]
+    strategy_module = os.path.splitext(os.path.basename(strategy))[0]
+    helpers = [os.path.join(COMMON_DIR, name) for name in sorted(os.listdir(COMMON_DIR)) if name.endswith(".py")]
+    bundled = cold_start(bundle_module, [output, *platform])
+    original = cold_start(strategy_module, [strategy, *helpers, os.path.join(DATA_DIR, "datamodel.py")])
+    print(f"cold start (compile, import, Trader()): bundle {bundled * 1000:.1f} ms, "
+          f"original {original * 1000:.1f} ms")
+    for cumulative, module in slowest_imports(bundle_module, [output, *platform]):
+        print(f"  {cumulative / 1000:>8.1f} ms  {module}")
+
+    if args.check:
+        original_pnl, bundled_pnl = check(strategy, output, args.round, args.check)
+        print(f"check over {args.check} ticks: original PnL {original_pnl:,.1f}, bundle {bundled_pnl:,.1f}")
+        if original_pnl != bundled_pnl:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Offline fit of the fair value model (src/common/fairvalue.py) on the CSVs.
+
+Builds the exact feature rows the online model sees in Trader.run (market
+trades of a tick are only seen on the next one, as in the backtester), solves
+the least squares fit over all given days and prints the coefficients to
+paste into FAIR_VALUE_COEFFICIENTS of the algorithm. With several days it also
+reports the leave-one-day-out error, and for every day the error of the online
+model started cold and warm, against quoting the mid itself.
+
+Usage:
+    python src/backtest/fairvalue_fit.py 1
+    python src/backtest/fairvalue_fit.py 1 --days -2 0 --products KELP
+"""
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backtest import DayData, load_day
+from book import BookSnapshot
+from fairvalue import FEATURES, FairValueModel
+from fastmodel import OrderDepth
+from tickstore import available_days
+
+DEFAULT_PRODUCTS = ("KELP", "SQUID_INK")
+RIDGE = 1e-6
+
+
+def _book(buy_orders, sell_orders) -> BookSnapshot:
+    return BookSnapshot(OrderDepth.of(buy_orders, sell_orders))
+
+
+def _product_trades(data: DayData, timestamp: Optional[int], product: str) -> list:
+    if timestamp is None:
+        return []
+    return [trade for trade in data.trades.get(timestamp, ()) if trade.symbol == product]
+
+
+def feature_rows(data: DayData, product: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (X, y): the features of every tick with a two-sided book and the mid move to the next such tick.
+    """
+    model = FairValueModel([product])
+    state = model.models[product]
+    rows = []
+    targets = []
+    previous_timestamp = None
+    previous_x = None
+    for timestamp in data.timestamps:
+        book_row = data.books[timestamp].get(product)
+        book = _book(book_row[0], book_row[1]) if book_row is not None else None
+        previous_mid = state.mid
+        x, mid = model.features(state, book, _product_trades(data, previous_timestamp, product))
+        previous_timestamp = timestamp
+        if x is None:
+            continue
+        if previous_x is not None:
+            rows.append(previous_x)
+            targets.append(mid - previous_mid)
+        previous_x = x
+        state.mid = mid
+    return np.array(rows, dtype=np.float64).reshape(-1, len(FEATURES)), np.array(targets, dtype=np.float64)
+
+
+def fit(X: np.ndarray, y: np.ndarray, ridge: float = RIDGE) -> np.ndarray:
+    """
+    Least squares coefficients with a tiny ridge term so constant features cannot make it singular.
+    """
+    return np.linalg.solve(X.T @ X + ridge * len(y) * np.eye(X.shape[1]), X.T @ y)
+
+
+def online_error(data: DayData, product: str, coefficients=None) -> float:
+    """
+    Mean squared error of the online model's fair value against the next mid over a day.
+    """
+    model = FairValueModel([product], {product: coefficients} if coefficients is not None else None)
+    errors = []
+    fair = None
+    previous_timestamp = None
+    for timestamp in data.timestamps:
+        book_row = data.books[timestamp].get(product)
+        book = _book(book_row[0], book_row[1]) if book_row is not None else None
+        mid = book.mid if book is not None else None
+        if mid is not None and fair is not None:
+            errors.append((mid - fair) ** 2)
+        fair = model.update(product, book, _product_trades(data, previous_timestamp, product))
+        previous_timestamp = timestamp
+    return float(np.mean(errors)) if errors else float("nan")
+
+
+def report(days: Dict[int, DayData], product: str) -> List[float]:
+    rows = {day: feature_rows(data, product) for day, data in days.items()}
+    X = np.concatenate([X for X, _ in rows.values()])
+    y = np.concatenate([y for _, y in rows.values()])
+    coefficients = fit(X, y)
+    print(f"{product}: {len(y)} ticks, mid move variance {np.var(y):.4f}, "
+          f"in-sample MSE {np.mean((X @ coefficients - y) ** 2):.4f}")
+    for name, value in zip(FEATURES, coefficients):
+        print(f"  {name:<12} {value:+.6f}")
+    if len(rows) > 1:
+        for day, (X_test, y_test) in rows.items():
+            X_train = np.concatenate([X for other, (X, _) in rows.items() if other != day])
+            y_train = np.concatenate([y for other, (_, y) in rows.items() if other != day])
+            held_out = np.mean((X_test @ fit(X_train, y_train) - y_test) ** 2)
+            print(f"  day {day:>3} held out: MSE {held_out:.4f} vs {np.mean(y_test ** 2):.4f} quoting the mid")
+    for day, data in days.items():
+        print(f"  day {day:>3} online: cold MSE {online_error(data, product):.4f}, "
+              f"warm MSE {online_error(data, product, coefficients.tolist()):.4f}")
+    return coefficients.tolist()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fit the fair value model offline")
+    parser.add_argument("round", type=int)
+    parser.add_argument("--days", type=int, nargs="*", help="days to fit on (default: all)")
+    parser.add_argument("--products", nargs="*", default=list(DEFAULT_PRODUCTS))
+    args = parser.parse_args()
+
+    days = {day: load_day(args.round, day) for day in (args.days or available_days(args.round))}
+    coefficients = {product: report(days, product) for product in args.products}
+    print("FAIR_VALUE_COEFFICIENTS = {")
+    for product, values in coefficients.items():
+        print(f"    {product}: ({', '.join(f'{value:.6g}' for value in values)}),")
+    print("}")
+
+
+if __name__ == "__main__":
+    main()
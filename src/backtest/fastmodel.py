@@ -0,0 +1,302 @@
+"""
+Slotted, allocation-light variant of data/datamodel.py for the backtester.
+
+Same classes, constructor signatures, attributes and string forms as the
+official datamodel, so a Trader written against it runs unchanged on these
+objects; only isinstance checks against datamodel classes would tell them
+apart. Differences are all on the cost side:
+
+  - __slots__ everywhere, no per-instance __dict__
+  - OrderDepth.of / order_depths_from_rows / trades_from_columns build a
+    tick's objects straight from dicts or array rows, without the empty dicts
+    the official OrderDepth() allocates only to have them replaced
+  - order_depth_over hands out the loaded book of a tick and only copies a
+    side when it is first read, so books nobody looks at cost no dicts
+  - Observation.__str__ produces jsonpickle's output without jsonpickle
+
+Two things it does not speed up much:
+
+  - TradingState.toJSON builds plain dicts of the known classes and runs a
+    single sort_keys encoder over them, instead of json.dumps with a default=
+    callback per object. The output is byte-identical, but the stdlib
+    encoder still does all the work, so it costs about what the official one
+    does (bench.py datamodel: 46-63 us per tick against 66-84 us). A
+    hand-written writer measured no faster (55 us against 56 us) and was
+    dropped.
+  - Allocation is cut only for the books nobody reads: a tick allocates
+    843 bytes against 2,349, but a Trader that reads every book side gets
+    its own copies and brings it back to 2,187.
+"""
+import json
+from typing import Dict, List, Sequence
+
+Time = int
+Symbol = str
+Product = str
+Position = int
+UserId = str
+ObservationValue = int
+
+_encode_sorted = json.JSONEncoder(sort_keys=True).encode
+_encode = json.JSONEncoder().encode
+
+# Attributes of ConversionObservation in constructor order, as jsonpickle writes them
+_CONVERSION_FIELDS = ("bidPrice", "askPrice", "transportFees", "exportTariff", "importTariff", "sugarPrice",
+                      "sunlightIndex")
+
+
+class Listing:
+
+    __slots__ = ("symbol", "product", "denomination")
+
+    def __init__(self, symbol: Symbol, product: Product, denomination: Product):
+        self.symbol = symbol
+        self.product = product
+        self.denomination = denomination
+
+    def _plain(self) -> dict:
+        return {"symbol": self.symbol, "product": self.product, "denomination": self.denomination}
+
+
+class ConversionObservation:
+
+    __slots__ = _CONVERSION_FIELDS
+
+    def __init__(self, bidPrice: float, askPrice: float, transportFees: float, exportTariff: float,
+                 importTariff: float, sugarPrice: float, sunlightIndex: float):
+        self.bidPrice = bidPrice
+        self.askPrice = askPrice
+        self.transportFees = transportFees
+        self.exportTariff = exportTariff
+        self.importTariff = importTariff
+        self.sugarPrice = sugarPrice
+        self.sunlightIndex = sunlightIndex
+
+    def _plain(self) -> dict:
+        return {field: getattr(self, field) for field in _CONVERSION_FIELDS}
+
+
+class Observation:
+
+    __slots__ = ("plainValueObservations", "conversionObservations")
+
+    def __init__(self, plainValueObservations: Dict[Product, ObservationValue],
+                 conversionObservations: Dict[Product, ConversionObservation]) -> None:
+        self.plainValueObservations = plainValueObservations
+        self.conversionObservations = conversionObservations
+
+    def __str__(self) -> str:
+        conversions = {product: {"py/object": "datamodel.ConversionObservation", **observation._plain()}
+                       for product, observation in self.conversionObservations.items()}
+        return ("(plainValueObservations: " + _encode(self.plainValueObservations)
+                + ", conversionObservations: " + _encode(conversions) + ")")
+
+    def _plain(self) -> dict:
+        return {
+            "plainValueObservations": self.plainValueObservations,
+            "conversionObservations": {product: observation._plain()
+                                       for product, observation in self.conversionObservations.items()},
+        }
+
+
+class Order:
+
+    __slots__ = ("symbol", "price", "quantity")
+
+    def __init__(self, symbol: Symbol, price: int, quantity: int) -> None:
+        self.symbol = symbol
+        self.price = price
+        self.quantity = quantity
+
+    def __str__(self) -> str:
+        return "(" + self.symbol + ", " + str(self.price) + ", " + str(self.quantity) + ")"
+
+    def __repr__(self) -> str:
+        return "(" + self.symbol + ", " + str(self.price) + ", " + str(self.quantity) + ")"
+
+
+class OrderDepth:
+
+    __slots__ = ("buy_orders", "sell_orders")
+
+    def __init__(self):
+        self.buy_orders: Dict[int, int] = {}
+        self.sell_orders: Dict[int, int] = {}
+
+    @classmethod
+    def of(cls, buy_orders: Dict[int, int], sell_orders: Dict[int, int]) -> "OrderDepth":
+        """
+        An OrderDepth holding the given dicts (not copied), sell volumes negative.
+        """
+        depth = object.__new__(cls)
+        depth.buy_orders = buy_orders
+        depth.sell_orders = sell_orders
+        return depth
+
+    def _plain(self) -> dict:
+        return {"buy_orders": self.buy_orders, "sell_orders": self.sell_orders}
+
+
+_BUY_ORDERS = OrderDepth.buy_orders
+_SELL_ORDERS = OrderDepth.sell_orders
+
+
+class _CopyOnReadOrderDepth(OrderDepth):
+    """
+    OrderDepth over shared book dicts that copies each side the first time it is read,
+    so changing it cannot change the shared dicts and a side nobody reads is never copied.
+    """
+
+    __slots__ = ("_buy_source", "_sell_source")
+
+    @property
+    def buy_orders(self) -> Dict[int, int]:
+        try:
+            return _BUY_ORDERS.__get__(self)
+        except AttributeError:
+            orders = dict(self._buy_source)
+            _BUY_ORDERS.__set__(self, orders)
+            return orders
+
+    @buy_orders.setter
+    def buy_orders(self, orders: Dict[int, int]) -> None:
+        _BUY_ORDERS.__set__(self, orders)
+
+    @property
+    def sell_orders(self) -> Dict[int, int]:
+        try:
+            return _SELL_ORDERS.__get__(self)
+        except AttributeError:
+            orders = dict(self._sell_source)
+            _SELL_ORDERS.__set__(self, orders)
+            return orders
+
+    @sell_orders.setter
+    def sell_orders(self, orders: Dict[int, int]) -> None:
+        _SELL_ORDERS.__set__(self, orders)
+
+
+def order_depth_over(buy_orders: Dict[int, int], sell_orders: Dict[int, int]) -> OrderDepth:
+    """
+    An OrderDepth reading the given dicts, copied on first access of each side (see _CopyOnReadOrderDepth).
+    """
+    depth = object.__new__(_CopyOnReadOrderDepth)
+    depth._buy_source = buy_orders
+    depth._sell_source = sell_orders
+    return depth
+
+
+class Trade:
+
+    __slots__ = ("symbol", "price", "quantity", "buyer", "seller", "timestamp")
+
+    def __init__(self, symbol: Symbol, price: int, quantity: int, buyer: UserId = None, seller: UserId = None,
+                 timestamp: int = 0) -> None:
+        self.symbol = symbol
+        self.price: int = price
+        self.quantity: int = quantity
+        self.buyer = buyer
+        self.seller = seller
+        self.timestamp = timestamp
+
+    def __str__(self) -> str:
+        return ("(" + self.symbol + ", " + self.buyer + " << " + self.seller + ", " + str(self.price) + ", "
+                + str(self.quantity) + ", " + str(self.timestamp) + ")")
+
+    def __repr__(self) -> str:
+        return ("(" + self.symbol + ", " + self.buyer + " << " + self.seller + ", " + str(self.price) + ", "
+                + str(self.quantity) + ", " + str(self.timestamp) + ")")
+
+    def _plain(self) -> dict:
+        return {"symbol": self.symbol, "price": self.price, "quantity": self.quantity, "buyer": self.buyer,
+                "seller": self.seller, "timestamp": self.timestamp}
+
+
+class TradingState(object):
+
+    __slots__ = ("traderData", "timestamp", "listings", "order_depths", "own_trades", "market_trades", "position",
+                 "observations")
+
+    def __init__(self,
+                 traderData: str,
+                 timestamp: Time,
+                 listings: Dict[Symbol, Listing],
+                 order_depths: Dict[Symbol, OrderDepth],
+                 own_trades: Dict[Symbol, List[Trade]],
+                 market_trades: Dict[Symbol, List[Trade]],
+                 position: Dict[Product, Position],
+                 observations: Observation):
+        self.traderData = traderData
+        self.timestamp = timestamp
+        self.listings = listings
+        self.order_depths = order_depths
+        self.own_trades = own_trades
+        self.market_trades = market_trades
+        self.position = position
+        self.observations = observations
+
+    def _plain(self) -> dict:
+        return {
+            "traderData": self.traderData,
+            "timestamp": self.timestamp,
+            "listings": {symbol: listing._plain() for symbol, listing in self.listings.items()},
+            "order_depths": {symbol: depth._plain() for symbol, depth in self.order_depths.items()},
+            "own_trades": {symbol: [trade._plain() for trade in trades] for symbol, trades in self.own_trades.items()},
+            "market_trades": {symbol: [trade._plain() for trade in trades]
+                              for symbol, trades in self.market_trades.items()},
+            "position": self.position,
+            "observations": self.observations._plain(),
+        }
+
+    def toJSON(self):
+        return _encode_sorted(self._plain())
+
+
+class ProsperityEncoder(json.JSONEncoder):
+
+    def default(self, o):
+        plain = getattr(o, "_plain", None)
+        if plain is not None:
+            return plain()
+        return super().default(o)
+
+
+def order_depths_from_rows(products: Sequence[str], bid_prices, bid_volumes, ask_prices,
+                           ask_volumes) -> Dict[str, OrderDepth]:
+    """
+    All OrderDepths of a tick from per-product rows of price levels:
+    bid_prices[i] / bid_volumes[i] are the levels of products[i], best first.
+    Prices of 0 (or NaN) mark empty levels; ask volumes are given positive
+    and stored negative, as in the official OrderDepth.
+    """
+    depths = {}
+    for product, product_bid_prices, product_bid_volumes, product_ask_prices, product_ask_volumes in zip(
+            products, bid_prices, bid_volumes, ask_prices, ask_volumes):
+        buy_orders = {}
+        for price, volume in zip(product_bid_prices, product_bid_volumes):
+            if price and price == price:
+                buy_orders[int(price)] = int(volume)
+        sell_orders = {}
+        for price, volume in zip(product_ask_prices, product_ask_volumes):
+            if price and price == price:
+                sell_orders[int(price)] = -int(volume)
+        depths[product] = OrderDepth.of(buy_orders, sell_orders)
+    return depths
+
+
+def trades_from_columns(symbol: str, prices, quantities, buyers, sellers, timestamps) -> List[Trade]:
+    """
+    Trades of one symbol from column sequences (e.g. tick store columns converted with tolist()).
+    """
+    new = object.__new__
+    trades = []
+    for price, quantity, buyer, seller, timestamp in zip(prices, quantities, buyers, sellers, timestamps):
+        trade = new(Trade)
+        trade.symbol = symbol
+        trade.price = price
+        trade.quantity = quantity
+        trade.buyer = buyer
+        trade.seller = seller
+        trade.timestamp = timestamp
+        trades.append(trade)
+    return trades
@@ -0,0 +1,264 @@
+"""
+Successive halving / Hyperband search over Trader parameters.
+
+Configs are first backtested on the first few hundred ticks of every day; only
+the best 1/eta of them go on to eta times as many ticks, and so on until the
+survivors get full days. Hyperband runs several such brackets, from many
+configs starting on few ticks to a few configs starting on full days, so a
+parameter that only pays off late in a day still gets a chance.
+
+Every (config, days, ticks) evaluation is appended to a JSONL study log under
+a key covering the config, the day data, the ticks and the code (as in
+walkforward.py), so an interrupted study picks up where it stopped and a
+rerun with the same seed only computes what is missing.
+
+Usage:
+    python src/backtest/hyperband.py src/round1/trading.py 1 --workers 8
+    python src/backtest/hyperband.py src/round1/trading.py 1 --mode halving --configs 243 --study study.jsonl
+"""
+import argparse
+import gc
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from backtest import ROOT, DayData, load_day, load_trader, run_backtest
+from sweep import DEFAULT_SPACE, apply_config, load_space, random_configs
+from tickstore import available_days
+from walkforward import code_hash, content_hash, day_hash
+
+ETA = 3
+MIN_TICKS = 370
+DEFAULT_STUDY = os.path.join(ROOT, ".cache", "hyperband", "study.jsonl")
+
+HALVING = "halving"
+HYPERBAND = "hyperband"
+
+
+class Study:
+    """
+    Append-only log of evaluations, one JSON object per line, loaded back on open.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.results: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        row = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A line cut short by an interrupted write
+                        continue
+                    self.results[row["key"]] = row
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a")
+
+    def close(self) -> None:
+        self._file.close()
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.results.get(key)
+
+    def record(self, row: dict) -> None:
+        self.results[row["key"]] = row
+        self._file.write(json.dumps(row) + "\n")
+        self._file.flush()
+
+
+# Set in the parent before the pool forks and inherited by the workers
+_DAYS: Dict[int, DayData] = {}
+_TRADER_CLASS = None
+
+
+def _init_worker(algorithm: str, round_num: int, days: List[int]) -> None:
+    global _TRADER_CLASS
+    if _TRADER_CLASS is None:
+        _TRADER_CLASS = load_trader(algorithm)
+    # Without fork (spawn) nothing is inherited and each worker loads the days itself
+    for day in days:
+        if day not in _DAYS:
+            _DAYS[day] = load_day(round_num, day)
+
+
+def _run_task(task):
+    index, config, day, max_ticks = task
+    trader = _TRADER_CLASS()
+    apply_config(trader, config)
+    result = run_backtest(trader, _DAYS[day], max_ticks=max_ticks)
+    return index, day, result.total_pnl, result.ticks
+
+
+class Optimizer:
+    """
+    Evaluates configs over the days of a round at a tick budget, through the study and a process pool.
+    Use as a context manager so the pool and the study get closed.
+    """
+
+    def __init__(self, algorithm: str, round_num: int, days: List[int], study: Study,
+                 workers: Optional[int] = None, eta: int = ETA, progress: bool = True) -> None:
+        self.algorithm = algorithm
+        self.round = round_num
+        self.days = days
+        self.study = study
+        self.workers = workers or os.cpu_count()
+        self.eta = eta
+        self.progress = progress
+        for day in days:
+            if day not in _DAYS:
+                _DAYS[day] = load_day(round_num, day)
+        self.full_ticks = min(len(_DAYS[day].timestamps) for day in days)
+        self.code = code_hash(algorithm)
+        self.data = {day: day_hash(round_num, day) for day in days}
+        # Ticks replayed by this run, and the full days they add up to
+        self.ticks_run = 0
+        self.evaluations = 0
+        self._pool = None
+
+    def __enter__(self) -> "Optimizer":
+        global _TRADER_CLASS
+        _TRADER_CLASS = load_trader(self.algorithm)
+        # Keep the GC from touching (and so copying) the inherited data in the workers
+        gc.freeze()
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        self._pool = context.Pool(self.workers, initializer=_init_worker,
+                                  initargs=(self.algorithm, self.round, self.days))
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._pool.close()
+        self._pool.join()
+        self.study.close()
+        gc.unfreeze()
+
+    def key(self, config: Dict, max_ticks: Optional[int]) -> str:
+        return content_hash(self.code, [self.data[day] for day in self.days], config, max_ticks)
+
+    def evaluate(self, configs: List[Dict], max_ticks: Optional[int]) -> List[float]:
+        """
+        Total PnL over the days of every config with max_ticks per day (None: full days).
+        """
+        if max_ticks is not None and max_ticks >= self.full_ticks:
+            max_ticks = None
+        keys = [self.key(config, max_ticks) for config in configs]
+        scores: List[Optional[float]] = [None] * len(configs)
+        pending = {}
+        for index, key in enumerate(keys):
+            row = self.study.get(key)
+            if row is not None:
+                scores[index] = row["score"]
+            elif key not in pending.values():
+                pending[index] = key
+        tasks = [(index, configs[index], day, max_ticks) for index in pending for day in self.days]
+        day_pnl: Dict[int, Dict[int, float]] = {index: {} for index in pending}
+        chunksize = max(1, len(tasks) // (self.workers * 8))
+        for index, day, pnl, ticks in self._pool.imap_unordered(_run_task, tasks, chunksize):
+            self.ticks_run += ticks
+            day_pnl[index][day] = pnl
+            if len(day_pnl[index]) < len(self.days):
+                continue
+            self.evaluations += 1
+            score = sum(day_pnl[index].values())
+            self.study.record({"key": keys[index], "config": configs[index], "max_ticks": max_ticks,
+                               "pnl": {str(day): value for day, value in day_pnl[index].items()},
+                               "score": score})
+        # Duplicates of a config within the batch share its result
+        return [score if score is not None else self.study.get(key)["score"] for score, key in zip(scores, keys)]
+
+    def budgets(self, min_ticks: Optional[int]) -> List[Optional[int]]:
+        """
+        Ticks per day of every rung: min_ticks times powers of eta, then full days (None).
+        """
+        budgets = []
+        ticks = min_ticks
+        while ticks is not None and ticks < self.full_ticks:
+            budgets.append(ticks)
+            ticks *= self.eta
+        budgets.append(None)
+        return budgets
+
+    def successive_halving(self, configs: List[Dict], min_ticks: Optional[int]) -> List[Tuple[float, Dict]]:
+        """
+        (full-day score, config) of the configs that reached full days, best first.
+        """
+        survivors = configs
+        budgets = self.budgets(min_ticks)
+        for rung, max_ticks in enumerate(budgets):
+            start = time.perf_counter()
+            scores = self.evaluate(survivors, max_ticks)
+            ranked = sorted(zip(scores, range(len(survivors))), key=lambda pair: pair[0], reverse=True)
+            if self.progress:
+                print(f"  rung {rung}: {len(survivors)} configs x {max_ticks or 'all'} ticks in "
+                      f"{time.perf_counter() - start:.1f}s, best {ranked[0][0]:,.1f}", file=sys.stderr)
+            if max_ticks is None:
+                return [(score, survivors[index]) for score, index in ranked]
+            keep = max(1, len(survivors) // self.eta)
+            survivors = [survivors[index] for _, index in ranked[:keep]]
+        return []
+
+    def hyperband(self, space: Dict, seed: int = 0, min_ticks: int = MIN_TICKS) -> List[Tuple[float, Dict]]:
+        """
+        Runs every bracket of Hyperband over random configs from space and returns
+        all full-day results, best first.
+        """
+        budgets = self.budgets(min_ticks)
+        s_max = len(budgets) - 1
+        results = []
+        for s in range(s_max, -1, -1):
+            count = math.ceil((s_max + 1) / (s + 1) * self.eta ** s)
+            # Bracket s starts s rungs before full days
+            bracket_ticks = budgets[s_max - s]
+            if self.progress:
+                print(f"bracket {s}: {count} configs from {bracket_ticks or 'all'} ticks", file=sys.stderr)
+            configs = list(random_configs(space, count, seed + s))
+            results.extend(self.successive_halving(configs, bracket_ticks))
+        results.sort(key=lambda pair: pair[0], reverse=True)
+        return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Successive halving / Hyperband search over Trader parameters")
+    parser.add_argument("algorithm", help="path to the file defining Trader")
+    parser.add_argument("round", type=int)
+    parser.add_argument("--days", type=int, nargs="*", help="days to backtest on (default: all)")
+    parser.add_argument("--space", help="JSON file with the search space (default: sweep.DEFAULT_SPACE)")
+    parser.add_argument("--mode", choices=(HYPERBAND, HALVING), default=HYPERBAND)
+    parser.add_argument("--configs", type=int, default=81, help="with --mode halving, configs to start from")
+    parser.add_argument("--min-ticks", type=int, default=MIN_TICKS, help="ticks per day of the first rung")
+    parser.add_argument("--eta", type=int, default=ETA, help="1/eta of the configs survive every rung")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--study", default=DEFAULT_STUDY, help="JSONL study log, resumed if it exists")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    space = load_space(args.space) if args.space else DEFAULT_SPACE
+    days = args.days or available_days(args.round)
+    start = time.perf_counter()
+    study = Study(args.study)
+    resumed = len(study.results)
+    with Optimizer(args.algorithm, args.round, days, study, args.workers, args.eta) as optimizer:
+        if args.mode == HALVING:
+            results = optimizer.successive_halving(list(random_configs(space, args.configs, args.seed)),
+                                                   args.min_ticks)
+        else:
+            results = optimizer.hyperband(space, args.seed, args.min_ticks)
+    full_days = optimizer.ticks_run / optimizer.full_ticks
+    print(f"{optimizer.evaluations} evaluations ({resumed} results in the study before) in "
+          f"{time.perf_counter() - start:.1f}s, {full_days:.1f} full-day backtests worth of ticks "
+          f"over {len(days)} days")
+    for rank, (score, config) in enumerate(results[:args.top], 1):
+        print(f"{rank:>3}. {score:>12,.1f}  {config}")
+
+
+if __name__ == "__main__":
+    main()
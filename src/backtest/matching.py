@@ -0,0 +1,143 @@
+"""
+Order matching for the backtester.
+
+Orders of a tick are first crossed against every visible level of the book
+(price-level arrays, best price first), then whatever is left rests at its
+price for the rest of the tick and can be filled by the market trades of that
+timestamp. How those passive fills happen depends on the fill model:
+
+    aggressive      only the visible book fills orders
+    all             trades at or through our price fill us (default)
+    trade-through   only trades strictly through our price fill us
+    probabilistic   trades through our price fill us, trades at our price
+                    fill us with probability fill_probability
+
+With queue_position, a resting order joining an existing level of the book
+queues behind the displayed volume: trades at our price first eat that
+volume and only the rest reaches us. The volume the queue ahead absorbs is
+taken off the trade as well, so a second resting order at the same price
+cannot fill against it again. Trades through our price mean the whole level
+was taken, so they always reach us.
+"""
+import random
+from typing import List
+
+from fastmodel import OrderDepth, Trade
+
+SUBMISSION = "SUBMISSION"
+
+AGGRESSIVE_ONLY = "aggressive"
+ALL = "all"
+TRADE_THROUGH = "trade-through"
+PROBABILISTIC = "probabilistic"
+FILL_MODELS = (AGGRESSIVE_ONLY, ALL, TRADE_THROUGH, PROBABILISTIC)
+
+
+def exceeds_limit(orders, position: int, limit: int) -> bool:
+    """
+    True if the orders would breach the position limit if they all got filled.
+    The exchange rejects every order of the product in that case.
+    """
+    buy_quantity = 0
+    sell_quantity = 0
+    for order in orders:
+        if order.quantity > 0:
+            buy_quantity += order.quantity
+        else:
+            sell_quantity -= order.quantity
+    return position + buy_quantity > limit or position - sell_quantity < -limit
+
+
+class MatchingEngine:
+
+    def __init__(self, fill_model: str = ALL, queue_position: bool = False,
+                 fill_probability: float = 0.5, seed: int = 0) -> None:
+        if fill_model not in FILL_MODELS:
+            raise ValueError(f"Unknown fill model {fill_model!r}, expected one of {FILL_MODELS}")
+        self.fill_model = fill_model
+        self.queue_position = queue_position
+        self.fill_probability = fill_probability
+        self.random = random.Random(seed)
+
+    def _passive_volume(self, trade_price: int, price: int, is_buy: bool, queue: int, available: int):
+        """
+        (reaching, absorbed, queue): volume of a market trade that reaches our resting
+        order, volume of it the queue ahead of us absorbed, and the queue left ahead of us.
+        """
+        through = trade_price < price if is_buy else trade_price > price
+        if through:
+            if self.fill_model == AGGRESSIVE_ONLY:
+                return 0, 0, queue
+            return available, 0, 0
+        # The trade printed at our price
+        if self.fill_model in (AGGRESSIVE_ONLY, TRADE_THROUGH):
+            return 0, 0, queue
+        if self.fill_model == PROBABILISTIC and self.random.random() >= self.fill_probability:
+            return 0, 0, queue
+        if queue >= available:
+            return 0, available, queue - available
+        return available - queue, queue, 0
+
+    def match(self, orders, depth: OrderDepth, market_trades: List[Trade], timestamp: int) -> List[Trade]:
+        """
+        Fills the orders of one product. Taken book levels and trade volume are
+        consumed (trade quantities are decremented in place) so later orders of
+        the tick cannot fill against them again. Returns our fills.
+        """
+        # Price-level arrays, best price first, volumes positive
+        bid_prices = sorted(depth.buy_orders, reverse=True)
+        bid_volumes = [depth.buy_orders[price] for price in bid_prices]
+        ask_prices = sorted(depth.sell_orders)
+        ask_volumes = [-depth.sell_orders[price] for price in ask_prices]
+
+        fills = []
+        for order in orders:
+            symbol = order.symbol
+            price = order.price
+            is_buy = order.quantity > 0
+            remaining = abs(order.quantity)
+            if remaining == 0:
+                continue
+
+            if is_buy:
+                prices, volumes = ask_prices, ask_volumes
+            else:
+                prices, volumes = bid_prices, bid_volumes
+            level = 0
+            while remaining and level < len(prices):
+                level_price = prices[level]
+                if (level_price > price) if is_buy else (level_price < price):
+                    break
+                volume = min(remaining, volumes[level])
+                if volume:
+                    fills.append(Trade(symbol, level_price, volume, SUBMISSION if is_buy else "",
+                                       "" if is_buy else SUBMISSION, timestamp))
+                    remaining -= volume
+                    volumes[level] -= volume
+                level += 1
+            if not remaining or self.fill_model == AGGRESSIVE_ONLY:
+                continue
+
+            # Rest at our price, behind the displayed volume on our side of the book
+            queue = 0
+            if self.queue_position:
+                queue = depth.buy_orders.get(price, 0) if is_buy else -depth.sell_orders.get(price, 0)
+            for trade in market_trades:
+                if not remaining:
+                    break
+                if not trade.quantity or ((trade.price > price) if is_buy else (trade.price < price)):
+                    continue
+                volume, absorbed, queue = self._passive_volume(trade.price, price, is_buy, queue,
+                                                               trade.quantity)
+                # The part the queue ahead of us absorbed is gone for later orders too
+                trade.quantity -= absorbed
+                volume = min(remaining, volume)
+                if not volume:
+                    continue
+                if is_buy:
+                    fills.append(Trade(symbol, price, volume, SUBMISSION, trade.seller, timestamp))
+                else:
+                    fills.append(Trade(symbol, price, volume, trade.buyer, SUBMISSION, timestamp))
+                remaining -= volume
+                trade.quantity -= volume
+        return fills
@@ -0,0 +1,416 @@
+"""
+Monte Carlo market simulator calibrated from the round data.
+
+calibrate() fits, per product, over the given days:
+
+    mid       in half ticks, dm = reversion * (m - level) + shock: reversion is
+              the least squares fit on the mids demeaned per day (0 for a random
+              walk, -1 for a pinned price), shocks are the residuals, resampled
+              in blocks of BLOCK_TICKS so jumps and volatile stretches stay together.
+              A synthetic day starts at the first mid of a calibration day and
+              reverts toward that day's mean, the level the fit measured against
+    book      the three levels per side as (offset from the mid, volume) shapes,
+              resampled whole per tick; shapes are pooled by the parity of the
+              mid in half ticks so prices stay on whole ticks
+    trades    number of trades per tick, and (offset from the mid, quantity) of
+              every trade, resampled
+
+generate_day() draws a synthetic day from a calibration as numpy arrays;
+day_data() turns them into a DayData for run_backtest. simulate() runs many
+synthetic days through a Trader in a fork pool, every worker generating and
+replaying its own days, and summarize() turns the per-day PnL into a
+distribution with its tails.
+
+Usage:
+    python src/backtest/montecarlo.py src/round1/trading.py 1 --simulations 1000 --workers 8
+    python src/backtest/montecarlo.py src/round1/trading.py 1 --simulations 50 --ticks 2000 --out mc.csv
+"""
+import argparse
+import csv
+import gc
+import multiprocessing
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from attribution import attribute
+from backtest import TICK, DayData, load_day, load_trader, run_backtest
+from fastmodel import Trade
+from tickstore import available_days
+
+LEVELS = 3
+BLOCK_TICKS = 50
+TICKS_PER_DAY = 10000
+
+
+class ProductCalibration:
+    """
+    Fitted mid process, book shapes and trade distributions of one product.
+    Offsets are in half ticks from the mid; book shapes and trades are split by mid parity (0 and 1).
+    """
+
+    def __init__(self, product: str, start_mids: np.ndarray, mean_mids: np.ndarray, reversion: float,
+                 shocks: np.ndarray, book_shapes: Dict[int, np.ndarray], trade_counts: np.ndarray,
+                 trades: Dict[int, np.ndarray]) -> None:
+        self.product = product
+        # First and mean mid of every calibration day
+        self.start_mids = start_mids
+        self.mean_mids = mean_mids
+        self.reversion = reversion
+        self.shocks = shocks
+        # Per parity: (shapes, 4 * LEVELS) rows of bid offsets, bid volumes, ask offsets, ask volumes
+        self.book_shapes = book_shapes
+        self.trade_counts = trade_counts
+        # Per parity: (trades, 2) rows of offset and quantity
+        self.trades = trades
+
+
+class Calibration:
+
+    def __init__(self, round_num: int, days: List[int], products: Dict[str, ProductCalibration]) -> None:
+        self.round = round_num
+        self.days = days
+        self.products = products
+
+
+def _half_tick_mids(data: DayData, product: str) -> np.ndarray:
+    """
+    Mid of every tick in half ticks, carrying the last two-sided mid over one-sided books.
+    """
+    mids = np.full(len(data.timestamps), np.nan)
+    for i, timestamp in enumerate(data.timestamps):
+        book = data.books[timestamp].get(product)
+        if book is not None and book[0] and book[1]:
+            mids[i] = max(book[0]) + min(book[1])
+    last = np.maximum.accumulate(np.where(~np.isnan(mids), np.arange(len(mids)), -1))
+    mids = np.where(last >= 0, mids[np.maximum(last, 0)], np.nan)
+    # Ticks before the first two-sided book take the first one
+    first = np.flatnonzero(~np.isnan(mids))
+    if len(first):
+        mids[:first[0]] = mids[first[0]]
+    return mids
+
+
+def _book_shape(buy_orders: Dict[int, int], sell_orders: Dict[int, int], mid2: float) -> List[float]:
+    bids = sorted(buy_orders.items(), reverse=True)[:LEVELS]
+    asks = sorted(sell_orders.items())[:LEVELS]
+    row = [0.0] * (4 * LEVELS)
+    for level, (price, volume) in enumerate(bids):
+        row[level] = 2 * price - mid2
+        row[LEVELS + level] = volume
+    for level, (price, volume) in enumerate(asks):
+        row[2 * LEVELS + level] = 2 * price - mid2
+        row[3 * LEVELS + level] = -volume
+    return row
+
+
+def calibrate(days: Dict[int, DayData]) -> Calibration:
+    """
+    Fits a Calibration to the products of the given days.
+    """
+    products = sorted({product for data in days.values() for product in data.products})
+    round_num = next(iter(days.values())).round
+    fitted = {}
+    for product in products:
+        levels, moves, start_mids, mean_mids = [], [], [], []
+        shapes = {0: [], 1: []}
+        trades = {0: [], 1: []}
+        counts = []
+        for data in days.values():
+            mids = _half_tick_mids(data, product)
+            if np.isnan(mids).all():
+                continue
+            start_mids.append(mids[0])
+            mean_mids.append(mids.mean())
+            levels.append(mids[:-1] - mids.mean())
+            moves.append(np.diff(mids))
+            for i, timestamp in enumerate(data.timestamps):
+                mid2 = mids[i]
+                parity = int(mid2) % 2
+                book = data.books[timestamp].get(product)
+                if book is not None:
+                    shapes[parity].append(_book_shape(book[0], book[1], mid2))
+                tick_trades = [trade for trade in data.trades.get(timestamp, ()) if trade.symbol == product]
+                counts.append(len(tick_trades))
+                for trade in tick_trades:
+                    trades[parity].append((2 * trade.price - mid2, trade.quantity))
+        if not moves:
+            continue
+        x = np.concatenate(levels)
+        y = np.concatenate(moves)
+        reversion = float(np.clip(x @ y / (x @ x), -1.0, 0.0)) if x @ x > 0 else 0.0
+        fitted[product] = ProductCalibration(
+            product,
+            np.array(start_mids),
+            np.array(mean_mids),
+            reversion,
+            y - reversion * x,
+            {parity: np.array(rows, dtype=np.float64).reshape(-1, 4 * LEVELS) for parity, rows in shapes.items()},
+            np.array(counts, dtype=np.int64),
+            {parity: np.array(rows, dtype=np.float64).reshape(-1, 2) for parity, rows in trades.items()},
+        )
+    return Calibration(round_num, sorted(days), fitted)
+
+
+def _pool(pools: Dict[int, np.ndarray], parity: int, offset_columns) -> np.ndarray:
+    """
+    Rows for a mid parity. If only the other parity was ever seen, its offsets move one half tick outwards.
+    """
+    rows = pools[parity]
+    if len(rows) or not len(pools[1 - parity]):
+        return rows
+    rows = pools[1 - parity].copy()
+    rows[:, offset_columns] += np.where(rows[:, offset_columns] < 0, -1, 1)
+    return rows
+
+
+def _mid_path(calibration: ProductCalibration, rng: np.random.Generator, ticks: int) -> np.ndarray:
+    day = rng.integers(len(calibration.start_mids))
+    start = int(calibration.start_mids[day])
+    level = float(calibration.mean_mids[day])
+    shocks = calibration.shocks
+    # Shocks in blocks of consecutive ticks
+    blocks = -(-ticks // BLOCK_TICKS)
+    starts = rng.integers(0, max(1, len(shocks) - BLOCK_TICKS), blocks)
+    drawn = shocks[(starts[:, None] + np.arange(BLOCK_TICKS)).clip(max=len(shocks) - 1)].ravel()[:ticks]
+    reversion = calibration.reversion
+    if reversion == 0.0:
+        return start + np.concatenate(([0.0], np.cumsum(np.round(drawn[1:]))))
+    path = np.empty(ticks)
+    mid = float(start)
+    for i, shock in enumerate(drawn.tolist()):
+        if i:
+            mid += round(reversion * (mid - level) + shock)
+        path[i] = mid
+    return path
+
+
+def generate_day(calibration: Calibration, rng: np.random.Generator, ticks: int = TICKS_PER_DAY) -> Dict:
+    """
+    A synthetic day as arrays, products in calibration order:
+
+        mid2                      (ticks, products) mids in half ticks
+        bid_prices / bid_volumes  (ticks, products, LEVELS), price 0 for an empty level
+        ask_prices / ask_volumes  (ticks, products, LEVELS), volumes positive
+        trade_tick / trade_product / trade_price / trade_quantity   one entry per trade
+    """
+    products = list(calibration.products)
+    shape = (ticks, len(products), LEVELS)
+    arrays = {
+        "mid2": np.zeros((ticks, len(products))),
+        "bid_prices": np.zeros(shape, dtype=np.int64),
+        "bid_volumes": np.zeros(shape, dtype=np.int64),
+        "ask_prices": np.zeros(shape, dtype=np.int64),
+        "ask_volumes": np.zeros(shape, dtype=np.int64),
+    }
+    trade_columns = {"trade_tick": [], "trade_product": [], "trade_price": [], "trade_quantity": []}
+    for p, product in enumerate(products):
+        fitted = calibration.products[product]
+        mid2 = _mid_path(fitted, rng, ticks)
+        arrays["mid2"][:, p] = mid2
+        parity = (mid2.astype(np.int64) % 2)
+        for value in (0, 1):
+            at = np.flatnonzero(parity == value)
+            if not len(at):
+                continue
+            shapes = _pool(fitted.book_shapes, value, np.r_[0:LEVELS, 2 * LEVELS:3 * LEVELS])
+            if len(shapes):
+                drawn = shapes[rng.integers(len(shapes), size=len(at))]
+                bid_volumes = drawn[:, LEVELS:2 * LEVELS]
+                ask_volumes = drawn[:, 3 * LEVELS:]
+                mids = mid2[at, None]
+                arrays["bid_prices"][at, p] = np.where(bid_volumes > 0, (mids + drawn[:, :LEVELS]) // 2, 0)
+                arrays["bid_volumes"][at, p] = bid_volumes
+                arrays["ask_prices"][at, p] = np.where(ask_volumes > 0,
+                                                       (mids + drawn[:, 2 * LEVELS:3 * LEVELS]) // 2, 0)
+                arrays["ask_volumes"][at, p] = ask_volumes
+
+            counts = fitted.trade_counts[rng.integers(len(fitted.trade_counts), size=len(at))]
+            pool = _pool(fitted.trades, value, np.s_[0:1])
+            if not counts.sum() or not len(pool):
+                continue
+            trade_ticks = np.repeat(at, counts)
+            drawn = pool[rng.integers(len(pool), size=len(trade_ticks))]
+            trade_columns["trade_tick"].append(trade_ticks)
+            trade_columns["trade_product"].append(np.full(len(trade_ticks), p))
+            trade_columns["trade_price"].append(((mid2[trade_ticks] + drawn[:, 0]) // 2).astype(np.int64))
+            trade_columns["trade_quantity"].append(drawn[:, 1].astype(np.int64))
+    for name, parts in trade_columns.items():
+        arrays[name] = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+    # Trades in tick order, as they would print
+    order = np.argsort(arrays["trade_tick"], kind="stable")
+    for name in trade_columns:
+        arrays[name] = arrays[name][order]
+    return arrays
+
+
+def day_data(calibration: Calibration, arrays: Dict, day: int = 0) -> DayData:
+    """
+    A DayData over generated arrays, replayable by run_backtest.
+    """
+    products = list(calibration.products)
+    ticks = len(arrays["mid2"])
+    timestamps = [tick * TICK for tick in range(ticks)]
+    bid_prices = arrays["bid_prices"].tolist()
+    bid_volumes = arrays["bid_volumes"].tolist()
+    ask_prices = arrays["ask_prices"].tolist()
+    ask_volumes = arrays["ask_volumes"].tolist()
+    books = {}
+    for tick, timestamp in enumerate(timestamps):
+        tick_books = books[timestamp] = {}
+        for p, product in enumerate(products):
+            buy_orders = {price: volume for price, volume in zip(bid_prices[tick][p], bid_volumes[tick][p]) if price}
+            sell_orders = {price: -volume for price, volume in zip(ask_prices[tick][p], ask_volumes[tick][p])
+                           if price}
+            mid = (max(buy_orders) + min(sell_orders)) / 2 if buy_orders and sell_orders else None
+            tick_books[product] = (buy_orders, sell_orders, mid)
+    trades: Dict[int, List[Trade]] = {}
+    for tick, p, price, quantity in zip(arrays["trade_tick"].tolist(), arrays["trade_product"].tolist(),
+                                        arrays["trade_price"].tolist(), arrays["trade_quantity"].tolist()):
+        timestamp = tick * TICK
+        trades.setdefault(timestamp, []).append(Trade(products[p], price, quantity, "", "", timestamp))
+    return DayData(calibration.round, day, products, timestamps, books, trades)
+
+
+# Set in the parent before the pool forks and inherited by the workers
+_CALIBRATION: Optional[Calibration] = None
+_TRADER_CLASS = None
+
+
+def _init_worker(algorithm: str, calibration: Calibration) -> None:
+    global _TRADER_CLASS, _CALIBRATION
+    # Without fork (spawn) nothing is inherited
+    if _TRADER_CLASS is None:
+        _TRADER_CLASS = load_trader(algorithm)
+    if _CALIBRATION is None:
+        _CALIBRATION = calibration
+
+
+def _run_task(task):
+    simulation, seed, ticks, save_dir = task
+    rng = np.random.default_rng([seed, simulation])
+    arrays = generate_day(_CALIBRATION, rng, ticks)
+    if save_dir:
+        np.savez_compressed(os.path.join(save_dir, f"day_{simulation}.npz"), **arrays)
+    data = day_data(_CALIBRATION, arrays, simulation)
+    result = run_backtest(_TRADER_CLASS(), data)
+    rows = attribute(result, data)
+    return simulation, result.pnl, rows["total"]["max_drawdown"]
+
+
+def simulate(algorithm: str, calibration: Calibration, simulations: int, workers: Optional[int] = None,
+             seed: int = 0, ticks: int = TICKS_PER_DAY, save_dir: Optional[str] = None,
+             progress: bool = True) -> List[Dict]:
+    """
+    Backtests the Trader of algorithm on synthetic days and returns one row per
+    day: {"simulation", "pnl" (per product), "pnl_total", "max_drawdown"}.
+    Day i is drawn from the seed sequence [seed, i], so runs are reproducible
+    whatever the number of workers.
+    """
+    global _CALIBRATION, _TRADER_CLASS
+    workers = workers or os.cpu_count()
+    _CALIBRATION = calibration
+    _TRADER_CLASS = load_trader(algorithm)
+    if save_dir:
+        os.makedirs(save_dir, exist_ok=True)
+    gc.freeze()
+
+    tasks = [(simulation, seed, ticks, save_dir) for simulation in range(simulations)]
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    rows = []
+    start = time.perf_counter()
+    try:
+        with context.Pool(workers, initializer=_init_worker, initargs=(algorithm, calibration)) as pool:
+            for simulation, pnl, drawdown in pool.imap_unordered(_run_task, tasks):
+                rows.append({"simulation": simulation, "pnl": pnl, "pnl_total": sum(pnl.values()),
+                             "max_drawdown": drawdown})
+                if progress and (len(rows) % 10 == 0 or len(rows) == simulations):
+                    print(f"[{len(rows)}/{simulations}] {time.perf_counter() - start:.0f}s", file=sys.stderr)
+    finally:
+        gc.unfreeze()
+    rows.sort(key=lambda row: row["simulation"])
+    return rows
+
+
+def summarize(values: np.ndarray, tail: float = 0.05) -> Dict[str, float]:
+    """
+    Mean, spread and tails of a PnL sample: value at risk and expected shortfall at tail.
+    """
+    cutoff = np.quantile(values, tail)
+    return {
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+        "p1": float(np.quantile(values, 0.01)),
+        "p5": float(np.quantile(values, 0.05)),
+        "p50": float(np.median(values)),
+        "p95": float(np.quantile(values, 0.95)),
+        "loss_probability": float((values < 0).mean()),
+        "var": float(-cutoff),
+        "expected_shortfall": float(-values[values <= cutoff].mean()),
+    }
+
+
+def print_summary(rows: List[Dict], tail: float = 0.05) -> None:
+    products = sorted({product for row in rows for product in row["pnl"]})
+    series = {product: np.array([row["pnl"].get(product, 0.0) for row in rows]) for product in products}
+    series["total"] = np.array([row["pnl_total"] for row in rows])
+    print(f"{len(rows)} synthetic days, tails at {tail:.0%}")
+    print(f"  {'':<18} {'mean':>10} {'std':>9} {'p1':>10} {'p5':>10} {'p50':>10} {'p95':>10} "
+          f"{'P(loss)':>8} {'VaR':>9} {'ES':>9}")
+    for name, values in series.items():
+        row = summarize(values, tail)
+        print(f"  {name:<18} {row['mean']:>10,.1f} {row['std']:>9,.1f} {row['p1']:>10,.1f} {row['p5']:>10,.1f} "
+              f"{row['p50']:>10,.1f} {row['p95']:>10,.1f} {row['loss_probability']:>8.1%} {row['var']:>9,.1f} "
+              f"{row['expected_shortfall']:>9,.1f}")
+    # A drawdown is a loss size, not a PnL: only its quantiles, P(loss), VaR and ES of it mean nothing
+    drawdowns = np.array([row["max_drawdown"] for row in rows])
+    p1, p5, p50, p95 = np.quantile(drawdowns, [0.01, 0.05, 0.5, 0.95])
+    print(f"  {'max drawdown':<18} {drawdowns.mean():>10,.1f} {drawdowns.std():>9,.1f} {p1:>10,.1f} {p5:>10,.1f} "
+          f"{p50:>10,.1f} {p95:>10,.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backtest a Trader on synthetic days calibrated from a round")
+    parser.add_argument("algorithm", help="path to the file defining Trader")
+    parser.add_argument("round", type=int)
+    parser.add_argument("--days", type=int, nargs="*", help="days to calibrate on (default: all)")
+    parser.add_argument("--simulations", type=int, default=100, help="number of synthetic days")
+    parser.add_argument("--ticks", type=int, default=TICKS_PER_DAY, help="ticks per synthetic day")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--tail", type=float, default=0.05, help="tail probability of VaR / expected shortfall")
+    parser.add_argument("--out", help="CSV with the PnL of every synthetic day")
+    parser.add_argument("--save-dir", help="also write the arrays of every synthetic day there as .npz")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    days = {day: load_day(args.round, day) for day in (args.days or available_days(args.round))}
+    calibration = calibrate(days)
+    print(f"Calibrated on days {calibration.days} in {time.perf_counter() - start:.1f}s")
+    for product, fitted in calibration.products.items():
+        print(f"  {product:<18} reversion {fitted.reversion:+.4f}  shock std {fitted.shocks.std() / 2:.3f}  "
+              f"trades/tick {fitted.trade_counts.mean():.3f}")
+
+    start = time.perf_counter()
+    rows = simulate(args.algorithm, calibration, args.simulations, args.workers, args.seed, args.ticks,
+                    args.save_dir)
+    print(f"{args.simulations} days of {args.ticks} ticks in {time.perf_counter() - start:.1f}s")
+    print_summary(rows, args.tail)
+
+    if args.out:
+        products = sorted({product for row in rows for product in row["pnl"]})
+        with open(args.out, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["simulation", *[f"pnl_{product}" for product in products], "pnl_total",
+                             "max_drawdown"])
+            for row in rows:
+                writer.writerow([row["simulation"], *[row["pnl"].get(product, 0.0) for product in products],
+                                 row["pnl_total"], row["max_drawdown"]])
+
+
+if __name__ == "__main__":
+    main()
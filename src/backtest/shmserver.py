@@ -0,0 +1,377 @@
+"""
+Shared-memory market data server.
+
+The server loads every day of the given rounds from the tick store once and
+copies its columns into one multiprocessing.shared_memory block per day,
+named after the round and day (block_name). A block starts with a JSON header
+holding the store meta and the offset of every column, so any process can
+attach by name alone:
+
+    day = attach(1, 0)           # None if no server publishes round 1 day 0
+    day.prices("KELP")           # zero-copy numpy views, like StoreDay
+    day.order_depths(500)        # {product: OrderDepth} of one tick, built on demand
+
+SharedDay is a StoreDay, so everything reading a StoreDay reads a SharedDay.
+When the server publishes a day, load_day in backtest.py returns a DayData
+whose books and trades (SharedBooks, SharedTrades) are built from the shared
+columns on every lookup, so the backtests, sweeps, hyperband and walk-forward
+workers of every process replay the one copy in shared memory instead of each
+holding the day as Python dicts; the cost is building a tick's dicts every
+time it is read. Blocks built from CSVs that have since changed are ignored
+by attach.
+
+Usage:
+    python src/backtest/shmserver.py serve 1 2        # until Ctrl-C / SIGTERM
+    python src/backtest/shmserver.py status 1
+"""
+import argparse
+import json
+import signal
+import struct
+import time
+from collections.abc import Mapping
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from fastmodel import OrderDepth, Trade, trades_from_columns
+from tickstore import (PRICE_COLUMNS, PRICE_LEVELS, TRADE_COLUMNS, StoreDay, _source_stamp, available_days,
+                       convert_round, day_store_path, prices_path, trades_path)
+
+BLOCK_PREFIX = "prosperity"
+MAGIC = b"PSHM"
+VERSION = 2
+# magic, version, header length
+_PREAMBLE = struct.Struct("<4sII")
+ALIGNMENT = 64
+# Book levels of every prices row side by side (prices.levels), so a row is read in one go
+LEVEL_COLUMNS = [name for name in PRICE_COLUMNS if name.startswith(("bid_", "ask_"))]
+
+
+def block_name(round_num: int, day: int) -> str:
+    """
+    Name of the shared memory block of a day, e.g. prosperity_r1_dm2 for round 1 day -2.
+    """
+    return f"{BLOCK_PREFIX}_r{round_num}_d{day}".replace("-", "m")
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def publish(store_day: StoreDay) -> SharedMemory:
+    """
+    Copies every column of a converted day into a new shared memory block, replacing a
+    block of the same name left behind by a server that did not shut down.
+    """
+    columns = {f"prices.{name}": store_day.column("prices", name) for name in PRICE_COLUMNS}
+    columns.update({f"trades.{name}": store_day.column("trades", name) for name in TRADE_COLUMNS})
+    columns["prices.levels"] = np.stack([store_day.column("prices", name) for name in LEVEL_COLUMNS], axis=1)
+    layout = {}
+    offset = 0
+    for key, values in columns.items():
+        layout[key] = [offset, values.dtype.str, list(values.shape)]
+        offset = _align(offset + values.nbytes)
+    header = json.dumps({"meta": store_day.meta, "columns": layout}).encode()
+    data_start = _align(_PREAMBLE.size + len(header))
+
+    name = block_name(store_day.round, store_day.day)
+    try:
+        shm = SharedMemory(name, create=True, size=max(1, data_start + offset))
+    except FileExistsError:
+        stale = SharedMemory(name)
+        stale.close()
+        stale.unlink()
+        shm = SharedMemory(name, create=True, size=max(1, data_start + offset))
+    _PREAMBLE.pack_into(shm.buf, 0, MAGIC, VERSION, len(header))
+    shm.buf[_PREAMBLE.size:_PREAMBLE.size + len(header)] = header
+    for key, values in columns.items():
+        start, dtype, shape = layout[key]
+        target = np.ndarray(tuple(shape), dtype=dtype, buffer=shm.buf, offset=data_start + start)
+        target[:] = values
+        del target
+    return shm
+
+
+class SharedDay(StoreDay):
+    """
+    A day published by the server: read-only numpy views straight into the shared block.
+    """
+
+    def __init__(self, shm: SharedMemory) -> None:
+        magic, version, length = _PREAMBLE.unpack_from(shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{shm.name} is not a version {VERSION} market data block")
+        header = json.loads(bytes(shm.buf[_PREAMBLE.size:_PREAMBLE.size + length]))
+        data_start = _align(_PREAMBLE.size + length)
+        self.shm = shm
+        self.path = None
+        self.meta = header["meta"]
+        self.round = self.meta["round"]
+        self.day = self.meta["day"]
+        self.products: List[str] = self.meta["products"]
+        self.traders: List[str] = self.meta["traders"]
+        self._columns: Dict[str, np.ndarray] = {}
+        for key, (start, dtype, shape) in header["columns"].items():
+            values = np.ndarray(tuple(shape), dtype=dtype, buffer=shm.buf, offset=data_start + start)
+            values.flags.writeable = False
+            self._columns[key] = values
+        self._timestamps = None
+        # Built on first use by _index_books / _index_trades, small next to the day itself
+        self._tick_index = None
+        self._rows = None
+        self._trade_ranges = None
+
+    @property
+    def stale(self) -> bool:
+        """
+        True if the CSVs changed since the server loaded the day.
+        """
+        sources = self.meta["sources"]
+        return (sources["prices"] != _source_stamp(prices_path(self.round, self.day))
+                or sources["trades"] != _source_stamp(trades_path(self.round, self.day)))
+
+    @property
+    def nbytes(self) -> int:
+        return self.shm.size
+
+    def timestamps(self) -> np.ndarray:
+        """
+        Every timestamp with a book of any product, sorted.
+        """
+        if self._timestamps is None:
+            self._timestamps = np.unique(self.column("prices", "timestamp"))
+        return self._timestamps
+
+    def _index_books(self) -> None:
+        """
+        Tick number of every timestamp, and per product the prices row of every tick (-1 without a book).
+        """
+        timestamps = self.timestamps()
+        self._tick_index = {timestamp: tick for tick, timestamp in enumerate(timestamps.tolist())}
+        column = self.column("prices", "timestamp")
+        self._rows = {}
+        for product in self.products:
+            start, stop = self.meta["prices"]["offsets"].get(product, (0, 0))
+            product_timestamps = column[start:stop]
+            found = np.searchsorted(product_timestamps, timestamps)
+            hit = found < stop - start
+            hit[hit] = product_timestamps[found[hit]] == timestamps[hit]
+            self._rows[product] = np.where(hit, start + found, -1)
+
+    def books(self, timestamp: int) -> Dict[str, tuple]:
+        """
+        {product: (buy_orders, sell_orders, mid_price)} at timestamp, as in DayData.books.
+        """
+        if self._rows is None:
+            self._index_books()
+        tick = self._tick_index.get(timestamp)
+        if tick is None:
+            return {}
+        levels = self._columns["prices.levels"]
+        mids = self._columns["prices.mid_price"]
+        n = PRICE_LEVELS
+        books = {}
+        for product, rows in self._rows.items():
+            row = rows[tick]
+            if row < 0:
+                continue
+            values = levels[row].tolist()
+            buy_orders = {price: volume for price, volume in zip(values[:n], values[n:2 * n]) if price}
+            sell_orders = {price: -volume for price, volume in zip(values[2 * n:3 * n], values[3 * n:]) if price}
+            mid_price = mids[row].item()
+            books[product] = (buy_orders, sell_orders, None if mid_price != mid_price else mid_price)
+        return books
+
+    def order_depths(self, timestamp: int) -> Dict[str, OrderDepth]:
+        """
+        OrderDepths of every product with a book at timestamp, sell volumes negative.
+        """
+        return {product: OrderDepth.of(buy_orders, sell_orders)
+                for product, (buy_orders, sell_orders, _) in self.books(timestamp).items()}
+
+    def _index_trades(self) -> None:
+        """
+        [(product, first row, stop row)] of the trades of every timestamp with trades.
+        """
+        column = self.column("trades", "timestamp")
+        self._trade_ranges = {}
+        for product in self.products:
+            start, stop = self.meta["trades"]["offsets"].get(product, (0, 0))
+            timestamps, firsts, counts = np.unique(column[start:stop], return_index=True, return_counts=True)
+            for timestamp, first, count in zip(timestamps.tolist(), firsts.tolist(), counts.tolist()):
+                self._trade_ranges.setdefault(timestamp, []).append((product, start + first, start + first + count))
+
+    def trades_at(self, timestamp: int) -> List[Trade]:
+        """
+        Market trades of every product printed at timestamp, as in DayData.trades.
+        """
+        if self._trade_ranges is None:
+            self._index_trades()
+        columns = self._columns
+        traders = self.traders
+        trades = []
+        for product, first, last in self._trade_ranges.get(timestamp, ()):
+            trades.extend(trades_from_columns(
+                product, [int(price) for price in columns["trades.price"][first:last].tolist()],
+                columns["trades.quantity"][first:last].tolist(),
+                [traders[buyer] for buyer in columns["trades.buyer"][first:last].tolist()],
+                [traders[seller] for seller in columns["trades.seller"][first:last].tolist()],
+                [timestamp] * (last - first)))
+        return trades
+
+    def trade_timestamps(self) -> List[int]:
+        """
+        Every timestamp with a market trade of any product, sorted.
+        """
+        if self._trade_ranges is None:
+            self._index_trades()
+        return sorted(self._trade_ranges)
+
+    def close(self) -> None:
+        """
+        Detaches from the block. Views taken from this day must not be used afterwards.
+        """
+        self._columns.clear()
+        self._timestamps = None
+        self._tick_index = None
+        self._rows = None
+        self._trade_ranges = None
+        self.shm.close()
+
+
+class SharedBooks(Mapping):
+    """
+    DayData.books over a SharedDay: timestamp -> {product: (buy_orders, sell_orders, mid_price)},
+    built from the shared columns on every lookup instead of held per process.
+    Pickles as a plain dict.
+    """
+
+    def __init__(self, shared: SharedDay) -> None:
+        self.shared = shared
+
+    def __getitem__(self, timestamp: int) -> Dict[str, tuple]:
+        books = self.shared.books(timestamp)
+        if not books:
+            raise KeyError(timestamp)
+        return books
+
+    def __iter__(self):
+        return iter(self.shared.timestamps().tolist())
+
+    def __len__(self) -> int:
+        return len(self.shared.timestamps())
+
+    def __reduce__(self):
+        return dict, (dict(self.items()),)
+
+
+class SharedTrades(Mapping):
+    """
+    DayData.trades over a SharedDay: timestamp -> [Trade], built on every lookup. Pickles as a plain dict.
+    """
+
+    def __init__(self, shared: SharedDay) -> None:
+        self.shared = shared
+
+    def __getitem__(self, timestamp: int) -> List[Trade]:
+        trades = self.shared.trades_at(timestamp)
+        if not trades:
+            raise KeyError(timestamp)
+        return trades
+
+    def __iter__(self):
+        return iter(self.shared.trade_timestamps())
+
+    def __len__(self) -> int:
+        return len(self.shared.trade_timestamps())
+
+    def __reduce__(self):
+        return dict, (dict(self.items()),)
+
+
+def attach(round_num: int, day: int) -> Optional[SharedDay]:
+    """
+    The published day, or None if no server publishes it or its CSVs changed since.
+    """
+    try:
+        shm = SharedMemory(block_name(round_num, day))
+    except FileNotFoundError:
+        return None
+    # Before 3.13 attaching registers the block with this process's resource tracker,
+    # which would unlink it (under the server and every other client) when we exit
+    resource_tracker.unregister(shm._name, "shared_memory")
+    shared = SharedDay(shm)
+    if shared.stale:
+        shared.close()
+        return None
+    return shared
+
+
+class MarketDataServer:
+    """
+    Publishes the days of some rounds until closed. Use as a context manager so the blocks get unlinked.
+    """
+
+    def __init__(self, rounds: List[int]) -> None:
+        self.rounds = rounds
+        self.blocks: Dict[tuple, SharedMemory] = {}
+
+    def __enter__(self) -> "MarketDataServer":
+        for round_num in self.rounds:
+            convert_round(round_num)
+            for day in available_days(round_num):
+                self.blocks[(round_num, day)] = publish(StoreDay(day_store_path(round_num, day)))
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for shm in self.blocks.values():
+            shm.close()
+            shm.unlink()
+        self.blocks.clear()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(shm.size for shm in self.blocks.values())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Shared-memory market data server")
+    parser.add_argument("command", choices=("serve", "status"))
+    parser.add_argument("rounds", type=int, nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        for round_num in args.rounds:
+            for day in available_days(round_num):
+                start = time.perf_counter()
+                shared = attach(round_num, day)
+                elapsed = time.perf_counter() - start
+                if shared is None:
+                    print(f"round {round_num} day {day:>3}: not published (or stale)")
+                    continue
+                print(f"round {round_num} day {day:>3}: {block_name(round_num, day)}, "
+                      f"{shared.nbytes / 1e6:.1f} MB, {len(shared.timestamps())} ticks, "
+                      f"attached in {elapsed * 1000:.2f} ms")
+                shared.close()
+        return
+
+    # SIGTERM goes through the same cleanup as Ctrl-C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    start = time.perf_counter()
+    with MarketDataServer(args.rounds) as server:
+        print(f"Published {len(server.blocks)} days ({server.nbytes / 1e6:.1f} MB) in "
+              f"{time.perf_counter() - start:.2f}s: {', '.join(shm.name for shm in server.blocks.values())}",
+              flush=True)
+        try:
+            while True:
+                signal.pause()
+        except KeyboardInterrupt:
+            pass
+    print("Unlinked")
+
+
+if __name__ == "__main__":
+    main()
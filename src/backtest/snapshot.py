@@ -0,0 +1,397 @@
+"""
+Random access to any tick of a day.
+
+TickIndex maps every tick of a day to the byte offsets of its rows in the
+prices_ and trades_ CSVs: the price rows of tick i are
+price_offsets[i]:price_offsets[i + 1], its trades (those printed after the
+previous tick, up to and including this one) trade_offsets[i]:trade_offsets[i + 1].
+It is built in one pass over the files and kept under .cache/index, rebuilt
+when the CSVs change.
+
+snapshot() rebuilds the TradingState a Trader sees at a tick by replaying the
+day up to it through run_backtest, so the Trader arrives warmed up (indicator
+history, EMAs, traderData) and the state carries the position, own_trades and
+market_trades of the full-day run exactly.
+
+Replays leave a checkpoint (a ReplayState: positions, cash, own and market
+trades and traderData) every CHECKPOINT_EVERY ticks next to the index, keyed
+by the trader's code, the position limits and the matching engine, so a later
+snapshot resumes a fresh trader_class() from the nearest checkpoint before its
+tick and replays at most CHECKPOINT_EVERY - 1 ticks. That relies on the Trader
+restoring itself from traderData, as the round 1 one does (it trades the same
+when rebuilt every tick). Round 1, day -2, timestamp 734500: 1.0 s for the
+first snapshot (the day up to it is replayed), 8-10 ms after that (45 ticks
+from the checkpoint at tick 7300, 1 ms of it loading the checkpoints). The
+probabilistic fill model draws from its RNG, which a checkpoint does not
+carry, so it always replays from the start.
+
+A lookback replays only that many ticks before the tick instead. It is an
+approximation: the indicator windows are filled (lookback_ticks gives the
+largest of them), but the position, cash and EMAs start from scratch at the
+window start, so the position can be far off the full-day one (day -2
+timestamp 734500 of round 1: 10 after the 51 tick lookback, 45 from the start).
+Use it to look at the book and the indicators of a tick quickly, not at what
+the Trader would do there.
+
+    snap = snapshot(load_trader("src/round1/trading.py"), 1, -2, 734500)
+    snap.state.order_depths, snap.state.position, snap.run()
+
+Usage:
+    python src/backtest/snapshot.py src/round1/trading.py 1 -2 734500
+    python src/backtest/snapshot.py src/round1/trading.py 1 -2 734500 --lookback auto
+"""
+import argparse
+import contextlib
+import inspect
+import io
+import os
+import pickle
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from backtest import ROOT, ReplayState, load_trader, parse_price_row, parse_trade_row, run_backtest
+from matching import PROBABILISTIC, MatchingEngine
+from tickstore import _source_stamp, prices_path, trades_path
+from walkforward import code_hash, content_hash
+
+INDEX_DIR = os.path.join(ROOT, ".cache", "index")
+CHECKPOINT_EVERY = 100
+
+
+def _row_offsets(path: str, time_column: int):
+    """
+    (timestamps, offsets) of every data row of a ';' separated file, plus the file size.
+    """
+    timestamps = []
+    offsets = []
+    with open(path, "rb") as f:
+        f.readline()
+        offset = f.tell()
+        for line in f:
+            if line.strip():
+                timestamps.append(int(line.split(b";", time_column + 1)[time_column]))
+                offsets.append(offset)
+            offset += len(line)
+    return np.array(timestamps, dtype=np.int64), np.array(offsets, dtype=np.int64), offset
+
+
+class TickIndex:
+    """
+    Byte offsets of the rows of every tick of a day in its prices and trades CSVs.
+    Replay checkpoints of the day are kept in the same directory.
+    """
+
+    def __init__(self, round_num: int, day: int, timestamps: np.ndarray, price_offsets: np.ndarray,
+                 trade_offsets: np.ndarray, directory: str = INDEX_DIR) -> None:
+        self.round = round_num
+        self.day = day
+        self.timestamps = timestamps
+        self.price_offsets = price_offsets
+        self.trade_offsets = trade_offsets
+        self.directory = directory
+        self._checkpoints: Dict[str, Dict[int, ReplayState]] = {}
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @classmethod
+    def build(cls, round_num: int, day: int, directory: str = INDEX_DIR) -> "TickIndex":
+        row_timestamps, row_offsets, size = _row_offsets(prices_path(round_num, day), 1)
+        # First row of every tick, the rows of a tick are contiguous
+        starts = np.flatnonzero(np.diff(row_timestamps, prepend=row_timestamps[:1] - 1))
+        timestamps = row_timestamps[starts]
+        price_offsets = np.append(row_offsets[starts], size)
+
+        path = trades_path(round_num, day)
+        if os.path.exists(path):
+            trade_timestamps, trade_row_offsets, trade_size = _row_offsets(path, 0)
+        else:
+            trade_timestamps = trade_row_offsets = np.zeros(0, dtype=np.int64)
+            trade_size = 0
+        # Trades after the last tick belong to no tick, as in the replay
+        rows = np.searchsorted(trade_timestamps, timestamps, side="right")
+        starts = np.concatenate(([0], rows))
+        trade_offsets = np.append(trade_row_offsets, trade_size)[starts]
+        return cls(round_num, day, timestamps, price_offsets, trade_offsets, directory)
+
+    @classmethod
+    def load(cls, round_num: int, day: int, directory: str = INDEX_DIR) -> "TickIndex":
+        """
+        The index of a day from directory, built and saved there if missing or stale.
+        """
+        path = os.path.join(directory, f"round_{round_num}_day_{day}.npz")
+        sources = np.array(_sources(round_num, day), dtype=np.int64)
+        if os.path.exists(path):
+            with np.load(path) as loaded:
+                if np.array_equal(loaded["sources"], sources):
+                    return cls(round_num, day, loaded["timestamps"], loaded["price_offsets"],
+                               loaded["trade_offsets"], directory)
+        index = cls.build(round_num, day, directory)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, timestamps=index.timestamps, price_offsets=index.price_offsets,
+                     trade_offsets=index.trade_offsets, sources=sources)
+        os.replace(tmp_path, path)
+        return index
+
+    def tick(self, timestamp: int) -> int:
+        """
+        Tick number of a timestamp. Raises KeyError if the day has no tick at it.
+        """
+        tick = int(np.searchsorted(self.timestamps, timestamp))
+        if tick == len(self.timestamps) or self.timestamps[tick] != timestamp:
+            raise KeyError(f"round {self.round} day {self.day} has no tick at timestamp {timestamp}")
+        return tick
+
+    def _checkpoint_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"round_{self.round}_day_{self.day}_{key[:16]}.pickle")
+
+    def checkpoints(self, key: str) -> Dict[int, ReplayState]:
+        """
+        Replay checkpoints saved under key by tick number, empty if none or the CSVs changed since.
+        """
+        if key not in self._checkpoints:
+            checkpoints = {}
+            path = self._checkpoint_path(key)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    saved = pickle.load(f)
+                if saved["sources"] == _sources(self.round, self.day):
+                    checkpoints = saved["checkpoints"]
+            self._checkpoints[key] = checkpoints
+        return self._checkpoints[key]
+
+    def save_checkpoints(self, key: str, checkpoints: List[ReplayState]) -> None:
+        """
+        Adds checkpoints to the ones saved under key.
+        """
+        merged = dict(self.checkpoints(key))
+        merged.update((checkpoint.tick, checkpoint) for checkpoint in checkpoints)
+        self._checkpoints[key] = merged
+        path = self._checkpoint_path(key)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"sources": _sources(self.round, self.day), "checkpoints": merged}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+
+def _sources(round_num: int, day: int) -> List[List[int]]:
+    return [list(_source_stamp(prices_path(round_num, day)) or [0, 0]),
+            list(_source_stamp(trades_path(round_num, day)) or [0, 0])]
+
+
+def checkpoint_key(trader_class, position_limits: Optional[Dict[str, int]] = None,
+                   engine: Optional[MatchingEngine] = None) -> Optional[str]:
+    """
+    Key of the checkpoints a replay of trader_class leaves: its code, the backtester's,
+    the position limits and the engine settings. None if the replay cannot be resumed
+    (the trader's source is not found, or the engine draws random fills).
+    """
+    if engine is None:
+        engine = MatchingEngine()
+    if engine.fill_model == PROBABILISTIC:
+        return None
+    try:
+        path = inspect.getsourcefile(trader_class)
+    except TypeError:
+        return None
+    if path is None:
+        return None
+    return content_hash(code_hash(path), trader_class.__qualname__, position_limits,
+                        [engine.fill_model, engine.queue_position])
+
+
+def _read_range(path: str, start: int, stop: int) -> List[List[str]]:
+    if stop <= start:
+        return []
+    with open(path, "rb") as f:
+        f.seek(start)
+        chunk = f.read(stop - start)
+    return [line.split(";") for line in chunk.decode().splitlines() if line.strip()]
+
+
+class IndexedDay:
+    """
+    Ticks start:stop of a day read through its TickIndex, replayable by run_backtest like a DayData.
+    """
+
+    def __init__(self, index: TickIndex, start: int = 0, stop: Optional[int] = None) -> None:
+        self.index = index
+        self.round = index.round
+        self.day = index.day
+        self.start = start
+        self.stop = len(index) if stop is None else min(stop, len(index))
+        self._rows = _read_range(prices_path(index.round, index.day), int(index.price_offsets[start]),
+                                 int(index.price_offsets[self.stop]))
+        self._trade_rows = _read_range(trades_path(index.round, index.day), int(index.trade_offsets[start]),
+                                       int(index.trade_offsets[self.stop]))
+        # Every product of the range, not only the first tick's, so one listed later has a PnL slot
+        self.products = sorted({fields[2] for fields in self._rows})
+
+    def ticks(self, max_ticks: Optional[int] = None):
+        rows = iter(self._rows)
+        trades = iter(self._trade_rows)
+        pending_row = next(rows, None)
+        pending_trade = next(trades, None)
+        stop = self.stop if max_ticks is None else min(self.stop, self.start + max_ticks)
+        for tick in range(self.start, stop):
+            timestamp = int(self.index.timestamps[tick])
+            books = {}
+            while pending_row is not None and int(pending_row[1]) == timestamp:
+                product, buy_orders, sell_orders, mid_price = parse_price_row(pending_row)
+                books[product] = (buy_orders, sell_orders, mid_price)
+                pending_row = next(rows, None)
+            tick_trades = []
+            while pending_trade is not None and int(pending_trade[0]) <= timestamp:
+                tick_trades.append(parse_trade_row(pending_trade))
+                pending_trade = next(trades, None)
+            yield timestamp, books, tick_trades
+
+
+class _ReachedTick(Exception):
+    pass
+
+
+class _StopAtTick:
+    """
+    Runs the wrapped trader until the state of timestamp comes in, then keeps that state and stops the replay.
+    """
+
+    def __init__(self, trader, timestamp: int) -> None:
+        self.trader = trader
+        self.timestamp = timestamp
+        self.state = None
+        # So run_backtest puts the trader's StrategyExecutor in deterministic mode
+        self.executor = getattr(trader, "executor", None)
+
+    def run(self, state):
+        if state.timestamp >= self.timestamp:
+            self.state = state
+            raise _ReachedTick()
+        return self.trader.run(state)
+
+
+class Snapshot:
+    """
+    The state of a tick and the trader warmed up to it. replayed is the number of ticks
+    replayed to get there (from start), exact whether the state is the full-day run's
+    (replayed from the start of the day or a checkpoint, not a lookback).
+    """
+
+    def __init__(self, trader, state, tick: int, start: int, elapsed: float, exact: bool) -> None:
+        self.trader = trader
+        self.state = state
+        self.tick = tick
+        self.start = start
+        self.replayed = tick - start
+        self.elapsed = elapsed
+        self.exact = exact
+
+    def run(self, output=None):
+        """
+        trader.run on the snapshot state: the orders, conversions and traderData of the tick.
+        Everything the trader prints goes to output (discarded if None). Advances the
+        trader, so take a new snapshot to look at the tick again.
+        """
+        with contextlib.redirect_stdout(output if output is not None else io.StringIO()):
+            return self.trader.run(self.state)
+
+
+def lookback_ticks(trader) -> int:
+    """
+    Ticks of history the indicators of a trader look at, 0 if it has none of the windows.
+    Only the indicators: a snapshot on this lookback still gets the position and EMAs wrong.
+    """
+    windows = [getattr(trader, name, 0) or 0 for name in ("RSI_WINDOW_TICKS", "PCR_WINDOW_TICKS",
+                                                          "volatility_window")]
+    # One more tick so the RSI finds a tick at or before the start of its window
+    return max(windows) + 1 if any(windows) else 0
+
+
+def snapshot(trader_class, round_num: int, day: int, timestamp: int, lookback: Optional[int] = None,
+             index: Optional[TickIndex] = None, position_limits: Optional[Dict[str, int]] = None,
+             engine: Optional[MatchingEngine] = None) -> Snapshot:
+    """
+    The TradingState of the tick at timestamp and a trader_class() warmed up on
+    the whole day before it, resumed from the nearest checkpoint of the index
+    and leaving new ones, or only on the lookback ticks before it if given
+    (an approximation, see the module docstring).
+    """
+    start_time = time.perf_counter()
+    if index is None:
+        index = TickIndex.load(round_num, day)
+    tick = index.tick(timestamp)
+    trader = trader_class()
+    key = None
+    resume = None
+    if lookback is None:
+        start = 0
+        key = checkpoint_key(trader_class, position_limits, engine)
+        if key is not None:
+            checkpoints = index.checkpoints(key)
+            start = max((checkpoint for checkpoint in checkpoints if checkpoint <= tick), default=0)
+            resume = checkpoints.get(start)
+    else:
+        start = max(0, tick - lookback)
+    capture = _StopAtTick(trader, timestamp)
+    new_checkpoints: List[ReplayState] = []
+    try:
+        run_backtest(capture, IndexedDay(index, start, tick + 1), position_limits=position_limits, engine=engine,
+                     resume=resume, checkpoint_every=CHECKPOINT_EVERY if key is not None else None,
+                     checkpoints=new_checkpoints)
+    except _ReachedTick:
+        pass
+    if new_checkpoints:
+        index.save_checkpoints(key, new_checkpoints)
+    return Snapshot(trader, capture.state, tick, start, time.perf_counter() - start_time, lookback is None)
+
+
+def print_snapshot(snap: Snapshot) -> None:
+    state = snap.state
+    resumed = f" from the checkpoint at tick {snap.start}" if snap.exact and snap.start else ""
+    print(f"Tick {snap.tick} (timestamp {state.timestamp}), warmed on {snap.replayed} ticks{resumed} "
+          f"in {snap.elapsed * 1000:.1f} ms")
+    if not snap.exact:
+        print("  lookback replay: position, cash and EMAs start at the window, not the full-day ones")
+    for product, depth in sorted(state.order_depths.items()):
+        bids = ", ".join(f"{volume}@{price}" for price, volume in sorted(depth.buy_orders.items(), reverse=True))
+        asks = ", ".join(f"{-volume}@{price}" for price, volume in sorted(depth.sell_orders.items()))
+        print(f"  {product:<20} position {state.position.get(product, 0):>4}  bids [{bids}]  asks [{asks}]")
+    for name, trades in (("own trades", state.own_trades), ("market trades", state.market_trades)):
+        for product, product_trades in sorted(trades.items()):
+            print(f"  {name:<14} {product:<20} {product_trades}")
+    print(f"  traderData {len(state.traderData)} bytes")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the TradingState of a tick and the orders sent on it")
+    parser.add_argument("algorithm", help="path to the file defining Trader")
+    parser.add_argument("round", type=int)
+    parser.add_argument("day", type=int)
+    parser.add_argument("timestamp", type=int)
+    parser.add_argument("--lookback", default=None,
+                        help="warm the trader on only this many ticks ('auto': its largest indicator window) "
+                             "instead of the whole day; approximate, the position and EMAs start from scratch")
+    args = parser.parse_args()
+
+    trader_class = load_trader(args.algorithm)
+    lookback = args.lookback
+    if lookback == "auto":
+        lookback = lookback_ticks(trader_class())
+    elif lookback is not None:
+        lookback = int(lookback)
+    snap = snapshot(trader_class, args.round, args.day, args.timestamp, lookback)
+    print_snapshot(snap)
+    orders, _conversions, _trader_data = snap.run()
+    print("Orders:")
+    for product, product_orders in sorted(orders.items()):
+        print(f"  {product:<20} {product_orders}")
+
+
+if __name__ == "__main__":
+    main()
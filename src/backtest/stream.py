@@ -0,0 +1,273 @@
+"""
+Streaming replay over any number of rounds and days.
+
+The prices_ and trades_ CSVs of a day are read line by line through a
+read-ahead buffer of buffer_size bytes per file and merged by timestamp, so
+memory stays at one tick plus the buffers no matter how long the files are.
+Both files are sorted by timestamp, which lets seek() binary search the byte
+offset of the first row of a timestamp instead of reading the rows before it.
+
+    stream = MarketStream(stream_days([1, 2]))
+    stream.seek(1, 0, 500000)
+    for round_num, day, state in stream:
+        ...
+
+A StreamedDay replays through run_backtest like a DayData:
+
+    python src/backtest/stream.py src/round1/trading.py 1 2 --start-day 0 --start-timestamp 500000
+"""
+import argparse
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from backtest import (CURRENCY, BacktestResult, load_trader, parse_price_row, parse_trade_row, print_results,
+                      run_backtest)
+from fastmodel import Listing, Observation, OrderDepth, Trade, TradingState
+from tickstore import available_days, prices_path, trades_path
+
+DEFAULT_BUFFER_SIZE = 1 << 16
+
+
+class _CsvCursor:
+    """
+    Reads a ';' separated file sorted by one timestamp column, one timestamp group at a time.
+    """
+
+    def __init__(self, path: str, time_column: int, buffer_size: int) -> None:
+        self.file = open(path, "rb", buffering=buffer_size)
+        self.file.readline()
+        self.data_start = self.file.tell()
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.time_column = time_column
+        self._pending = None
+
+    def close(self) -> None:
+        self.file.close()
+
+    def _read(self):
+        """
+        (timestamp, fields) of the next row, None at the end of the file.
+        """
+        if self._pending is not None:
+            row = self._pending
+            self._pending = None
+            return row
+        line = self.file.readline()
+        if not line.strip():
+            return None
+        fields = line.decode().rstrip("\r\n").split(";")
+        return int(fields[self.time_column]), fields
+
+    def _line_start(self, offset: int) -> int:
+        """
+        Offset of the first line starting at or after offset, leaves the file there.
+        """
+        if offset <= self.data_start:
+            self.file.seek(self.data_start)
+        else:
+            self.file.seek(offset - 1)
+            self.file.readline()
+        return self.file.tell()
+
+    def seek(self, timestamp: int) -> None:
+        """
+        Positions the cursor on the first row with a timestamp >= timestamp.
+        Binary search over byte offsets: O(log(file size)) short reads.
+        """
+        low, high = self.data_start, self.size
+        while low < high:
+            middle = (low + high) // 2
+            self._line_start(middle)
+            line = self.file.readline()
+            if not line.strip() or int(line.split(b";", self.time_column + 1)[self.time_column]) >= timestamp:
+                high = middle
+            else:
+                low = middle + 1
+        self._line_start(low)
+        self._pending = None
+
+    def take_group(self):
+        """
+        (timestamp, [fields]) of all rows of the next timestamp, None at the end.
+        """
+        row = self._read()
+        if row is None:
+            return None
+        timestamp, fields = row
+        rows = [fields]
+        while True:
+            row = self._read()
+            if row is None:
+                break
+            if row[0] != timestamp:
+                self._pending = row
+                break
+            rows.append(row[1])
+        return timestamp, rows
+
+    def take_until(self, timestamp: int) -> List[List[str]]:
+        """
+        All remaining rows with a timestamp <= timestamp.
+        """
+        rows = []
+        while True:
+            row = self._read()
+            if row is None:
+                break
+            if row[0] > timestamp:
+                self._pending = row
+                break
+            rows.append(row[1])
+        return rows
+
+
+class StreamedDay:
+    """
+    One day of a round read lazily from its CSVs, starting at start_timestamp.
+
+    products holds the products of the first tick, which is read on
+    construction, and grows (kept sorted) as ticks() meets products listed
+    later. ticks() yields the same (timestamp, books, trades) triples as
+    DayData.ticks and can be iterated once; the files are closed when it is
+    exhausted.
+    """
+
+    def __init__(self, round_num: int, day: int, start_timestamp: int = 0,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE) -> None:
+        self.round = round_num
+        self.day = day
+        self._prices = _CsvCursor(prices_path(round_num, day), 1, buffer_size)
+        path = trades_path(round_num, day)
+        self._trades = _CsvCursor(path, 0, buffer_size) if os.path.exists(path) else None
+        if start_timestamp:
+            self._prices.seek(start_timestamp)
+            if self._trades is not None:
+                self._trades.seek(start_timestamp)
+        self._first = self._prices.take_group()
+        self.products = sorted(fields[2] for fields in self._first[1]) if self._first else []
+        self._seen = set(self.products)
+
+    def close(self) -> None:
+        self._prices.close()
+        if self._trades is not None:
+            self._trades.close()
+
+    def ticks(self, max_ticks: Optional[int] = None):
+        group = self._first
+        self._first = None
+        count = 0
+        try:
+            while group is not None and (max_ticks is None or count < max_ticks):
+                timestamp, rows = group
+                books = {}
+                for fields in rows:
+                    product, buy_orders, sell_orders, mid_price = parse_price_row(fields)
+                    books[product] = (buy_orders, sell_orders, mid_price)
+                if not books.keys() <= self._seen:
+                    self._seen.update(books)
+                    self.products[:] = sorted(self._seen)
+                # Trades between two price ticks belong to the later one
+                trades = []
+                if self._trades is not None:
+                    trades = [parse_trade_row(fields) for fields in self._trades.take_until(timestamp)]
+                yield timestamp, books, trades
+                count += 1
+                group = self._prices.take_group()
+        finally:
+            self.close()
+
+
+def stream_days(rounds: List[int], days: Optional[List[int]] = None) -> List[Tuple[int, int]]:
+    """
+    (round, day) of every day with a prices file in the given rounds, optionally only the given days.
+    """
+    return [(round_num, day) for round_num in rounds for day in available_days(round_num)
+            if days is None or day in days]
+
+
+class MarketStream:
+    """
+    Time-ordered replay of several (round, day) pairs, day after day.
+    """
+
+    def __init__(self, days: List[Tuple[int, int]], buffer_size: int = DEFAULT_BUFFER_SIZE) -> None:
+        self.days = sorted(days)
+        self.buffer_size = buffer_size
+        self.start: Optional[Tuple[int, int, int]] = None
+
+    def seek(self, round_num: int, day: int, timestamp: int = 0) -> None:
+        """
+        Starts the next iteration at the first tick at or after (round, day, timestamp).
+        """
+        self.start = (round_num, day, timestamp)
+
+    def streamed_days(self) -> Iterator[StreamedDay]:
+        for round_num, day in self.days:
+            start_timestamp = 0
+            if self.start is not None:
+                if (round_num, day) < self.start[:2]:
+                    continue
+                if (round_num, day) == self.start[:2]:
+                    start_timestamp = self.start[2]
+            yield StreamedDay(round_num, day, start_timestamp, self.buffer_size)
+
+    def ticks(self):
+        """
+        (round, day, timestamp, books, trades) for every tick of every day.
+        """
+        for streamed_day in self.streamed_days():
+            for timestamp, books, trades in streamed_day.ticks():
+                yield streamed_day.round, streamed_day.day, timestamp, books, trades
+
+    def __iter__(self) -> Iterator[Tuple[int, int, TradingState]]:
+        """
+        (round, day, TradingState) per tick. market_trades holds the trades
+        printed since the previous tick of the same day, as on the exchange;
+        there is no trader, so positions and own_trades are empty.
+        """
+        observations = Observation({}, {})
+        listings: Dict[str, Listing] = {}
+        market_trades: Dict[str, List[Trade]] = {}
+        current_day = None
+        for round_num, day, timestamp, books, trades in self.ticks():
+            if (round_num, day) != current_day:
+                current_day = (round_num, day)
+                market_trades = {}
+            order_depths = {}
+            for product, (buy_orders, sell_orders, _) in books.items():
+                order_depths[product] = OrderDepth.of(buy_orders, sell_orders)
+                if product not in listings:
+                    listings[product] = Listing(product, product, CURRENCY)
+            yield round_num, day, TradingState("", timestamp, listings, order_depths, {}, market_trades, {},
+                                               observations)
+            market_trades = {}
+            for trade in trades:
+                market_trades.setdefault(trade.symbol, []).append(trade)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay rounds through a Trader without loading whole days")
+    parser.add_argument("algorithm", help="path to the file defining Trader")
+    parser.add_argument("rounds", type=int, nargs="+")
+    parser.add_argument("--days", type=int, nargs="*", help="days to replay (default: all)")
+    parser.add_argument("--start-round", type=int, default=None)
+    parser.add_argument("--start-day", type=int, default=None)
+    parser.add_argument("--start-timestamp", type=int, default=0)
+    parser.add_argument("--buffer-size", type=int, default=DEFAULT_BUFFER_SIZE,
+                        help="read-ahead buffer per file in bytes")
+    args = parser.parse_args()
+
+    trader_class = load_trader(args.algorithm)
+    stream = MarketStream(stream_days(args.rounds, args.days), args.buffer_size)
+    if args.start_day is not None:
+        start_round = args.start_round if args.start_round is not None else args.rounds[0]
+        stream.seek(start_round, args.start_day, args.start_timestamp)
+    results: List[BacktestResult] = []
+    for streamed_day in stream.streamed_days():
+        # A new Trader per day, as each day is a separate run on the platform
+        results.append(run_backtest(trader_class(), streamed_day))
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
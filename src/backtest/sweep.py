@@ -0,0 +1,254 @@
+"""
+Parallel parameter sweep over Trader attributes.
+
+Every (config, day) pair is a separate backtest task fanned out over a
+process pool. Market data is loaded once in the parent before the pool
+forks, so workers share it copy-on-write instead of parsing their own copy.
+Results are streamed to a CSV as configs finish and ranked at the end.
+With --attribution every backtest is also attributed (src/backtest/attribution.py)
+in the worker, adding spread capture, inventory drift and max drawdown columns.
+
+Usage:
+    python src/backtest/sweep.py src/round1/trading.py 1 --random 200 --workers 8
+    python src/backtest/sweep.py src/round1/trading.py 1 --grid --space space.json
+    python src/backtest/sweep.py src/round1/trading.py 1 --random 50 --attribution
+"""
+import argparse
+import csv
+import gc
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from typing import Dict, Iterator, List
+
+from attribution import attribute, mid_series
+from backtest import DayData, load_day, load_trader, run_backtest
+from tickstore import available_days
+
+# Values are either a list of choices or a (low, high) range for random search.
+# Dotted names address a dict attribute per product, e.g. ema_param.KELP.
+# The squid knobs (ema_param.SQUID_INK, target_position, position_penalty_factor,
+# base_spread, volatility_baseline) only feed squid_strategy, which is registered
+# disabled in src/round1/trading.py, so they are left out until it is switched on.
+DEFAULT_SPACE = {
+    "ema_param.KELP": [0.02, 0.0451, 0.08, 0.12],
+    "RSI_WINDOW_TICKS": [50, 200, 500, 1000],
+    "PCR_WINDOW_TICKS": [50, 200, 500, 1000],
+    "volatility_window": [20, 50, 100],
+}
+
+
+def apply_config(trader, config: Dict) -> None:
+    """
+    Sets the attributes of a config on a Trader instance.
+    Raises AttributeError for an attribute the Trader does not have and KeyError for a
+    dotted key its dict does not have, so a typo in a space cannot sweep a no-op.
+    """
+    for name, value in config.items():
+        attribute, _, key = name.partition(".")
+        if not hasattr(trader, attribute):
+            raise AttributeError(f"{type(trader).__name__} has no attribute {attribute!r} (config key {name!r})")
+        if key:
+            values = getattr(trader, attribute)
+            if key not in values:
+                raise KeyError(f"{attribute} has no key {key!r} (config key {name!r})")
+            values[key] = value
+        else:
+            setattr(trader, name, value)
+
+
+def load_space(path: str) -> Dict:
+    """
+    Reads a search space from JSON: {"choices": {name: [values]}, "ranges": {name: [low, high]}}.
+    """
+    with open(path) as f:
+        loaded = json.load(f)
+    # JSON has no tuples, two-element lists of numbers under "ranges" are ranges
+    return {**loaded.get("choices", {}), **{k: tuple(v) for k, v in loaded.get("ranges", {}).items()}}
+
+
+def grid_configs(space: Dict) -> Iterator[Dict]:
+    """
+    Every combination of the choices in the space.
+    """
+    names = list(space)
+    for values in itertools.product(*(space[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def random_configs(space: Dict, count: int, seed: int = 0) -> Iterator[Dict]:
+    """
+    count configs sampled from the space. Lists are sampled uniformly, (low, high)
+    ranges uniformly in the range (as ints if both bounds are ints).
+    """
+    rng = random.Random(seed)
+    for _ in range(count):
+        config = {}
+        for name, values in space.items():
+            if isinstance(values, tuple) and len(values) == 2:
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    config[name] = rng.randint(low, high)
+                else:
+                    config[name] = rng.uniform(low, high)
+            else:
+                config[name] = rng.choice(values)
+        yield config
+
+
+# Set in the parent before the pool forks and inherited by the workers
+_DAYS: Dict[int, DayData] = {}
+_TRADER_CLASS = None
+_MAX_TICKS = None
+_ATTRIBUTION = False
+# Mid series per day for the attribution, computed once per worker
+_MIDS: Dict[int, Dict] = {}
+
+ATTRIBUTION_COLUMNS = ("spread_capture", "inventory_drift", "max_drawdown")
+
+
+def _init_worker(algorithm: str, round_num: int, days: List[int], max_ticks, attribution: bool = False) -> None:
+    global _TRADER_CLASS, _MAX_TICKS, _ATTRIBUTION
+    _MAX_TICKS = max_ticks
+    _ATTRIBUTION = attribution
+    if _TRADER_CLASS is None:
+        _TRADER_CLASS = load_trader(algorithm)
+    # Without fork (spawn) nothing is inherited and each worker loads the days itself
+    for day in days:
+        if day not in _DAYS:
+            _DAYS[day] = load_day(round_num, day)
+
+
+def _run_task(task):
+    config_id, config, day = task
+    trader = _TRADER_CLASS()
+    apply_config(trader, config)
+    data = _DAYS[day]
+    result = run_backtest(trader, data, max_ticks=_MAX_TICKS)
+    if not _ATTRIBUTION:
+        return config_id, day, result.pnl, None
+    if day not in _MIDS:
+        _MIDS[day] = mid_series(data, sorted(data.products))
+    total = attribute(result, data, mids=_MIDS[day])["total"]
+    return config_id, day, result.pnl, {name: total[name] for name in ATTRIBUTION_COLUMNS}
+
+
+def run_sweep(algorithm: str, round_num: int, configs: List[Dict], days: List[int],
+              workers: int = None, max_ticks: int = None, out_path: str = None,
+              progress: bool = True, attribution: bool = False) -> List[Dict]:
+    """
+    Backtests every config on every day and returns one row per config,
+    sorted by total PnL (best first). Rows are appended to out_path as soon
+    as all days of a config have finished. With attribution, rows also hold
+    the spread capture and inventory drift summed over the days and the
+    worst max drawdown of a day.
+    """
+    global _TRADER_CLASS
+    workers = workers or os.cpu_count()
+    for day in days:
+        if day not in _DAYS:
+            _DAYS[day] = load_day(round_num, day)
+    _TRADER_CLASS = load_trader(algorithm)
+    # Keep the GC from touching (and so copying) the inherited data in the workers
+    gc.freeze()
+
+    names = sorted({name for config in configs for name in config})
+    tasks = [(config_id, config, day) for config_id, config in enumerate(configs) for day in days]
+    pending = {config_id: len(days) for config_id in range(len(configs))}
+    day_pnl: Dict[int, Dict[int, float]] = {config_id: {} for config_id in range(len(configs))}
+    day_attribution: Dict[int, List[Dict]] = {config_id: [] for config_id in range(len(configs))}
+    extra_columns = list(ATTRIBUTION_COLUMNS) if attribution else []
+    rows = []
+
+    out_file = writer = None
+    if out_path:
+        out_file = open(out_path, "w", newline="")
+        writer = csv.writer(out_file)
+        writer.writerow(["config_id", *names, *[f"pnl_day_{day}" for day in days], "pnl_total", *extra_columns])
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    start = time.perf_counter()
+    try:
+        with context.Pool(workers, initializer=_init_worker,
+                          initargs=(algorithm, round_num, days, max_ticks, attribution)) as pool:
+            chunksize = max(1, len(tasks) // (workers * 8))
+            for config_id, day, pnl, terms in pool.imap_unordered(_run_task, tasks, chunksize):
+                day_pnl[config_id][day] = sum(pnl.values())
+                if terms is not None:
+                    day_attribution[config_id].append(terms)
+                pending[config_id] -= 1
+                if pending[config_id]:
+                    continue
+                row = {"config_id": config_id, "config": configs[config_id], "pnl": day_pnl[config_id],
+                       "pnl_total": sum(day_pnl[config_id].values())}
+                if attribution:
+                    terms = day_attribution.pop(config_id)
+                    row["spread_capture"] = sum(t["spread_capture"] for t in terms)
+                    row["inventory_drift"] = sum(t["inventory_drift"] for t in terms)
+                    row["max_drawdown"] = max(t["max_drawdown"] for t in terms)
+                rows.append(row)
+                if writer is not None:
+                    writer.writerow([config_id, *[configs[config_id].get(name) for name in names],
+                                     *[row["pnl"][day] for day in days], row["pnl_total"],
+                                     *[row[column] for column in extra_columns]])
+                    out_file.flush()
+                if progress:
+                    best = max(rows, key=lambda r: r["pnl_total"])
+                    print(f"[{len(rows)}/{len(configs)}] {time.perf_counter() - start:.0f}s "
+                          f"config {config_id}: {row['pnl_total']:,.1f} (best {best['config_id']}: "
+                          f"{best['pnl_total']:,.1f})", file=sys.stderr)
+    finally:
+        if out_file is not None:
+            out_file.close()
+        gc.unfreeze()
+
+    rows.sort(key=lambda r: r["pnl_total"], reverse=True)
+    return rows
+
+
+def print_ranking(rows: List[Dict], days: List[int], top: int = 20) -> None:
+    for rank, row in enumerate(rows[:top], 1):
+        per_day = "  ".join(f"{row['pnl'][day]:>10,.1f}" for day in days)
+        terms = ""
+        if "spread_capture" in row:
+            terms = (f"  spread {row['spread_capture']:>10,.1f} drift {row['inventory_drift']:>10,.1f} "
+                     f"DD {row['max_drawdown']:>8,.1f}")
+        print(f"{rank:>3}. {row['pnl_total']:>12,.1f}  [{per_day}]{terms}  {row['config']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sweep Trader parameters over backtests")
+    parser.add_argument("algorithm", help="path to the file defining Trader")
+    parser.add_argument("round", type=int)
+    parser.add_argument("--days", type=int, nargs="*", help="days to replay (default: all)")
+    parser.add_argument("--space", help="JSON file with the search space (default: DEFAULT_SPACE)")
+    search = parser.add_mutually_exclusive_group()
+    search.add_argument("--grid", action="store_true", help="exhaustive grid search")
+    search.add_argument("--random", type=int, default=100, help="number of random configs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-ticks", type=int, default=None)
+    parser.add_argument("--out", default="sweep_results.csv", help="CSV the results are streamed to")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--attribution", action="store_true",
+                        help="attribute every backtest into spread capture, inventory drift and drawdown")
+    args = parser.parse_args()
+
+    space = load_space(args.space) if args.space else DEFAULT_SPACE
+    days = args.days or available_days(args.round)
+    configs = list(grid_configs(space)) if args.grid else list(random_configs(space, args.random, args.seed))
+
+    start = time.perf_counter()
+    rows = run_sweep(args.algorithm, args.round, configs, days, args.workers, args.max_ticks, args.out,
+                     attribution=args.attribution)
+    print(f"{len(configs)} configs x {len(days)} days in {time.perf_counter() - start:.1f}s")
+    print_ranking(rows, days, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Columnar tick store for the round CSVs.
+
+A one-time conversion turns every prices_round_R_day_D.csv and
+trades_round_R_day_D.csv into typed .npy columns under
+data/<round dir>/store/day_<D>/. Rows are sorted by (product, timestamp) so
+each product is a contiguous slice, and the columns are opened memory-mapped:
+opening a day only reads its meta.json and per-product views never copy.
+
+Usage:
+    python src/backtest/tickstore.py 1        # convert every day of round 1
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import time
+from typing import Dict, List
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DATA_DIR = os.path.join(ROOT, "data")
+STORE_DIRNAME = "store"
+
+PRICE_LEVELS = 3
+PRICE_COLUMNS = {
+    "timestamp": np.int32,
+    "product": np.uint8,
+    **{f"bid_price_{i}": np.int32 for i in range(1, PRICE_LEVELS + 1)},
+    **{f"bid_volume_{i}": np.int32 for i in range(1, PRICE_LEVELS + 1)},
+    **{f"ask_price_{i}": np.int32 for i in range(1, PRICE_LEVELS + 1)},
+    **{f"ask_volume_{i}": np.int32 for i in range(1, PRICE_LEVELS + 1)},
+    "mid_price": np.float64,
+    "profit_and_loss": np.float64,
+}
+TRADE_COLUMNS = {
+    "timestamp": np.int32,
+    "symbol": np.uint8,
+    "buyer": np.int16,
+    "seller": np.int16,
+    "price": np.float64,
+    "quantity": np.int32,
+}
+
+
+def round_dir(round_num: int) -> str:
+    """
+    Returns the data directory of a round, e.g. data/round-1-island-data-bottle.
+    """
+    prefix = f"round-{round_num}-"
+    for name in sorted(os.listdir(DATA_DIR)):
+        if name.startswith(prefix) and os.path.isdir(os.path.join(DATA_DIR, name)):
+            return os.path.join(DATA_DIR, name)
+    raise FileNotFoundError(f"No data directory for round {round_num} in {DATA_DIR}")
+
+
+def available_days(round_num: int) -> List[int]:
+    """
+    Returns the days of a round that have a prices file.
+    """
+    pattern = re.compile(rf"prices_round_{round_num}_day_(-?\d+)\.csv$")
+    days = []
+    for name in os.listdir(round_dir(round_num)):
+        match = pattern.match(name)
+        if match:
+            days.append(int(match.group(1)))
+    return sorted(days)
+
+
+def prices_path(round_num: int, day: int) -> str:
+    return os.path.join(round_dir(round_num), f"prices_round_{round_num}_day_{day}.csv")
+
+
+def trades_path(round_num: int, day: int) -> str:
+    return os.path.join(round_dir(round_num), f"trades_round_{round_num}_day_{day}.csv")
+
+
+def day_store_path(round_num: int, day: int) -> str:
+    return os.path.join(round_dir(round_num), STORE_DIRNAME, f"day_{day}")
+
+
+def _source_stamp(path: str):
+    """
+    (size, mtime) of a source file, used to detect stale conversions.
+    """
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _sorted_slices(products: np.ndarray, timestamps: np.ndarray, n_products: int):
+    """
+    Returns the permutation sorting rows by (product, timestamp) and the
+    [start, stop) row range of every product after sorting.
+    """
+    order = np.lexsort((timestamps, products))
+    counts = np.bincount(products, minlength=n_products)
+    stops = np.cumsum(counts)
+    starts = stops - counts
+    return order, [[int(start), int(stop)] for start, stop in zip(starts, stops)]
+
+
+def convert_day(round_num: int, day: int) -> str:
+    """
+    Converts the prices and trades CSVs of a day into the columnar store.
+    Returns the store directory.
+    """
+    products: Dict[str, int] = {}
+    traders: Dict[str, int] = {"": 0}
+
+    prices = {name: [] for name in PRICE_COLUMNS}
+    level_columns = [name for name in PRICE_COLUMNS if name.startswith(("bid_", "ask_"))]
+    with open(prices_path(round_num, day), newline="") as f:
+        reader = csv.reader(f, delimiter=";")
+        header = next(reader)
+        index = {name: header.index(name) for name in PRICE_COLUMNS if name != "product"}
+        product_index = header.index("product")
+        for row in reader:
+            prices["timestamp"].append(int(row[index["timestamp"]]))
+            prices["product"].append(products.setdefault(row[product_index], len(products)))
+            # Empty book levels are stored as price 0 and volume 0, prices are never 0
+            for name in level_columns:
+                cell = row[index[name]]
+                prices[name].append(int(cell) if cell else 0)
+            mid = row[index["mid_price"]]
+            prices["mid_price"].append(float(mid) if mid else np.nan)
+            pnl = row[index["profit_and_loss"]]
+            prices["profit_and_loss"].append(float(pnl) if pnl else 0.0)
+
+    trades = {name: [] for name in TRADE_COLUMNS}
+    source_trades = trades_path(round_num, day)
+    if os.path.exists(source_trades):
+        with open(source_trades, newline="") as f:
+            reader = csv.reader(f, delimiter=";")
+            header = next(reader)
+            index = {name: header.index(name) for name in TRADE_COLUMNS}
+            for row in reader:
+                trades["timestamp"].append(int(row[index["timestamp"]]))
+                trades["symbol"].append(products.setdefault(row[index["symbol"]], len(products)))
+                trades["buyer"].append(traders.setdefault(row[index["buyer"]], len(traders)))
+                trades["seller"].append(traders.setdefault(row[index["seller"]], len(traders)))
+                trades["price"].append(float(row[index["price"]]))
+                trades["quantity"].append(int(row[index["quantity"]]))
+
+    prices = {name: np.asarray(values, dtype=PRICE_COLUMNS[name]) for name, values in prices.items()}
+    trades = {name: np.asarray(values, dtype=TRADE_COLUMNS[name]) for name, values in trades.items()}
+    price_order, price_offsets = _sorted_slices(prices["product"], prices["timestamp"], len(products))
+    trade_order, trade_offsets = _sorted_slices(trades["symbol"], trades["timestamp"], len(products))
+
+    path = day_store_path(round_num, day)
+    os.makedirs(path, exist_ok=True)
+    # meta.json is written last so a half-finished conversion is never picked up
+    meta_path = os.path.join(path, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    for name, values in prices.items():
+        np.save(os.path.join(path, f"prices.{name}.npy"), values[price_order])
+    for name, values in trades.items():
+        np.save(os.path.join(path, f"trades.{name}.npy"), values[trade_order])
+
+    names = list(products)
+    meta = {
+        "round": round_num,
+        "day": day,
+        "products": names,
+        "traders": list(traders),
+        "prices": {"rows": int(len(price_order)), "offsets": dict(zip(names, price_offsets))},
+        "trades": {"rows": int(len(trade_order)), "offsets": dict(zip(names, trade_offsets))},
+        "sources": {
+            "prices": _source_stamp(prices_path(round_num, day)),
+            "trades": _source_stamp(source_trades),
+        },
+    }
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    return path
+
+
+def is_converted(round_num: int, day: int) -> bool:
+    """
+    True if the store of a day exists and was built from the current CSVs.
+    """
+    meta_path = os.path.join(day_store_path(round_num, day), "meta.json")
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path) as f:
+        sources = json.load(f)["sources"]
+    return (sources["prices"] == _source_stamp(prices_path(round_num, day))
+            and sources["trades"] == _source_stamp(trades_path(round_num, day)))
+
+
+def convert_round(round_num: int, force: bool = False) -> List[int]:
+    """
+    Converts every day of a round that is missing or stale. Returns the days converted.
+    """
+    converted = []
+    for day in available_days(round_num):
+        if force or not is_converted(round_num, day):
+            convert_day(round_num, day)
+            converted.append(day)
+    return converted
+
+
+class StoreDay:
+    """
+    Memory-mapped view over a converted day. Columns are opened on first use.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.round = self.meta["round"]
+        self.day = self.meta["day"]
+        self.products: List[str] = self.meta["products"]
+        self.traders: List[str] = self.meta["traders"]
+        self._columns: Dict[str, np.ndarray] = {}
+
+    def column(self, table: str, name: str) -> np.ndarray:
+        """
+        Full column of the 'prices' or 'trades' table, sorted by (product, timestamp).
+        """
+        key = f"{table}.{name}"
+        values = self._columns.get(key)
+        if values is None:
+            values = self._columns[key] = np.load(os.path.join(self.path, key + ".npy"), mmap_mode="r")
+        return values
+
+    def _view(self, table: str, columns, product: str) -> Dict[str, np.ndarray]:
+        start, stop = self.meta[table]["offsets"].get(product, (0, 0))
+        return {name: self.column(table, name)[start:stop] for name in columns}
+
+    def prices(self, product: str) -> Dict[str, np.ndarray]:
+        """
+        Zero-copy views of every prices column for one product, in timestamp order.
+        """
+        return self._view("prices", PRICE_COLUMNS, product)
+
+    def trades(self, product: str) -> Dict[str, np.ndarray]:
+        """
+        Zero-copy views of every trades column for one product, in timestamp order.
+        """
+        return self._view("trades", TRADE_COLUMNS, product)
+
+    def price_row(self, product: str, timestamp: int) -> int:
+        """
+        Row index (into the full prices columns) of a product at a timestamp, or -1.
+        """
+        start, stop = self.meta["prices"]["offsets"].get(product, (0, 0))
+        timestamps = self.column("prices", "timestamp")
+        row = start + int(np.searchsorted(timestamps[start:stop], timestamp))
+        if row < stop and timestamps[row] == timestamp:
+            return row
+        return -1
+
+
+class TickStore:
+    """
+    Converted days of a round, keyed by day. Days are opened lazily and cached.
+    """
+
+    def __init__(self, round_num: int, convert: bool = True) -> None:
+        self.round = round_num
+        if convert:
+            convert_round(round_num)
+        self.days = [day for day in available_days(round_num)
+                     if os.path.exists(os.path.join(day_store_path(round_num, day), "meta.json"))]
+        self._open: Dict[int, StoreDay] = {}
+
+    def day(self, day: int) -> StoreDay:
+        store_day = self._open.get(day)
+        if store_day is None:
+            store_day = self._open[day] = StoreDay(day_store_path(self.round, day))
+        return store_day
+
+    def prices(self, day: int, product: str) -> Dict[str, np.ndarray]:
+        return self.day(day).prices(product)
+
+    def trades(self, day: int, product: str) -> Dict[str, np.ndarray]:
+        return self.day(day).trades(product)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert round CSVs into the columnar tick store")
+    parser.add_argument("round", type=int)
+    parser.add_argument("--force", action="store_true", help="reconvert days that are up to date")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    converted = convert_round(args.round, force=args.force)
+    print(f"Converted days {converted} in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    store = TickStore(args.round, convert=False)
+    for day in store.days:
+        store_day = store.day(day)
+        for product in store_day.products:
+            store_day.prices(product)
+            store_day.trades(product)
+    print(f"Opened {len(store.days)} days in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Trade-flow feature series over whole days, for research.
+
+Vectorized counterpart of src/common/tradeflow.py: for every tick of a day it
+gives the features a ProductFlow holds after that tick's update, fed the way
+the Trader is fed in a backtest (the market trades printed at the previous
+tick, before any of them are taken by our orders). Trades are classified
+against the mid of the tick they printed at, with the tick test and the
+carried side for trades at the mid.
+
+Usage:
+    python src/backtest/tradeflow_series.py 1
+    python src/backtest/tradeflow_series.py 1 --days 0 --window 50 --out flow.npz --check
+"""
+import argparse
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from backtest import DayData, load_day
+from tickstore import available_days
+from tradeflow import BUY, FLOW_WINDOW, SELL, ProductFlow
+
+SERIES = ("buy_volume", "sell_volume", "signed_volume", "volume_sum", "imbalance", "vwap", "arrival_rate")
+
+
+def _rolling(per_tick: np.ndarray, window: int) -> np.ndarray:
+    total = np.cumsum(per_tick)
+    total[window:] -= total[:-window].copy()
+    return total
+
+
+def _carry_forward(sides: np.ndarray) -> np.ndarray:
+    """
+    Replaces every 0 by the last non-zero value before it (0 if there is none).
+    """
+    last = np.maximum.accumulate(np.where(sides != 0, np.arange(len(sides)), -1))
+    return np.where(last >= 0, sides[np.maximum(last, 0)], 0)
+
+
+def flow_series(data: DayData, product: str, window: int = FLOW_WINDOW) -> Dict[str, np.ndarray]:
+    """
+    timestamp plus every name in SERIES, one value per tick (NaN for imbalance and vwap without trades).
+    """
+    timestamps = np.array(data.timestamps, dtype=np.int64)
+    n = len(timestamps)
+    mids = np.array([_mid(data.books[timestamp].get(product)) for timestamp in data.timestamps],
+                    dtype=np.float64)
+    # Last known mid at or before every tick
+    last = np.maximum.accumulate(np.where(~np.isnan(mids), np.arange(n), -1))
+    known_mid = np.where(last >= 0, mids[np.maximum(last, 0)], np.nan)
+
+    ticks: List[int] = []
+    prices: List[float] = []
+    quantities: List[int] = []
+    for tick in range(1, n):
+        for trade in data.trades.get(data.timestamps[tick - 1], ()):
+            if trade.symbol == product:
+                ticks.append(tick)
+                prices.append(trade.price)
+                quantities.append(trade.quantity)
+    ticks = np.array(ticks, dtype=np.int64)
+    prices = np.array(prices, dtype=np.float64)
+    quantities = np.array(quantities, dtype=np.int64)
+
+    # Against the mid the trade printed at, then the tick test, then the side carried over
+    trade_mids = known_mid[ticks - 1]
+    sides = np.where(np.isnan(trade_mids), 0, np.sign(prices - np.nan_to_num(trade_mids))).astype(np.int64)
+    tick_test = np.sign(np.diff(prices, prepend=prices[:1])).astype(np.int64)
+    sides = _carry_forward(np.where(sides != 0, sides, tick_test))
+
+    buy = _rolling(np.bincount(ticks, weights=np.where(sides == BUY, quantities, 0), minlength=n), window)
+    sell = _rolling(np.bincount(ticks, weights=np.where(sides == SELL, quantities, 0), minlength=n), window)
+    volume = _rolling(np.bincount(ticks, weights=quantities, minlength=n), window)
+    notional = _rolling(np.bincount(ticks, weights=prices * quantities, minlength=n), window)
+    count = _rolling(np.bincount(ticks, minlength=n).astype(np.float64), window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        imbalance = np.where(volume > 0, (buy - sell) / volume, np.nan)
+        vwap = np.where(volume > 0, notional / volume, np.nan)
+    return {
+        "timestamp": timestamps,
+        "buy_volume": buy,
+        "sell_volume": sell,
+        "signed_volume": buy - sell,
+        "volume_sum": volume,
+        "imbalance": imbalance,
+        "vwap": vwap,
+        "arrival_rate": count / np.minimum(np.arange(1, n + 1), window),
+    }
+
+
+def _mid(book) -> float:
+    if book is None or book[2] is None:
+        return np.nan
+    return book[2]
+
+
+def streamed_series(data: DayData, product: str, window: int = FLOW_WINDOW) -> Dict[str, np.ndarray]:
+    """
+    The same series from a ProductFlow updated tick by tick, to check flow_series against.
+    """
+    flow = ProductFlow(window)
+    rows = {name: [] for name in SERIES}
+    previous = None
+    for timestamp in data.timestamps:
+        trades = [trade for trade in data.trades.get(previous, ()) if trade.symbol == product]
+        book = data.books[timestamp].get(product)
+        flow.update(trades, book[2] if book is not None else None)
+        previous = timestamp
+        for name in SERIES:
+            value = getattr(flow, name)
+            rows[name].append(np.nan if value is None else value)
+    return {name: np.array(values, dtype=np.float64) for name, values in rows.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Trade-flow feature series over the trades CSVs")
+    parser.add_argument("round", type=int)
+    parser.add_argument("--days", type=int, nargs="*", help="days to compute (default: all)")
+    parser.add_argument("--window", type=int, default=FLOW_WINDOW, help="ticks in the rolling window")
+    parser.add_argument("--out", help="write the series to this .npz, keys <day>/<product>/<series>")
+    parser.add_argument("--check", action="store_true", help="compare against the streaming ProductFlow")
+    args = parser.parse_args()
+
+    arrays = {}
+    for day in args.days or available_days(args.round):
+        data = load_day(args.round, day)
+        for product in sorted(data.products):
+            start = time.perf_counter()
+            series = flow_series(data, product, args.window)
+            elapsed = time.perf_counter() - start
+            buy_share = series["buy_volume"].sum() / max(1.0, series["volume_sum"].sum())
+            print(f"day {day:>3} {product:<20} {elapsed * 1000:6.1f} ms  "
+                  f"mean arrival {series['arrival_rate'].mean():.3f}/tick  buy share {buy_share:.1%}  "
+                  f"mean signed volume {series['signed_volume'].mean():+.2f}")
+            if args.check:
+                streamed = streamed_series(data, product, args.window)
+                for name in SERIES:
+                    if not np.allclose(series[name], streamed[name], equal_nan=True):
+                        print(f"  {name} differs from the streaming ProductFlow")
+            for name, values in series.items():
+                arrays[f"{day}/{product}/{name}"] = values
+    if args.out:
+        np.savez(args.out, **arrays)
+
+
+if __name__ == "__main__":
+    main()
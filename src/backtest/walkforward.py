@@ -0,0 +1,398 @@
+"""
+Walk-forward validation of Trader parameters.
+
+Days are split into folds of training days and a held-out test day. In each
+fold the config with the best total PnL over the training days is picked and
+then evaluated on the test day, next to the Trader defaults. The training
+PnL of every config and the test PnL of the picked one show how much of the
+tuning carries over to a day it has not seen.
+
+Everything expensive is cached on disk under content hashes, so a rerun only
+recomputes what changed:
+
+    data/        parsed DayData per day      key: hash of the day's CSVs, loader code hash
+    indicators/  indicator series            key: day hash, loader and signals code hashes,
+                                                  product, indicator params
+    results/     backtest of (config, day)   key: code hash, config, day hash, max_ticks
+
+The code hash covers the algorithm, src/common and the backtester, so editing
+the strategy invalidates the results but not the parsed data. The data and
+indicator keys only fold in the code that produces them (DAY_SOURCES and
+SIGNAL_SOURCES), so editing the loader or signals.py invalidates those too.
+
+Usage:
+    python src/backtest/walkforward.py src/round1/trading.py 1 --random 50 --workers 8
+    python src/backtest/walkforward.py src/round1/trading.py 1 --scheme leave-one-out --space space.json
+"""
+import argparse
+import gc
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backtest import COMMON_DIR, DATA_DIR, ROOT, DayData, load_day, load_trader, run_backtest, shared_day_data
+from signals import BUY, SELL, SIGNAL_NAMES, indicator_series
+from sweep import DEFAULT_SPACE, apply_config, grid_configs, load_space, random_configs
+from tickstore import available_days, prices_path, trades_path
+
+CACHE_DIR = os.path.join(ROOT, ".cache", "walkforward")
+BACKTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ROLLING = "rolling"
+EXPANDING = "expanding"
+LEAVE_ONE_OUT = "leave-one-out"
+SCHEMES = (ROLLING, EXPANDING, LEAVE_ONE_OUT)
+
+# The modules that produce the cached DayData (pickled fastmodel objects) and indicator series
+DAY_SOURCES = [os.path.join(BACKTEST_DIR, name) for name in ("backtest.py", "tickstore.py", "fastmodel.py")]
+SIGNAL_SOURCES = [os.path.join(BACKTEST_DIR, "signals.py")]
+
+# Products whose strategies trade on the RSI/PCR signal
+SIGNAL_PRODUCTS = ("KELP", "SQUID_INK")
+SIGNAL_HORIZON = 10
+
+
+def content_hash(*parts) -> str:
+    """
+    sha256 of JSON-able parts (dict keys sorted, so equal configs hash equal).
+    """
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def file_hash(paths: List[str]) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.encode())
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def day_hash(round_num: int, day: int) -> str:
+    return file_hash([prices_path(round_num, day), trades_path(round_num, day)])
+
+
+def source_hash(paths: List[str]) -> str:
+    """
+    Hash of source files, their names taken relative to ROOT so the cache survives moving the checkout.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.relpath(path, ROOT).encode())
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def code_hash(algorithm: str) -> str:
+    """
+    Hash of everything that decides a backtest result besides config and data: the algorithm
+    and the modules next to it, src/common, every module of src/backtest (the backtester
+    imports fastmodel, matching, tickstore, shmserver, ...) and data/datamodel.py.
+    """
+    algorithm = os.path.abspath(algorithm)
+    paths = [algorithm]
+    for directory in (os.path.dirname(algorithm), COMMON_DIR, BACKTEST_DIR):
+        paths += [path for path in sorted(glob.glob(os.path.join(directory, "*.py"))) if path not in paths]
+    paths.append(os.path.join(DATA_DIR, "datamodel.py"))
+    return source_hash(paths)
+
+
+class Cache:
+    """
+    Content-addressed files under directory/<kind>/<key>.<ext>, written atomically.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR) -> None:
+        self.directory = directory
+        self.day_code = source_hash(DAY_SOURCES)
+        self.signal_code = source_hash(SIGNAL_SOURCES)
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, kind: str, key: str, ext: str) -> str:
+        return os.path.join(self.directory, kind, f"{key}.{ext}")
+
+    def _write(self, path: str, write) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+
+    def day(self, round_num: int, day: int, key: str) -> DayData:
+        # A day the shared-memory server publishes is read from there, a pickled copy would defeat it
+        data = shared_day_data(round_num, day)
+        if data is not None:
+            return data
+        path = self.path("data", content_hash(key, self.day_code), "pickle")
+        if os.path.exists(path):
+            self.hits += 1
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        self.misses += 1
+        data = load_day(round_num, day)
+        self._write(path, lambda f: pickle.dump(data, f, pickle.HIGHEST_PROTOCOL))
+        return data
+
+    def indicators(self, data: DayData, data_key: str, product: str, params: Dict) -> Dict[str, np.ndarray]:
+        """
+        indicator_series of a product's mid prices over a day, plus the timestamps and prices used.
+        """
+        path = self.path("indicators", content_hash(data_key, self.day_code, self.signal_code, product, params),
+                         "npz")
+        if os.path.exists(path):
+            self.hits += 1
+            with np.load(path) as loaded:
+                return dict(loaded)
+        self.misses += 1
+        timestamps = []
+        prices = []
+        for timestamp in data.timestamps:
+            book = data.books[timestamp].get(product)
+            if book is not None and book[2] is not None:
+                timestamps.append(timestamp)
+                prices.append(book[2])
+        timestamps = np.array(timestamps, dtype=np.int64)
+        prices = np.array(prices, dtype=np.float64)
+        series = indicator_series(timestamps, prices, **params)
+        series["timestamp"] = timestamps
+        series["price"] = prices
+        self._write(path, lambda f: np.savez(f, **series))
+        return series
+
+    def result(self, key: str) -> Optional[Dict]:
+        path = self.path("results", key, "json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def store_result(self, key: str, result: Dict) -> None:
+        self._write(self.path("results", key, "json"), lambda f: f.write(json.dumps(result).encode()))
+
+
+def folds(days: List[int], scheme: str = ROLLING, train_days: int = 1) -> List[Tuple[List[int], int]]:
+    """
+    (training days, test day) pairs. rolling trains on the train_days days
+    before each test day, expanding on every earlier day, leave-one-out on
+    all other days.
+    """
+    days = sorted(days)
+    if scheme == LEAVE_ONE_OUT:
+        return [([other for other in days if other != day], day) for day in days]
+    if scheme not in (ROLLING, EXPANDING):
+        raise ValueError(f"Unknown scheme {scheme!r}, expected one of {SCHEMES}")
+    pairs = []
+    for i in range(train_days, len(days)):
+        start = 0 if scheme == EXPANDING else i - train_days
+        pairs.append((days[start:i], days[i]))
+    return pairs
+
+
+# Set in the parent before the pool forks and inherited by the workers
+_DAYS: Dict[int, DayData] = {}
+_TRADER_CLASS = None
+_MAX_TICKS = None
+
+
+def _run_cell(task):
+    key, config, day = task
+    trader = _TRADER_CLASS()
+    apply_config(trader, config)
+    result = run_backtest(trader, _DAYS[day], max_ticks=_MAX_TICKS)
+    return key, {"pnl": result.pnl, "pnl_total": result.total_pnl, "fills": len(result.fills),
+                 "rejected": result.rejected, "ticks": result.ticks}
+
+
+class WalkForward:
+
+    def __init__(self, algorithm: str, round_num: int, days: List[int], cache: Optional[Cache] = None,
+                 workers: Optional[int] = None, max_ticks: Optional[int] = None) -> None:
+        self.algorithm = algorithm
+        self.round = round_num
+        self.days = sorted(days)
+        self.cache = cache or Cache()
+        self.workers = workers or os.cpu_count()
+        self.max_ticks = max_ticks
+        self.trader_class = load_trader(algorithm)
+        self.code_key = code_hash(algorithm)
+        self.day_keys = {day: day_hash(round_num, day) for day in self.days}
+        self.computed = 0
+
+    def cell_key(self, config: Dict, day: int) -> str:
+        return content_hash("result", self.code_key, config, self.day_keys[day], self.max_ticks)
+
+    def evaluate(self, configs: List[Dict], days: List[int]) -> Dict[Tuple[int, int], Dict]:
+        """
+        {(config index, day): result} for every pair, backtesting only the cells not in the cache.
+        """
+        global _TRADER_CLASS, _MAX_TICKS
+        results = {}
+        missing = {}
+        for config_id, config in enumerate(configs):
+            for day in days:
+                key = self.cell_key(config, day)
+                cached = self.cache.result(key)
+                if cached is not None:
+                    self.cache.hits += 1
+                    results[(config_id, day)] = cached
+                else:
+                    self.cache.misses += 1
+                    missing.setdefault(key, (config, day, []))[2].append(config_id)
+        if not missing:
+            return results
+
+        needed = sorted({day for _, day, _ in missing.values()})
+        for day in needed:
+            if day not in _DAYS:
+                _DAYS[day] = self.cache.day(self.round, day, self.day_keys[day])
+        _TRADER_CLASS = self.trader_class
+        _MAX_TICKS = self.max_ticks
+        tasks = [(key, config, day) for key, (config, day, _) in missing.items()]
+        # Keep the GC from touching (and so copying) the inherited data in the workers
+        gc.freeze()
+        try:
+            methods = multiprocessing.get_all_start_methods()
+            if "fork" in methods and self.workers > 1 and len(tasks) > 1:
+                with multiprocessing.get_context("fork").Pool(min(self.workers, len(tasks))) as pool:
+                    done = pool.imap_unordered(_run_cell, tasks)
+                    self._collect(done, missing, results)
+            else:
+                self._collect(map(_run_cell, tasks), missing, results)
+        finally:
+            gc.unfreeze()
+        return results
+
+    def _collect(self, done, missing, results) -> None:
+        for key, result in done:
+            self.cache.store_result(key, result)
+            self.computed += 1
+            _, day, config_ids = missing[key]
+            for config_id in config_ids:
+                results[(config_id, day)] = result
+
+    def signal_summary(self, config: Dict, days: List[int]) -> Dict[str, Dict]:
+        """
+        Per signal product, the number of buy/sell signals of the config's
+        indicators over the days and the mean SIGNAL_HORIZON-tick move after them.
+        """
+        trader = self.trader_class()
+        apply_config(trader, config)
+        summary = {}
+        for product in SIGNAL_PRODUCTS:
+            params = {"ema_alpha": trader.ema_param[product], "rsi_window": trader.RSI_WINDOW_TICKS,
+                      "pcr_window": trader.PCR_WINDOW_TICKS, "volatility_window": trader.volatility_window}
+            moves = {BUY: [], SELL: []}
+            for day in days:
+                data = _DAYS.get(day)
+                if data is None:
+                    data = _DAYS[day] = self.cache.day(self.round, day, self.day_keys[day])
+                series = self.cache.indicators(data, self.day_keys[day], product, params)
+                prices = series["price"]
+                forward = np.full(len(prices), np.nan)
+                forward[:-SIGNAL_HORIZON] = prices[SIGNAL_HORIZON:] - prices[:-SIGNAL_HORIZON]
+                for code in moves:
+                    moves[code].append(forward[series["signal"] == code])
+            summary[product] = {}
+            for code, parts in moves.items():
+                values = np.concatenate(parts)
+                summary[product][SIGNAL_NAMES[code]] = {
+                    "count": int(len(values)),
+                    "mean_move": float(np.nanmean(values)) if np.isfinite(values).any() else float("nan"),
+                }
+        return summary
+
+    def run(self, configs: List[Dict], scheme: str = ROLLING, train_days: int = 1) -> List[Dict]:
+        """
+        One row per fold: the picked config, its training and test PnL, the
+        test PnL of the Trader defaults and the signal summaries.
+        """
+        pairs = folds(self.days, scheme, train_days)
+        if not pairs:
+            raise ValueError(f"{len(self.days)} days are not enough for a {scheme} split with {train_days} training days")
+        # The defaults go first, so ties keep the untuned Trader
+        configs = [{}] + [config for config in configs if config]
+        train_union = sorted({day for train, _ in pairs for day in train})
+        train_results = self.evaluate(configs, train_union)
+
+        rows = []
+        for train, test in pairs:
+            train_pnl = [sum(train_results[(config_id, day)]["pnl_total"] for day in train)
+                         for config_id in range(len(configs))]
+            best_id = max(range(len(configs)), key=lambda config_id: train_pnl[config_id])
+            test_results = self.evaluate([configs[best_id], {}], [test])
+            rows.append({
+                "train_days": train,
+                "test_day": test,
+                "config": configs[best_id],
+                "train_pnl": train_pnl[best_id],
+                "train_pnl_default": train_pnl[0],
+                "test_pnl": test_results[(0, test)]["pnl_total"],
+                "test_pnl_default": test_results[(1, test)]["pnl_total"],
+                "train_signals": self.signal_summary(configs[best_id], train),
+                "test_signals": self.signal_summary(configs[best_id], [test]),
+            })
+        return rows
+
+
+def print_folds(rows: List[Dict]) -> None:
+    for row in rows:
+        print(f"Train {row['train_days']} -> test {row['test_day']}: {row['config'] or 'defaults'}")
+        print(f"  train PnL {row['train_pnl']:>12,.1f}  (defaults {row['train_pnl_default']:>12,.1f})")
+        print(f"  test PnL  {row['test_pnl']:>12,.1f}  (defaults {row['test_pnl_default']:>12,.1f})")
+        for product in row["train_signals"]:
+            parts = []
+            for name in ("buy", "sell"):
+                train = row["train_signals"][product][name]
+                test = row["test_signals"][product][name]
+                parts.append(f"{name} {train['count']}/{test['count']} "
+                             f"(move {train['mean_move']:+.3f}/{test['mean_move']:+.3f})")
+            print(f"  {product:<10} signals train/test: " + ", ".join(parts))
+    if len(rows) > 1:
+        print(f"Total test PnL {sum(row['test_pnl'] for row in rows):,.1f} "
+              f"(defaults {sum(row['test_pnl_default'] for row in rows):,.1f})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Walk-forward validation of Trader parameters")
+    parser.add_argument("algorithm", help="path to the file defining Trader")
+    parser.add_argument("round", type=int)
+    parser.add_argument("--days", type=int, nargs="*", help="days to use (default: all)")
+    parser.add_argument("--scheme", choices=SCHEMES, default=ROLLING)
+    parser.add_argument("--train-days", type=int, default=1, help="training days per fold with --scheme rolling")
+    parser.add_argument("--space", help="JSON file with the search space (default: sweep.DEFAULT_SPACE)")
+    search = parser.add_mutually_exclusive_group()
+    search.add_argument("--grid", action="store_true", help="exhaustive grid search")
+    search.add_argument("--random", type=int, default=50, help="number of random configs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-ticks", type=int, default=None)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    args = parser.parse_args()
+
+    space = load_space(args.space) if args.space else DEFAULT_SPACE
+    configs = list(grid_configs(space)) if args.grid else list(random_configs(space, args.random, args.seed))
+    days = args.days or available_days(args.round)
+
+    start = time.perf_counter()
+    walk = WalkForward(args.algorithm, args.round, days, Cache(args.cache_dir), args.workers, args.max_ticks)
+    rows = walk.run(configs, args.scheme, args.train_days)
+    print_folds(rows)
+    print(f"{time.perf_counter() - start:.1f}s, {walk.computed} backtests run, "
+          f"cache {walk.cache.hits} hits / {walk.cache.misses} misses", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Per-tick view over an OrderDepth with lazily computed, cached book features.
+
+Build one BookSnapshot per symbol per tick (build_books) and read every
+feature from it instead of rescanning buy_orders / sell_orders: each field is
+computed on first access and reused for the rest of the tick. Sell volumes
+follow the OrderDepth convention (negative); depths and VWAPs use absolute
+volumes.
+"""
+from typing import Dict
+
+_UNSET = object()
+
+
+class BookSnapshot:
+
+    __slots__ = ("buy_orders", "sell_orders", "_best_bid", "_best_ask", "_mid", "_microprice",
+                 "_vwap_bid", "_vwap_ask", "_bid_levels", "_ask_levels", "_bid_depth", "_ask_depth")
+
+    def __init__(self, order_depth) -> None:
+        self.buy_orders: Dict[int, int] = order_depth.buy_orders
+        self.sell_orders: Dict[int, int] = order_depth.sell_orders
+        self._best_bid = _UNSET
+        self._best_ask = _UNSET
+        self._mid = _UNSET
+        self._microprice = _UNSET
+        self._vwap_bid = _UNSET
+        self._vwap_ask = _UNSET
+        self._bid_levels = None
+        self._ask_levels = None
+        self._bid_depth = None
+        self._ask_depth = None
+
+    @property
+    def best_bid(self):
+        value = self._best_bid
+        if value is _UNSET:
+            value = self._best_bid = max(self.buy_orders) if self.buy_orders else None
+        return value
+
+    @property
+    def best_ask(self):
+        value = self._best_ask
+        if value is _UNSET:
+            value = self._best_ask = min(self.sell_orders) if self.sell_orders else None
+        return value
+
+    @property
+    def best_bid_volume(self) -> int:
+        best_bid = self.best_bid
+        return self.buy_orders[best_bid] if best_bid is not None else 0
+
+    @property
+    def best_ask_volume(self) -> int:
+        """
+        Volume at the best ask, as a positive number.
+        """
+        best_ask = self.best_ask
+        return -self.sell_orders[best_ask] if best_ask is not None else 0
+
+    @property
+    def mid(self):
+        """
+        (best_bid + best_ask) / 2, None if either side is empty.
+        """
+        value = self._mid
+        if value is _UNSET:
+            best_bid = self.best_bid
+            best_ask = self.best_ask
+            value = None if best_bid is None or best_ask is None else (best_bid + best_ask) / 2
+            self._mid = value
+        return value
+
+    @property
+    def spread(self):
+        best_bid = self.best_bid
+        best_ask = self.best_ask
+        if best_bid is None or best_ask is None:
+            return None
+        return best_ask - best_bid
+
+    @property
+    def microprice(self):
+        """
+        Top of book prices weighted by the volume on the opposite side.
+        """
+        value = self._microprice
+        if value is _UNSET:
+            value = None
+            if self.best_bid is not None and self.best_ask is not None:
+                bid_volume = self.best_bid_volume
+                ask_volume = self.best_ask_volume
+                if bid_volume + ask_volume > 0:
+                    value = (self.best_bid * ask_volume + self.best_ask * bid_volume) / (bid_volume + ask_volume)
+                else:
+                    value = self.mid
+            self._microprice = value
+        return value
+
+    @property
+    def vwap_bid(self):
+        value = self._vwap_bid
+        if value is _UNSET:
+            value = self._vwap_bid = _vwap(self.buy_orders)
+        return value
+
+    @property
+    def vwap_ask(self):
+        value = self._vwap_ask
+        if value is _UNSET:
+            value = self._vwap_ask = _vwap(self.sell_orders)
+        return value
+
+    @property
+    def bid_levels(self):
+        """
+        [(price, volume, cumulative volume)] from the best bid down.
+        """
+        if self._bid_levels is None:
+            self._bid_levels = _levels(self.buy_orders, reverse=True)
+        return self._bid_levels
+
+    @property
+    def ask_levels(self):
+        """
+        [(price, volume, cumulative volume)] from the best ask up, volumes positive.
+        """
+        if self._ask_levels is None:
+            self._ask_levels = _levels(self.sell_orders, reverse=False)
+        return self._ask_levels
+
+    @property
+    def bid_depth(self) -> int:
+        if self._bid_depth is None:
+            self._bid_depth = sum(abs(volume) for volume in self.buy_orders.values())
+        return self._bid_depth
+
+    @property
+    def ask_depth(self) -> int:
+        if self._ask_depth is None:
+            self._ask_depth = sum(abs(volume) for volume in self.sell_orders.values())
+        return self._ask_depth
+
+    @property
+    def imbalance(self):
+        """
+        (bid_depth - ask_depth) / (bid_depth + ask_depth) in [-1, 1], None on an empty book.
+        """
+        total = self.bid_depth + self.ask_depth
+        if total == 0:
+            return None
+        return (self.bid_depth - self.ask_depth) / total
+
+
+def _vwap(orders: Dict[int, int]):
+    total = 0
+    volume = 0
+    for price, level_volume in orders.items():
+        level_volume = abs(level_volume)
+        total += price * level_volume
+        volume += level_volume
+    return total / volume if volume > 0 else None
+
+
+def _levels(orders: Dict[int, int], reverse: bool):
+    levels = []
+    cumulative = 0
+    for price in sorted(orders, reverse=reverse):
+        volume = abs(orders[price])
+        cumulative += volume
+        levels.append((price, volume, cumulative))
+    return levels
+
+
+def build_books(state) -> Dict[str, BookSnapshot]:
+    """
+    One BookSnapshot per symbol of the TradingState.
+    """
+    return {symbol: BookSnapshot(depth) for symbol, depth in state.order_depths.items()}
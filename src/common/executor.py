@@ -0,0 +1,196 @@
+"""
+Runs the per-product strategies of a Trader under time budgets.
+
+Every strategy is registered once under its name with the product it trades,
+the function producing its orders, its own time budget and the state it owns
+(the names of the attributes of the function's object it alone writes), and
+can be switched on and off through the `enabled` dict (one flag per product,
+covering every strategy of the product, so a sweep can flip it as
+enabled_strategies.RAINFOREST_RESIN). A product can have several strategies;
+their orders are sent together, in registration order. Each call:
+
+  - a strategy that raises, or that was still running when its budget ran
+    out, does not get its orders sent; its last good orders go out instead
+    if they are at most max_stale_ticks old, nothing otherwise
+  - once the budget of the whole call (counted from the start of Trader.run)
+    is spent, the remaining strategies are not started and fall back the same
+    way, so one slow strategy cannot push the call past the platform limit
+
+Trader.run is a single synchronous call and a strategy cannot be interrupted,
+so budgets are checked between strategies: an overrun is detected after the
+fact and only costs that strategy's orders of the tick. A strategy that raises
+also gets its declared state put back as it was before the call, so a half
+done update does not carry over to the next tick (the attributes are rebound:
+objects it changed in place stay changed).
+
+Since overruns depend on the machine's load, a result that falls back on them
+cannot be reproduced. With deterministic set (the backtester sets it) budgets
+are only counted and reported, every strategy runs and its orders go out.
+
+Each strategy keeps its own counters (calls, time, errors, overruns,
+fallbacks) for report(); with a PhaseProfiler attached, every strategy is
+also recorded as a phase under its name.
+"""
+from time import perf_counter_ns
+from typing import Callable, Dict, List, Optional, Sequence
+
+TICK = 100
+
+DEFAULT_BUDGET_MS = 50.0
+DEFAULT_CALL_BUDGET_MS = 800.0
+DEFAULT_MAX_STALE_TICKS = 5
+
+
+class Strategy:
+
+    __slots__ = ("name", "product", "function", "budget_ns", "owner", "state", "last_orders", "last_timestamp",
+                 "calls", "total_ns", "max_ns", "errors", "overruns", "fallbacks")
+
+    def __init__(self, name: str, product: str, function: Callable, budget_ms: float,
+                 state: Sequence[str] = ()) -> None:
+        self.name = name
+        self.product = product
+        self.function = function
+        self.budget_ns = int(budget_ms * 1e6)
+        # The object whose attributes named in state the strategy owns (its Trader for a method)
+        self.owner = getattr(function, "__self__", None)
+        self.state = tuple(state)
+        # Orders of the last call that finished in time, and the timestamp they were made for
+        self.last_orders = None
+        self.last_timestamp = None
+        self.calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.errors = 0
+        self.overruns = 0
+        self.fallbacks = 0
+
+
+class StrategyExecutor:
+
+    def __init__(self, call_budget_ms: float = DEFAULT_CALL_BUDGET_MS,
+                 max_stale_ticks: int = DEFAULT_MAX_STALE_TICKS, deterministic: bool = False) -> None:
+        self.call_budget_ns = int(call_budget_ms * 1e6)
+        self.max_stale_ticks = max_stale_ticks
+        self.deterministic = deterministic
+        # By name, in registration order
+        self.strategies: Dict[str, Strategy] = {}
+        self.enabled: Dict[str, bool] = {}
+
+    def register(self, name: str, product: str, function: Callable, budget_ms: float = DEFAULT_BUDGET_MS,
+                 enabled: bool = True, state: Sequence[str] = ()) -> Strategy:
+        """
+        Adds a strategy of a product, run in registration order. enabled sets the
+        product's flag if this is its first strategy. state names the attributes of
+        the function's object the strategy owns. Raises ValueError for a name
+        already registered or state another strategy owns.
+        """
+        if name in self.strategies:
+            raise ValueError(f"Strategy {name!r} is already registered")
+        strategy = Strategy(name, product, function, budget_ms, state)
+        if strategy.state and strategy.owner is None:
+            raise ValueError(f"Strategy {name!r} declares state but its function is not a method")
+        for other in self.strategies.values():
+            shared = set(strategy.state) & set(other.state)
+            if shared and other.owner is strategy.owner:
+                raise ValueError(f"Strategy {name!r} declares {sorted(shared)}, owned by {other.name!r}")
+        self.strategies[name] = strategy
+        self.enabled.setdefault(product, enabled)
+        return strategy
+
+    def state(self, name: str) -> Dict[str, object]:
+        """
+        The current values of the state a strategy owns, by attribute name.
+        """
+        strategy = self.strategies[name]
+        return {attribute: getattr(strategy.owner, attribute) for attribute in strategy.state}
+
+    def _fallback(self, strategy: Strategy, timestamp: int) -> Optional[List]:
+        strategy.fallbacks += 1
+        if strategy.last_orders is None or timestamp - strategy.last_timestamp > self.max_stale_ticks * TICK:
+            return None
+        return list(strategy.last_orders)
+
+    def run(self, state, call_start_ns: Optional[int] = None, on_error: Optional[Callable[[str], None]] = None,
+            profiler=None) -> Dict[str, List]:
+        """
+        Orders per product of every enabled strategy for the state. call_start_ns
+        (perf_counter_ns at the top of Trader.run) starts the call budget, by
+        default it starts here. on_error gets a message for every error and overrun.
+        """
+        timestamp = state.timestamp
+        deadline = (call_start_ns if call_start_ns is not None else perf_counter_ns()) + self.call_budget_ns
+        enforce = not self.deterministic
+        result = {}
+        for strategy in self.strategies.values():
+            product = strategy.product
+            if not self.enabled.get(product):
+                continue
+            start = perf_counter_ns()
+            call_budget_spent = start >= deadline
+            if call_budget_spent:
+                strategy.overruns += 1
+                if on_error is not None:
+                    on_error(f"{strategy.name}: {'skipped, ' if enforce else ''}call budget spent")
+            if call_budget_spent and enforce:
+                orders = self._fallback(strategy, timestamp)
+            else:
+                orders = None
+                owner = strategy.owner
+                saved = [getattr(owner, attribute) for attribute in strategy.state]
+                try:
+                    orders = strategy.function(state)
+                except Exception as e:
+                    strategy.errors += 1
+                    for attribute, value in zip(strategy.state, saved):
+                        setattr(owner, attribute, value)
+                    if on_error is not None:
+                        on_error(f"{strategy.name}: {e!r}")
+                elapsed = perf_counter_ns() - start
+                strategy.calls += 1
+                strategy.total_ns += elapsed
+                if elapsed > strategy.max_ns:
+                    strategy.max_ns = elapsed
+                if orders is not None and elapsed > strategy.budget_ns:
+                    strategy.overruns += 1
+                    if on_error is not None:
+                        on_error(f"{strategy.name}: {elapsed / 1e6:.1f}ms, over its "
+                                 f"{strategy.budget_ns / 1e6:g}ms budget")
+                    if enforce:
+                        orders = None
+                if orders is None:
+                    orders = self._fallback(strategy, timestamp)
+                else:
+                    strategy.last_orders = orders
+                    strategy.last_timestamp = timestamp
+            if orders is not None:
+                # Not extended in place, the list may be a strategy's last_orders
+                result[product] = result[product] + orders if product in result else orders
+            if profiler is not None:
+                profiler.mark(strategy.name)
+        return result
+
+    def summary(self) -> Dict[str, dict]:
+        """
+        calls, mean and max (microseconds), errors, overruns and fallbacks per strategy.
+        """
+        return {
+            strategy.name: {
+                "enabled": bool(self.enabled.get(strategy.product)),
+                "calls": strategy.calls,
+                "mean_us": strategy.total_ns / strategy.calls / 1000 if strategy.calls else 0.0,
+                "max_us": strategy.max_ns / 1000,
+                "errors": strategy.errors,
+                "overruns": strategy.overruns,
+                "fallbacks": strategy.fallbacks,
+            }
+            for strategy in self.strategies.values()
+        }
+
+    def report(self) -> str:
+        lines = [f"{'strategy':<20} {'on':>3} {'calls':>7} {'mean us':>9} {'max us':>9} {'errors':>7} "
+                 f"{'overrun':>7} {'fallback':>8}"]
+        for name, row in self.summary().items():
+            lines.append(f"{name:<20} {'y' if row['enabled'] else 'n':>3} {row['calls']:>7} {row['mean_us']:>9.1f} "
+                         f"{row['max_us']:>9.1f} {row['errors']:>7} {row['overruns']:>7} {row['fallbacks']:>8}")
+        return "\n".join(lines)
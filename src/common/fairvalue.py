@@ -0,0 +1,141 @@
+"""
+Online fair value model for the market-making strategies.
+
+Per product, a linear model predicts the move of the mid price over the next
+tick from features of the current book and of the trades printed since the
+previous tick:
+
+    bias        1
+    microprice  microprice - mid
+    imbalance   (bid depth - ask depth) / (bid depth + ask depth)
+    return      mid - previous mid
+    reversion   mid - EMA of the mids (EMA_ALPHA)
+    trade_flow  signed market trade volume / TRADE_FLOW_SCALE, a trade above
+                the previous mid counts as bought, below as sold
+
+and fair value = mid + prediction. The coefficients are fitted online by
+recursive least squares with exponential forgetting: every tick the previous
+features are regressed on the move that followed them, in O(features^2) and
+without looking at any older tick. Warm-start coefficients come from the
+offline fitter (src/backtest/fairvalue_fit.py), in which case the model starts
+with a smaller covariance (warm_delta) so a few ticks do not undo the fit.
+"""
+from operator import mul
+from typing import Dict, Optional, Sequence
+
+FEATURES = ("bias", "microprice", "imbalance", "return", "reversion", "trade_flow")
+N_FEATURES = len(FEATURES)
+
+EMA_ALPHA = 0.1
+TRADE_FLOW_SCALE = 10.0
+
+
+class RecursiveLeastSquares:
+
+    __slots__ = ("n", "forgetting", "theta", "P")
+
+    def __init__(self, n: int, forgetting: float = 0.999, delta: float = 100.0,
+                 theta: Optional[Sequence[float]] = None) -> None:
+        self.n = n
+        self.forgetting = forgetting
+        self.theta = list(theta) if theta is not None else [0.0] * n
+        # Covariance of the coefficients, starts at delta * I
+        self.P = [[delta if i == j else 0.0 for j in range(n)] for i in range(n)]
+
+    def predict(self, x: Sequence[float]) -> float:
+        return sum(map(mul, self.theta, x))
+
+    def update(self, x: Sequence[float], y: float) -> None:
+        P = self.P
+        Px = [sum(map(mul, row, x)) for row in P]
+        gain_scale = 1.0 / (self.forgetting + sum(map(mul, Px, x)))
+        gain = [p * gain_scale for p in Px]
+        error = y - sum(map(mul, self.theta, x))
+        self.theta = [t + g * error for t, g in zip(self.theta, gain)]
+        # P = (P - gain Px^T) / forgetting, symmetric so only the upper triangle is computed
+        scale = 1.0 / self.forgetting
+        for i, row in enumerate(P):
+            gain_i = gain[i]
+            for j in range(i, self.n):
+                value = (row[j] - gain_i * Px[j]) * scale
+                row[j] = value
+                P[j][i] = value
+
+
+class _ProductModel:
+
+    __slots__ = ("rls", "mid", "ema", "features", "fair")
+
+    def __init__(self, rls: RecursiveLeastSquares) -> None:
+        self.rls = rls
+        self.mid = None  # mid of the previous tick with a two-sided book
+        self.ema = None
+        self.features = None  # features of that tick, waiting for the move that followed
+        self.fair = None
+
+
+class FairValueModel:
+
+    def __init__(self, products: Sequence[str], coefficients: Optional[Dict[str, Sequence[float]]] = None,
+                 forgetting: float = 0.999, delta: float = 100.0, warm_delta: float = 0.01) -> None:
+        self.products = tuple(products)
+        self.forgetting = forgetting
+        self.delta = delta
+        self.warm_delta = warm_delta
+        self.coefficients = coefficients or {}
+        self.models: Dict[str, _ProductModel] = {product: self.new_model(product) for product in self.products}
+
+    def new_model(self, product: str) -> _ProductModel:
+        theta = self.coefficients.get(product)
+        delta = self.warm_delta if theta is not None else self.delta
+        return _ProductModel(RecursiveLeastSquares(N_FEATURES, self.forgetting, delta, theta))
+
+    def features(self, model: _ProductModel, book, market_trades):
+        """
+        Feature vector of the current tick and its mid, (None, None) if the book is one-sided.
+        Advances the EMA of the model.
+        """
+        mid = book.mid if book is not None else None
+        if mid is None:
+            return None, None
+        previous = model.mid if model.mid is not None else mid
+        ema = mid if model.ema is None else model.ema + EMA_ALPHA * (mid - model.ema)
+        model.ema = ema
+        flow = 0
+        for trade in market_trades:
+            if trade.price > previous:
+                flow += trade.quantity
+            elif trade.price < previous:
+                flow -= trade.quantity
+        imbalance = book.imbalance
+        return [
+            1.0,
+            book.microprice - mid,
+            imbalance if imbalance is not None else 0.0,
+            mid - previous,
+            mid - ema,
+            flow / TRADE_FLOW_SCALE,
+        ], mid
+
+    def update(self, product: str, book, market_trades=()) -> Optional[float]:
+        """
+        Learns from the move since the previous tick and returns the new fair value
+        (the previous one if the book is one-sided).
+        """
+        model = self.models[product]
+        x, mid = self.features(model, book, market_trades)
+        if x is None:
+            return model.fair
+        if model.features is not None:
+            model.rls.update(model.features, mid - model.mid)
+        model.features = x
+        model.mid = mid
+        model.fair = mid + model.rls.predict(x)
+        return model.fair
+
+    def fair_value(self, product: str) -> Optional[float]:
+        model = self.models.get(product)
+        return model.fair if model is not None else None
+
+    def reset(self, product: str) -> None:
+        self.models[product] = self.new_model(product)
@@ -0,0 +1,198 @@
+"""
+Streaming price indicators with O(1) updates per tick.
+
+PriceIndicators keeps the last `capacity` (timestamp, price) ticks of a product
+in a ring buffer and maintains the modified RSI, PCR and volatility of
+trading.py incrementally instead of rescanning the history on every tick:
+  - RSI: a pointer to the newest tick at or before timestamp - rsi_window
+  - PCR: running up/down move counters over the ticks inside the window
+  - volatility: Welford-style rolling mean/variance of the absolute price changes,
+    exactly 0 while every change in the window is the same (a flat market)
+
+Timestamps must be appended in increasing order and queried with
+non-decreasing timestamps, which is always the case inside Trader.run.
+"""
+import math
+
+
+class PriceIndicators:
+
+    def __init__(self, rsi_window: int, pcr_window: int, volatility_window: int, capacity: int = None) -> None:
+        self.rsi_window = rsi_window
+        self.pcr_window = pcr_window
+        # The history only ever holds max(rsi_window, pcr_window) ticks, the
+        # volatility looks at the last volatility_window of those
+        self.capacity = max(1, capacity if capacity is not None else max(rsi_window, pcr_window))
+        self.volatility_window = max(1, min(volatility_window, self.capacity))
+
+        # Ticks are numbered by an absolute index, tick i lives in slot i % capacity
+        self.timestamps = [0] * self.capacity
+        self.prices = [0.0] * self.capacity
+        self.first = 0  # index of the oldest tick still in the buffer
+        self.total = 0  # number of ticks ever appended
+
+        self.rsi_next = 0  # first tick newer than the last RSI target
+
+        self.pcr_start = 0  # first tick inside the PCR window
+        self.up_moves = 0
+        self.down_moves = 0
+
+        # Absolute price changes between the last volatility_window ticks
+        self.changes = [0.0] * self.volatility_window
+        self.n_changes = 0
+        self.change_mean = 0.0
+        self.change_m2 = 0.0
+        # Trailing run of equal changes, the window is flat when it covers all of them
+        self.change_run = 0
+
+    def __len__(self) -> int:
+        return self.total - self.first
+
+    def ordered(self):
+        """
+        (timestamps, prices) of the ticks in the buffer as two lists, oldest first.
+        """
+        count = self.total - self.first
+        if count < self.capacity:
+            return self.timestamps[:count], self.prices[:count]
+        split = self.first % self.capacity
+        return self.timestamps[split:] + self.timestamps[:split], self.prices[split:] + self.prices[:split]
+
+    def history(self):
+        """
+        The (timestamp, price) ticks in the buffer, oldest first.
+        """
+        return list(zip(*self.ordered()))
+
+    def last_price(self):
+        if self.total == self.first:
+            return None
+        return self.prices[(self.total - 1) % self.capacity]
+
+    def _move(self, i: int):
+        """
+        Direction of the move between ticks i and i + 1: 1 up, -1 down, 0 flat.
+        """
+        capacity = self.capacity
+        before = self.prices[i % capacity]
+        after = self.prices[(i + 1) % capacity]
+        if after > before:
+            return 1
+        if after < before:
+            return -1
+        return 0
+
+    def append(self, timestamp: int, price: float) -> None:
+        capacity = self.capacity
+        total = self.total
+
+        if total - self.first == capacity:
+            # Evict the oldest tick before its slot gets overwritten
+            oldest = self.first
+            if self.pcr_start <= oldest:
+                if oldest + 1 < total:
+                    move = self._move(oldest)
+                    if move > 0:
+                        self.up_moves -= 1
+                    elif move < 0:
+                        self.down_moves -= 1
+                self.pcr_start = oldest + 1
+            self.first = oldest + 1
+
+        previous = self.prices[(total - 1) % capacity] if total > self.first else None
+        slot = total % capacity
+        self.timestamps[slot] = timestamp
+        self.prices[slot] = price
+        self.total = total + 1
+
+        if previous is None:
+            return
+
+        # The move into the new tick counts if the previous tick is inside the PCR window
+        if total - 1 >= self.pcr_start:
+            if price > previous:
+                self.up_moves += 1
+            elif price < previous:
+                self.down_moves += 1
+
+        # Rolling variance of the absolute changes over the last volatility_window ticks
+        window = self.volatility_window - 1
+        if window == 0:
+            return
+        change = abs(price - previous)
+        slot = total % window
+        if self.n_changes and change == self.changes[(total - 1) % window]:
+            self.change_run += 1
+        else:
+            self.change_run = 1
+        if self.n_changes == window:
+            # Drop the oldest change, which lives in the slot about to be reused
+            old = self.changes[slot]
+            n = window - 1
+            if n == 0:
+                self.change_mean = 0.0
+                self.change_m2 = 0.0
+            else:
+                delta = old - self.change_mean
+                self.change_mean -= delta / n
+                self.change_m2 -= delta * (old - self.change_mean)
+            self.n_changes = n
+        self.changes[slot] = change
+        self.n_changes += 1
+        if self.change_run >= self.n_changes:
+            # Every change in the window is this one: the variance is exactly 0, and
+            # resetting here keeps the rounding residue of the updates from building up
+            self.change_mean = change
+            self.change_m2 = 0.0
+            return
+        delta = change - self.change_mean
+        self.change_mean += delta / self.n_changes
+        self.change_m2 += delta * (change - self.change_mean)
+
+    def rsi(self, timestamp: int, price: float):
+        """
+        Percentage change of price against the newest tick at or before
+        timestamp - rsi_window, or None if there is no such tick.
+        """
+        target = timestamp - self.rsi_window
+        i = max(self.rsi_next, self.first)
+        capacity = self.capacity
+        while i < self.total and self.timestamps[i % capacity] <= target:
+            i += 1
+        self.rsi_next = i
+        if i == self.first:
+            return None
+        price_old = self.prices[(i - 1) % capacity]
+        return (price - price_old) / price_old * 100
+
+    def pcr(self, timestamp: int):
+        """
+        Price Change Ratio up_moves / (up_moves + down_moves) over the ticks at
+        or after timestamp - pcr_window. None with fewer than two ticks in the
+        window, 0.5 if the price did not move.
+        """
+        window_start = timestamp - self.pcr_window
+        capacity = self.capacity
+        while self.pcr_start < self.total and self.timestamps[self.pcr_start % capacity] < window_start:
+            if self.pcr_start + 1 < self.total:
+                move = self._move(self.pcr_start)
+                if move > 0:
+                    self.up_moves -= 1
+                elif move < 0:
+                    self.down_moves -= 1
+            self.pcr_start += 1
+        if self.total - self.pcr_start < 2:
+            return None
+        total_moves = self.up_moves + self.down_moves
+        if total_moves == 0:
+            return 0.5
+        return self.up_moves / total_moves
+
+    def volatility(self) -> float:
+        """
+        Standard deviation of the absolute price changes over the last volatility_window ticks.
+        """
+        if self.n_changes == 0:
+            return 0.0
+        # Rounding can still leave a tiny negative residue on a window of nearly equal changes
+        return math.sqrt(max(self.change_m2 / self.n_changes, 0.0))
@@ -0,0 +1,139 @@
+"""
+Nets and sizes the orders of a tick against the position limits, in one pass per product.
+
+The exchange rejects every order of a product when their total buy (or sell)
+quantity could take the position past its limit, so a strategy posting the
+full remaining limit on both sides, two strategies quoting the same product,
+or last tick's orders replayed by the executor after the position moved can
+cost the whole tick. OrderSizer.apply runs on the result of Trader.run:
+
+  - orders with a zero quantity, a non-integer quantity or a non-integer or
+    non-positive price are dropped
+  - orders of a product at the same price are netted into one (a buy and a
+    sell at the same price cancel out)
+  - buys are filled up to limit - position, best priced first, sells down to
+    -limit - position the same way, and the order crossing the limit is cut
+
+so the orders that go out can never be rejected for the limit. A product
+without a limit is left as it is. Counters of what got dropped, netted and
+clipped are kept for report().
+"""
+from typing import Dict, List, Optional
+
+
+class OrderSizer:
+
+    def __init__(self, position_limits: Dict[str, int]) -> None:
+        self.position_limits = position_limits
+        self.invalid = 0
+        self.netted = 0
+        self.clipped = 0
+        self.clipped_quantity = 0
+
+    def fits(self, orders: List, position: int, limit: int) -> bool:
+        """
+        True if size() has nothing to change: valid orders, buys then sells, each side best priced
+        first with no price repeated or shared with the other side, and both sides within the limit.
+        """
+        buy_room = limit - position
+        sell_room = limit + position
+        best_bid = None
+        last_price = None
+        selling = False
+        for order in orders:
+            price = order.price
+            quantity = order.quantity
+            if type(price) is not int or type(quantity) is not int or price <= 0 or quantity == 0:
+                return False
+            if quantity > 0:
+                if selling or (last_price is not None and price >= last_price):
+                    return False
+                if best_bid is None:
+                    best_bid = price
+                buy_room -= quantity
+            else:
+                if selling:
+                    if price <= last_price:
+                        return False
+                elif best_bid is not None and price <= best_bid:
+                    return False
+                selling = True
+                sell_room += quantity
+            last_price = price
+        return buy_room >= 0 and sell_room >= 0
+
+    def size(self, orders: List, position: int, limit: int) -> List:
+        """
+        The orders of one product netted and clipped to the limit, best priced first per side.
+        Returns the orders given if nothing needed changing.
+        """
+        if self.fits(orders, position, limit):
+            return orders
+        by_price: Dict[int, int] = {}
+        order_class = None
+        symbol = None
+        for order in orders:
+            price = order.price
+            quantity = order.quantity
+            if quantity == 0:
+                # Posting the remaining room at the limit gives these, nothing to send
+                continue
+            if (type(price) is not int and not (isinstance(price, float) and price.is_integer())) or price <= 0 \
+                    or type(quantity) is not int:
+                self.invalid += 1
+                continue
+            price = int(price)
+            if price in by_price:
+                self.netted += 1
+                by_price[price] += quantity
+            else:
+                by_price[price] = quantity
+            order_class = type(order)
+            symbol = order.symbol
+
+        buy_room = limit - position
+        sell_room = limit + position
+        sized = []
+        # Most aggressive first: highest bids, then lowest asks
+        for price in sorted(by_price, reverse=True):
+            quantity = by_price[price]
+            if quantity > 0:
+                if quantity > buy_room:
+                    self.clipped += 1
+                    self.clipped_quantity += quantity - max(buy_room, 0)
+                    quantity = buy_room
+                if quantity > 0:
+                    buy_room -= quantity
+                    sized.append((price, quantity))
+        for price in sorted(by_price):
+            quantity = by_price[price]
+            if quantity < 0:
+                if -quantity > sell_room:
+                    self.clipped += 1
+                    self.clipped_quantity += -quantity - max(sell_room, 0)
+                    quantity = -sell_room
+                if quantity < 0:
+                    sell_room += quantity
+                    sized.append((price, quantity))
+
+        if len(sized) == len(orders) and all(order.price == price and order.quantity == quantity
+                                             for order, (price, quantity) in zip(orders, sized)):
+            return orders
+        return [order_class(symbol, price, quantity) for price, quantity in sized]
+
+    def apply(self, result: Dict[str, List], positions: Dict[str, int]) -> Dict[str, List]:
+        """
+        The orders per product of a Trader.run result, each product sized against its limit.
+        """
+        sized = {}
+        for product, orders in result.items():
+            limit: Optional[int] = self.position_limits.get(product)
+            if limit is None or not orders:
+                sized[product] = orders
+                continue
+            sized[product] = self.size(orders, positions.get(product, 0), limit)
+        return sized
+
+    def report(self) -> str:
+        return (f"order sizing: {self.invalid} invalid orders dropped, {self.netted} netted, "
+                f"{self.clipped} clipped to the limit ({self.clipped_quantity} lots)")
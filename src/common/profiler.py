@@ -0,0 +1,108 @@
+"""
+Opt-in per-phase latency profiler for Trader.run.
+
+The Trader holds `self.profiler = None` and only calls into it when one has
+been attached, so a disabled profiler costs one `is not None` check per phase.
+Each phase gets a preallocated ring of samples (for percentiles) and a log2
+histogram; the report gives p50/p99/max per phase in microseconds.
+
+    profiler.start()            # at the top of run
+    ...
+    profiler.mark("update_pnl") # time since the previous mark / start
+    ...
+    profiler.finish()           # records the whole call as "total"
+"""
+from array import array
+from time import perf_counter_ns
+from typing import Dict
+
+HISTOGRAM_BUCKETS = 40
+
+
+class PhaseStats:
+
+    def __init__(self, capacity: int) -> None:
+        self.samples = array("q", bytes(8 * capacity))
+        self.capacity = capacity
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        # buckets[b] counts samples with b == elapsed_ns.bit_length(), i.e. in [2^(b-1), 2^b) ns
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+
+    def record(self, elapsed_ns: int) -> None:
+        self.samples[self.count % self.capacity] = elapsed_ns
+        self.count += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        self.buckets[min(elapsed_ns.bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+
+    def percentile(self, q: float) -> float:
+        """
+        q-th percentile (0-100) in microseconds over the samples still in the ring.
+        """
+        kept = sorted(self.samples[:min(self.count, self.capacity)])
+        if not kept:
+            return 0.0
+        index = min(len(kept) - 1, int(round(q / 100 * (len(kept) - 1))))
+        return kept[index] / 1000
+
+
+class PhaseProfiler:
+
+    def __init__(self, capacity: int = 10000) -> None:
+        self.capacity = capacity
+        self.phases: Dict[str, PhaseStats] = {}
+        self._start = 0
+        self._last = 0
+
+    def stats(self, phase: str) -> PhaseStats:
+        stats = self.phases.get(phase)
+        if stats is None:
+            stats = self.phases[phase] = PhaseStats(self.capacity)
+        return stats
+
+    def start(self) -> None:
+        self._start = self._last = perf_counter_ns()
+
+    def mark(self, phase: str) -> None:
+        now = perf_counter_ns()
+        self.stats(phase).record(now - self._last)
+        self._last = now
+
+    def finish(self) -> None:
+        now = perf_counter_ns()
+        self.stats("total").record(now - self._start)
+        self._last = now
+
+    def summary(self) -> Dict[str, dict]:
+        """
+        count, mean, p50, p99 and max (microseconds) per phase.
+        """
+        return {
+            phase: {
+                "count": stats.count,
+                "mean_us": stats.total_ns / stats.count / 1000 if stats.count else 0.0,
+                "p50_us": stats.percentile(50),
+                "p99_us": stats.percentile(99),
+                "max_us": stats.max_ns / 1000,
+            }
+            for phase, stats in self.phases.items()
+        }
+
+    def report(self, histograms: bool = False) -> str:
+        lines = [f"{'phase':<20} {'calls':>7} {'mean us':>9} {'p50 us':>9} {'p99 us':>9} {'max us':>9}"]
+        for phase, row in self.summary().items():
+            lines.append(f"{phase:<20} {row['count']:>7} {row['mean_us']:>9.1f} {row['p50_us']:>9.1f} "
+                         f"{row['p99_us']:>9.1f} {row['max_us']:>9.1f}")
+        if histograms:
+            for phase, stats in self.phases.items():
+                lines.append(f"{phase}:")
+                peak = max(stats.buckets) or 1
+                for bucket, count in enumerate(stats.buckets):
+                    if count:
+                        low = (1 << (bucket - 1)) / 1000 if bucket else 0.0
+                        bar = "#" * max(1, round(40 * count / peak))
+                        lines.append(f"  >= {low:>10.1f} us {count:>7} {bar}")
+        return "\n".join(lines)
@@ -0,0 +1,370 @@
+"""
+Compact traderData codec for the Trader state.
+
+The platform does not guarantee the Trader instance survives between calls,
+so the state that matters (cash, EMAs, price windows and the volatility
+tracking fields) is packed into traderData every tick and restored when a
+fresh instance gets called. The payload is fixed-width binary, base64 encoded:
+
+    header    version, round, cash, volatility and high volatility fields
+    product   ema, number of ticks, first (timestamp, price), then either
+              uint16 timestamp deltas + int16 price deltas in half ticks
+              or raw int32 timestamps + float64 prices if they do not fit
+    model     a uint16 bit mask of the fair value products (trader.fair_values,
+              if any) in use, then per product in use: previous mid, EMA,
+              fair value, pending features, coefficients and the upper
+              triangle of the RLS covariance, all float64
+    flow      a uint16 bit mask of the trade flow products (trader.trade_flow,
+              if any) in use, then per product in use: window, ticks seen,
+              previous mid, last trade price and side, then only the ring
+              buckets that saw trades: slot, buy, sell, total volume and
+              trade count as uint16 (int32 if they do not fit) and notional
+              as float64; the running sums are rebuilt from them
+
+The products in use are the ones trader.fair_value_products() and
+trader.trade_flow_products() return (all of them if the Trader has no such
+method); the others are neither packed nor restored. Its size is bounded by
+the indicator window (4 bytes per tick per product) plus a fixed block per
+fair value product in use and 18 bytes per tick with trades in the trade flow
+window per trade flow product in use. The delta encoded history of each
+PriceIndicators is kept between packs, so a pack only encodes the ticks
+appended since the previous one.
+"""
+import base64
+import math
+import struct
+from collections import deque
+from operator import sub
+from weakref import WeakKeyDictionary
+
+VERSION = 5
+
+_HEADER = struct.Struct("<BIddidbh")
+_PRODUCT = struct.Struct("<dH")
+_FIRST_TICK = struct.Struct("<idB")
+_MODEL_HEADER = struct.Struct("<ddd")
+_FLOW_HEADER = struct.Struct("<HIddbBH")
+_MASK = struct.Struct("<H")
+_TIMESTAMP_DELTA = struct.Struct("<H")
+_PRICE_DELTA = struct.Struct("<h")
+
+DELTA_ENCODED = 0
+RAW = 1
+
+# Trade flow bucket layouts: slot, buy, sell, volume, trades, notional
+_FLOW_SLOTS = {DELTA_ENCODED: struct.Struct("<HHHHHd"), RAW: struct.Struct("<Hiiiid")}
+
+DIRECTIONS = {None: 0, "up": 1, "down": -1}
+DIRECTION_NAMES = {code: name for name, code in DIRECTIONS.items()}
+
+
+def _none_to_nan(value):
+    return math.nan if value is None else value
+
+
+def _nan_to_none(value):
+    return None if value != value else value
+
+
+def _pack_history(timestamps, prices) -> bytes:
+    count = len(timestamps)
+    n = count - 1
+    # Mid prices are whole or half ticks, so the deltas normally fit 16 bits
+    half_ticks = [price * 2 for price in prices]
+    try:
+        whole = list(map(int, half_ticks))
+        if whole == half_ticks:
+            return (_FIRST_TICK.pack(timestamps[0], prices[0], DELTA_ENCODED)
+                    + struct.pack(f"<{n}H{n}h", *map(sub, timestamps[1:], timestamps),
+                                  *map(sub, whole[1:], whole)))
+    except (ValueError, OverflowError, struct.error):
+        # NaN / inf prices or deltas out of range
+        pass
+    return (_FIRST_TICK.pack(timestamps[0], prices[0], RAW)
+            + struct.pack(f"<{count}i{count}d", *timestamps, *prices))
+
+
+def _whole_half_ticks(price):
+    """
+    price in half ticks as an int, None if it is not a whole number of them (or NaN / inf).
+    """
+    half_ticks = price * 2
+    try:
+        whole = int(half_ticks)
+    except (ValueError, OverflowError):
+        return None
+    return whole if whole == half_ticks else None
+
+
+class _HistoryEncoder:
+    """
+    The delta encoded ticks of a PriceIndicators history, kept up to date
+    as ticks get appended so a pack only encodes the ticks since the last one.
+    """
+
+    __slots__ = ("total", "last_raw", "timestamp_deltas", "price_deltas")
+
+    def __init__(self, capacity: int) -> None:
+        self.total = 0  # ticks of the history encoded so far
+        self.last_raw = -1  # newest tick whose delta does not fit, or -1
+        # Packed deltas of the newest ticks into their previous one, the oldest fall off
+        self.timestamp_deltas = deque(maxlen=capacity - 1)
+        self.price_deltas = deque(maxlen=capacity - 1)
+
+
+# Encoders per PriceIndicators, dropped along with them
+_encoders = WeakKeyDictionary()
+
+
+def _pack_indicators(indicators) -> bytes:
+    """
+    _pack_history of the ticks of indicators, encoding only the ticks appended since the last call.
+    """
+    encoder = _encoders.get(indicators)
+    if encoder is None:
+        encoder = _encoders[indicators] = _HistoryEncoder(indicators.capacity)
+    first = indicators.first
+    total = indicators.total
+    if encoder.total <= first:
+        # Every encoded delta left the history
+        encoder.timestamp_deltas.clear()
+        encoder.price_deltas.clear()
+    capacity = indicators.capacity
+    timestamps = indicators.timestamps
+    prices = indicators.prices
+    for i in range(max(encoder.total, first + 1), total):
+        before = (i - 1) % capacity
+        after = i % capacity
+        whole = _whole_half_ticks(prices[after])
+        whole_before = _whole_half_ticks(prices[before])
+        if whole is not None and whole_before is not None:
+            try:
+                timestamp_delta = _TIMESTAMP_DELTA.pack(timestamps[after] - timestamps[before])
+                price_delta = _PRICE_DELTA.pack(whole - whole_before)
+            except struct.error:
+                pass
+            else:
+                encoder.timestamp_deltas.append(timestamp_delta)
+                encoder.price_deltas.append(price_delta)
+                continue
+        # Off the half tick grid or out of range: the history goes out raw while this tick is in it
+        encoder.last_raw = i
+        encoder.timestamp_deltas.append(b"")
+        encoder.price_deltas.append(b"")
+    encoder.total = total
+
+    slot = first % capacity
+    if encoder.last_raw <= first and _whole_half_ticks(prices[slot]) is not None:
+        return (_FIRST_TICK.pack(timestamps[slot], prices[slot], DELTA_ENCODED)
+                + b"".join(encoder.timestamp_deltas) + b"".join(encoder.price_deltas))
+    return _pack_history(*indicators.ordered())
+
+
+def _unpack_history(data: bytes, offset: int, count: int):
+    first_timestamp, first_price, encoding = _FIRST_TICK.unpack_from(data, offset)
+    offset += _FIRST_TICK.size
+    if encoding == DELTA_ENCODED:
+        n = count - 1
+        values = struct.unpack_from(f"<{n}H{n}h", data, offset)
+        offset += 4 * n
+        history = [(first_timestamp, first_price)]
+        timestamp = first_timestamp
+        half_ticks = first_price * 2
+        for timestamp_delta, price_delta in zip(values[:n], values[n:]):
+            timestamp += timestamp_delta
+            half_ticks += price_delta
+            history.append((timestamp, half_ticks / 2))
+        return history, offset
+    values = struct.unpack_from(f"<{count}i{count}d", data, offset)
+    offset += 12 * count
+    return list(zip(values[:count], values[count:])), offset
+
+
+def _in_use(trader, method: str, products) -> int:
+    """
+    Bit mask over products of the ones trader.<method>() says are in use (all without the method).
+    """
+    select = getattr(trader, method, None)
+    if select is None:
+        return (1 << len(products)) - 1
+    used = select()
+    mask = 0
+    for i, product in enumerate(products):
+        if product in used:
+            mask |= 1 << i
+    return mask
+
+
+def _model_struct(n: int) -> struct.Struct:
+    return struct.Struct(f"<{n}d{n}d{n * (n + 1) // 2}d")
+
+
+def _pack_model(model) -> bytes:
+    rls = model.rls
+    n = rls.n
+    features = model.features if model.features is not None else [math.nan] * n
+    upper = [value for i, row in enumerate(rls.P) for value in row[i:]]
+    return (_MODEL_HEADER.pack(_none_to_nan(model.mid), _none_to_nan(model.ema), _none_to_nan(model.fair))
+            + _model_struct(n).pack(*features, *rls.theta, *upper))
+
+
+def _unpack_model(model, data: bytes, offset: int) -> int:
+    rls = model.rls
+    n = rls.n
+    mid, ema, fair = _MODEL_HEADER.unpack_from(data, offset)
+    offset += _MODEL_HEADER.size
+    layout = _model_struct(n)
+    values = layout.unpack_from(data, offset)
+    model.mid = _nan_to_none(mid)
+    model.ema = _nan_to_none(ema)
+    model.fair = _nan_to_none(fair)
+    model.features = None if values[0] != values[0] else list(values[:n])
+    rls.theta = list(values[n:2 * n])
+    upper = iter(values[2 * n:])
+    for i in range(n):
+        for j in range(i, n):
+            rls.P[i][j] = rls.P[j][i] = next(upper)
+    return offset + layout.size
+
+
+def _pack_flow(flow) -> bytes:
+    slots = [slot for slot, trades in enumerate(flow.trades) if trades]
+    # Volumes and trade counts of a tick are small and never negative, so they normally fit 16 bits
+    compact = all(flow.buy[slot] < 65536 and flow.sell[slot] < 65536 and flow.volume[slot] < 65536
+                  and flow.trades[slot] < 65536 for slot in slots)
+    encoding = DELTA_ENCODED if compact else RAW
+    layout = _FLOW_SLOTS[encoding]
+    return (_FLOW_HEADER.pack(flow.window, flow.ticks, _none_to_nan(flow.mid), _none_to_nan(flow.last_price),
+                              flow.last_side, encoding, len(slots))
+            + b"".join(layout.pack(slot, flow.buy[slot], flow.sell[slot], flow.volume[slot], flow.trades[slot],
+                                   flow.notional[slot]) for slot in slots))
+
+
+def _unpack_flow(new_flow, data: bytes, offset: int):
+    """
+    (flow, offset): a flow made by new_flow(window) with the packed state restored.
+    """
+    window, ticks, mid, last_price, last_side, encoding, count = _FLOW_HEADER.unpack_from(data, offset)
+    offset += _FLOW_HEADER.size
+    layout = _FLOW_SLOTS[encoding]
+    flow = new_flow(window)
+    flow.ticks = ticks
+    flow.mid = _nan_to_none(mid)
+    flow.last_price = _nan_to_none(last_price)
+    flow.last_side = last_side
+    for _ in range(count):
+        slot, buy, sell, volume, trades, notional = layout.unpack_from(data, offset)
+        offset += layout.size
+        flow.buy[slot] = buy
+        flow.sell[slot] = sell
+        flow.volume[slot] = volume
+        flow.trades[slot] = trades
+        flow.notional[slot] = notional
+    flow.buy_volume = sum(flow.buy)
+    flow.sell_volume = sum(flow.sell)
+    flow.volume_sum = sum(flow.volume)
+    flow.trade_count = sum(flow.trades)
+    flow.notional_sum = sum(flow.notional)
+    return flow, offset
+
+
+def pack_trader_state(trader, products) -> str:
+    """
+    Packs the state of a Trader into a traderData string.
+    """
+    parts = [_HEADER.pack(
+        VERSION,
+        trader.round,
+        trader.cash,
+        trader.volatility,
+        trader.last_high_volatility_tick,
+        _none_to_nan(trader.high_volatility_price),
+        DIRECTIONS.get(trader.high_volatility_direction, 0),
+        trader.high_volatility_position,
+    )]
+    for product in products:
+        indicators = trader.indicators.get(product)
+        count = len(indicators) if indicators is not None else 0
+        parts.append(_PRODUCT.pack(_none_to_nan(trader.ema_prices.get(product)), count))
+        if count:
+            parts.append(_pack_indicators(indicators))
+    fair_values = getattr(trader, "fair_values", None)
+    if fair_values is not None:
+        mask = _in_use(trader, "fair_value_products", fair_values.products)
+        parts.append(_MASK.pack(mask))
+        for i, product in enumerate(fair_values.products):
+            if mask >> i & 1:
+                parts.append(_pack_model(fair_values.models[product]))
+    trade_flow = getattr(trader, "trade_flow", None)
+    if trade_flow is not None:
+        mask = _in_use(trader, "trade_flow_products", trade_flow.products)
+        parts.append(_MASK.pack(mask))
+        for i, product in enumerate(trade_flow.products):
+            if mask >> i & 1:
+                parts.append(_pack_flow(trade_flow.flows[product]))
+    return base64.b64encode(b"".join(parts)).decode("ascii")
+
+
+def unpack_trader_state(trader, trader_data: str, products) -> bool:
+    """
+    Restores the state packed by pack_trader_state into a Trader.
+    Returns False (leaving the Trader untouched) if trader_data is not ours.
+    """
+    try:
+        data = base64.b64decode(trader_data, validate=True)
+        if not data or data[0] != VERSION:
+            return False
+        (_version, round_num, cash, volatility, last_high_volatility_tick, high_volatility_price,
+         direction, high_volatility_position) = _HEADER.unpack_from(data, 0)
+        offset = _HEADER.size
+        restored = []
+        for product in products:
+            ema, count = _PRODUCT.unpack_from(data, offset)
+            offset += _PRODUCT.size
+            history = []
+            if count:
+                history, offset = _unpack_history(data, offset, count)
+            restored.append((product, ema, history))
+        # Unpacked into fresh models so a bad payload leaves the Trader untouched
+        fair_values = getattr(trader, "fair_values", None)
+        models = {}
+        if fair_values is not None:
+            (mask,) = _MASK.unpack_from(data, offset)
+            offset += _MASK.size
+            for i, product in enumerate(fair_values.products):
+                if not mask >> i & 1:
+                    continue
+                model = fair_values.new_model(product)
+                offset = _unpack_model(model, data, offset)
+                models[product] = model
+        trade_flow = getattr(trader, "trade_flow", None)
+        flows = {}
+        if trade_flow is not None:
+            (mask,) = _MASK.unpack_from(data, offset)
+            offset += _MASK.size
+            for i, product in enumerate(trade_flow.products):
+                if not mask >> i & 1:
+                    continue
+                flows[product], offset = _unpack_flow(trade_flow.new_flow, data, offset)
+    except (ValueError, KeyError, IndexError, struct.error):
+        return False
+
+    trader.round = round_num
+    trader.cash = cash
+    trader.volatility = volatility
+    trader.last_high_volatility_tick = last_high_volatility_tick
+    trader.high_volatility_price = _nan_to_none(high_volatility_price)
+    trader.high_volatility_direction = DIRECTION_NAMES.get(direction)
+    trader.high_volatility_position = high_volatility_position
+    for product, ema, history in restored:
+        trader.ema_prices[product] = _nan_to_none(ema)
+        trader.indicators.pop(product, None)
+        if history:
+            indicators = trader.get_indicators(product)
+            for timestamp, price in history:
+                indicators.append(timestamp, price)
+    if models:
+        fair_values.models.update(models)
+    if flows:
+        trade_flow.flows.update(flows)
+    return True
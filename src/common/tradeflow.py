@@ -0,0 +1,140 @@
+"""
+Streaming trade-flow features per product, fed from state.market_trades.
+
+Every tick the trades printed since the previous tick go into one bucket of a
+fixed-size ring of the last `window` ticks, and running sums over the ring are
+kept up to date, so a trade costs O(1) and a tick O(trades) however long the
+window. Over the window:
+
+    buy_volume / sell_volume   volume of trades classified as buyer / seller initiated
+    signed_volume              buy_volume - sell_volume
+    volume_sum                 volume of all trades, classified or not
+    imbalance                  signed_volume / volume_sum, None without trades
+    vwap                       volume weighted average trade price, None without trades
+    arrival_rate               trades per tick
+
+A trade is buyer initiated if it printed above the mid of the previous tick
+(the book it traded against), seller initiated below it. At the mid the tick
+test decides: above the previous trade price is a buy, below a sell, and at the
+same price the side of the previous trade carries over (Lee-Ready).
+
+src/backtest/tradeflow_series.py computes the same series over whole days of
+the trades CSVs for research.
+"""
+from typing import Dict, Optional, Sequence
+
+FLOW_WINDOW = 20
+
+BUY = 1
+SELL = -1
+
+
+class ProductFlow:
+
+    __slots__ = ("window", "ticks", "buy", "sell", "volume", "notional", "trades", "buy_volume", "sell_volume",
+                 "volume_sum", "notional_sum", "trade_count", "mid", "last_price", "last_side")
+
+    def __init__(self, window: int = FLOW_WINDOW) -> None:
+        self.window = max(1, window)
+        self.ticks = 0  # ticks recorded so far, the next bucket is ticks % window
+        # Per-tick buckets of the ring
+        self.buy = [0] * self.window
+        self.sell = [0] * self.window
+        self.volume = [0] * self.window
+        self.notional = [0.0] * self.window
+        self.trades = [0] * self.window
+        # Sums over the ring
+        self.buy_volume = 0
+        self.sell_volume = 0
+        self.volume_sum = 0
+        self.notional_sum = 0.0
+        self.trade_count = 0
+        self.mid = None  # mid of the previous tick with a two-sided book
+        self.last_price = None
+        self.last_side = 0
+
+    def classify(self, price: float) -> int:
+        """
+        BUY, SELL or 0 (no side yet) for a trade at price, advancing the tick test.
+        """
+        mid = self.mid
+        if mid is not None and price != mid:
+            side = BUY if price > mid else SELL
+        elif self.last_price is not None and price != self.last_price:
+            side = BUY if price > self.last_price else SELL
+        else:
+            side = self.last_side
+        self.last_price = price
+        self.last_side = side
+        return side
+
+    def update(self, market_trades: Sequence, mid: Optional[float]) -> None:
+        """
+        Adds the trades printed since the previous tick, then moves on to a tick with the given mid
+        (None if its book is one-sided, keeping the previous one).
+        """
+        buy = sell = volume = trades = 0
+        notional = 0.0
+        for trade in market_trades:
+            quantity = trade.quantity
+            side = self.classify(trade.price)
+            if side == BUY:
+                buy += quantity
+            elif side == SELL:
+                sell += quantity
+            volume += quantity
+            notional += trade.price * quantity
+            trades += 1
+        slot = self.ticks % self.window
+        self.buy_volume += buy - self.buy[slot]
+        self.sell_volume += sell - self.sell[slot]
+        self.volume_sum += volume - self.volume[slot]
+        self.notional_sum += notional - self.notional[slot]
+        self.trade_count += trades - self.trades[slot]
+        self.buy[slot] = buy
+        self.sell[slot] = sell
+        self.volume[slot] = volume
+        self.notional[slot] = notional
+        self.trades[slot] = trades
+        self.ticks += 1
+        if mid is not None:
+            self.mid = mid
+
+    @property
+    def signed_volume(self) -> int:
+        return self.buy_volume - self.sell_volume
+
+    @property
+    def imbalance(self) -> Optional[float]:
+        volume = self.volume_sum
+        return (self.buy_volume - self.sell_volume) / volume if volume else None
+
+    @property
+    def vwap(self) -> Optional[float]:
+        volume = self.volume_sum
+        return self.notional_sum / volume if volume else None
+
+    @property
+    def arrival_rate(self) -> float:
+        ticks = min(self.ticks, self.window)
+        return self.trade_count / ticks if ticks else 0.0
+
+
+class TradeFlow:
+
+    def __init__(self, products: Sequence[str], window: int = FLOW_WINDOW) -> None:
+        self.products = tuple(products)
+        self.window = window
+        self.flows: Dict[str, ProductFlow] = {product: self.new_flow(window) for product in self.products}
+
+    @staticmethod
+    def new_flow(window: int) -> ProductFlow:
+        return ProductFlow(window)
+
+    def update(self, product: str, market_trades: Sequence, mid: Optional[float]) -> ProductFlow:
+        flow = self.flows[product]
+        flow.update(market_trades, mid)
+        return flow
+
+    def reset(self, product: str) -> None:
+        self.flows[product] = self.new_flow(self.window)
@@ -0,0 +1,126 @@
+"""
+Buffered structured logging for Trader.run.
+
+Instead of several formatted prints per tick, the Trader records one compact
+row per product into a preallocated buffer and flushes a single line per tick:
+
+    TL[timestamp, cash, pnl, [[product, position, mid, value, ema, volatility], ...],
+       [[symbol, price, signed quantity], ...], [error, ...]]
+
+COMPACT writes that JSON as is, COMPRESSED writes "TZ" + base64(zlib(json))
+for when the platform log gets truncated, OFF makes every call a no-op.
+parse_log turns such a log back into per-product time series.
+"""
+import base64
+import json
+import zlib
+
+OFF = 0
+COMPACT = 1
+COMPRESSED = 2
+
+COMPACT_PREFIX = "TL"
+COMPRESSED_PREFIX = "TZ"
+
+PRODUCT_FIELDS = ("position", "mid", "value", "ema", "volatility")
+DIGITS = 4
+
+# json.dumps builds a new encoder on every call when given separators
+_encode = json.JSONEncoder(separators=(",", ":")).encode
+
+
+class TickLogger:
+
+    def __init__(self, level: int = COMPACT, capacity: int = 8) -> None:
+        self.level = level
+        # Rows are reused every tick, only products beyond capacity allocate
+        self.rows = [[None] * (1 + len(PRODUCT_FIELDS)) for _ in range(capacity)]
+        self.count = 0
+        self.trades = []
+        self.errors = []
+
+    def record(self, product: str, position: int, mid: float, value: float, ema, volatility: float) -> None:
+        if not self.level:
+            return
+        if self.count == len(self.rows):
+            self.rows.append([None] * (1 + len(PRODUCT_FIELDS)))
+        row = self.rows[self.count]
+        row[0] = product
+        row[1] = position
+        row[2] = mid
+        row[3] = value
+        row[4] = None if ema is None else round(ema, DIGITS)
+        row[5] = round(volatility, DIGITS)
+        self.count += 1
+
+    def trade(self, symbol: str, price: int, quantity: int) -> None:
+        """
+        One of our own trades, quantity negative for sells.
+        """
+        if self.level:
+            self.trades.append((symbol, price, quantity))
+
+    def error(self, message: str) -> None:
+        if self.level:
+            self.errors.append(message)
+
+    def flush(self, timestamp: int, cash: float, pnl: float) -> None:
+        """
+        Prints the buffered rows of the tick as one line and clears the buffer.
+        """
+        if not self.level:
+            return
+        payload = _encode([timestamp, round(cash, DIGITS), round(pnl, DIGITS), self.rows[:self.count],
+                           self.trades, self.errors])
+        if self.level == COMPRESSED:
+            print(COMPRESSED_PREFIX + base64.b64encode(zlib.compress(payload.encode(), 9)).decode("ascii"))
+        else:
+            print(COMPACT_PREFIX + payload)
+        self.count = 0
+        self.trades = []
+        self.errors = []
+
+
+def parse_line(line: str):
+    """
+    The decoded [timestamp, cash, pnl, rows, trades, errors] of a log line, or None.
+    """
+    line = line.strip()
+    if line.startswith(COMPACT_PREFIX):
+        return json.loads(line[len(COMPACT_PREFIX):])
+    if line.startswith(COMPRESSED_PREFIX):
+        return json.loads(zlib.decompress(base64.b64decode(line[len(COMPRESSED_PREFIX):])))
+    return None
+
+
+def parse_log(lines) -> dict:
+    """
+    Rebuilds time series from TickLogger output. Other lines are skipped.
+
+    Returns {"timestamp": [...], "cash": [...], "pnl": [...], "trades": [...],
+    "errors": [...], "products": {product: {"timestamp": [...], "position": [...], ...}}}
+    where trades and errors are (timestamp, ...) tuples.
+    """
+    series = {"timestamp": [], "cash": [], "pnl": [], "trades": [], "errors": [], "products": {}}
+    products = series["products"]
+    for line in lines:
+        try:
+            tick = parse_line(line)
+        except (ValueError, zlib.error):
+            continue
+        if tick is None:
+            continue
+        timestamp, cash, pnl, rows, trades, errors = tick
+        series["timestamp"].append(timestamp)
+        series["cash"].append(cash)
+        series["pnl"].append(pnl)
+        series["trades"].extend((timestamp, *trade) for trade in trades)
+        series["errors"].extend((timestamp, error) for error in errors)
+        for row in rows:
+            product = products.get(row[0])
+            if product is None:
+                product = products[row[0]] = {"timestamp": [], **{field: [] for field in PRODUCT_FIELDS}}
+            product["timestamp"].append(timestamp)
+            for field, value in zip(PRODUCT_FIELDS, row[1:]):
+                product[field].append(value)
+    return series
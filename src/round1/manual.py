@@ -1,3 +1,5 @@
+import heapq
+import math
 
 conversions = {
   'snowball-pizza':1.45,
@@ -19,35 +21,69 @@ conversions = {
 }
 
 starting_shells = 2000
+max_hops = 5  # Number of trades, the last one has to end in shells
+top_n = 10
 
-# Generate every possible combination of 5 trades
-combinations = [['shell-shell']]
-new_combos = []
-
-for i in range(4):
-  for combo in combinations:
-    for conv in conversions.keys():
-      curr_curreny = combo[-1].split('-')[-1]
-      # print(f'curr_combo: {combo}, curr_curreny: {curr_curreny}, conv: {conv}, trufiy: {conv[:len(curr_curreny)] == curr_curreny}')
-      if conv[:len(curr_curreny)] == curr_curreny:
-        new_combos.append(combo + [conv])
-  combinations = new_combos[new_combos.index(combo)+1 if combo in new_combos else 0:]
-
-# Calculate the value of each combination
-results = []
-for combo in new_combos:
-  value = starting_shells
-  for conv in combo:
-    curr_currency = conv.split('-')[0]
-    next_currency = conv.split('-')[1]
-    value *= conversions[curr_currency + '-' + next_currency]
-  # Convert back to shells
-  value *= conversions[next_currency + '-shell']
-  results.append((combo, value))
-
-# Sort and print the results
-results.sort(key=lambda x: x[1])
-for combo, value in results:
-  print(combo, value)
-
-print(f'{len(results)} combinations')
\ No newline at end of file
+
+def rate_matrix(conversions):
+  """
+  Turns the 'from-to': rate table into (currencies, matrix) with matrix[i][j]
+  the rate from currencies[i] to currencies[j] (0 if there is no market).
+  """
+  pairs = [(pair.split('-'), rate) for pair, rate in conversions.items()]
+  currencies = sorted({currency for (source, target), _ in pairs for currency in (source, target)})
+  index = {currency: i for i, currency in enumerate(currencies)}
+  matrix = [[0.0] * len(currencies) for _ in currencies]
+  for (source, target), rate in pairs:
+    matrix[index[source]][index[target]] = rate
+  return currencies, matrix
+
+
+def best_cycles(matrix, start, max_hops, top_n):
+  """
+  Top-N conversion cycles from start back to start with at most max_hops
+  trades, as (multiplier, path of currency indices) best first.
+
+  Dynamic programming over hops in log space: after h hops, keep the top_n
+  best paths ending in every currency. Any top-N cycle has a prefix in those
+  (otherwise top_n better prefixes with the same ending would give top_n
+  better cycles), so the result is exact in O(max_hops * n^2 * top_n).
+  Identity trades (rate 1 to itself) are skipped, they only pad a cycle.
+  """
+  n = len(matrix)
+  log_rates = [[math.log(rate) if rate > 0 else None for rate in row] for row in matrix]
+  frontier = [[] for _ in range(n)]
+  frontier[start] = [(0.0, (start,))]
+  cycles = []
+  for hop in range(max_hops):
+    paths = [[] for _ in range(n)]
+    for source in range(n):
+      row = log_rates[source]
+      for value, path in frontier[source]:
+        for target in range(n):
+          if target == source or row[target] is None:
+            continue
+          paths[target].append((value + row[target], path + (target,)))
+    frontier = [heapq.nlargest(top_n, candidates) for candidates in paths]
+    cycles.extend(frontier[start])
+
+  results = []
+  for _, path in heapq.nlargest(top_n, cycles):
+    # Recompute the product exactly instead of exponentiating the log sum
+    multiplier = 1.0
+    for source, target in zip(path, path[1:]):
+      multiplier *= matrix[source][target]
+    results.append((multiplier, path))
+  results.sort(key=lambda result: result[0], reverse=True)
+  return results
+
+
+if __name__ == '__main__':
+  currencies, matrix = rate_matrix(conversions)
+  results = best_cycles(matrix, currencies.index('shell'), max_hops, top_n)
+
+  # Print the results, best last
+  for multiplier, path in reversed(results):
+    print(' -> '.join(currencies[i] for i in path), starting_shells * multiplier)
+
+  print(f'{len(results)} best cycles of up to {max_hops} trades')
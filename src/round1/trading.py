@@ -1,7 +1,16 @@
 from typing import Dict, List
 # from data.datamodel import OrderDepth, TradingState, Order
 from datamodel import OrderDepth, TradingState, Order
+from book import BookSnapshot, build_books
+from executor import StrategyExecutor
+from orders import OrderSizer
+from fairvalue import FairValueModel
+from indicators import PriceIndicators
+from tradeflow import TradeFlow
+from statecodec import pack_trader_state, unpack_trader_state
+from tradelog import TickLogger, COMPACT
 import math
+from time import perf_counter_ns
 
 SUBMISSION = "SUBMISSION"
 RAINFOREST_RESIN = "RAINFOREST_RESIN"
@@ -14,9 +23,20 @@ DEFAULT_VALUES = {
   RAINFOREST_RESIN: 10000,
   # Only use resin rn
   SQUID_INK: 2000,
-  KELP: 2000,
+  KELP: 2030,
 }
 
+# Warm-start coefficients of the fair value model, from
+# python src/backtest/fairvalue_fit.py 1 (features in fairvalue.FEATURES order)
+FAIR_VALUE_COEFFICIENTS = {
+    KELP: (0.00261408, 0.20969, -1.72077, -0.128826, -0.44949, 0.0285718),
+    SQUID_INK: (-0.0185339, 0.50219, -2.80033, -0.0732806, 0.0134261, -0.0374362),
+}
+
+# Reference prices the strategies can quote around
+EMA = "ema"
+FAIR_VALUE = "fair_value"
+
 class Trader:
 
     def __init__(self) -> None:
@@ -32,10 +52,9 @@ class Trader:
         self.cash = 0
         # positions can be obtained from state.position
         
-        # self.past_prices keeps the list of all past prices
-        self.past_prices = dict()
-        for product in PRODUCTS:
-            self.past_prices[product] = []
+        # self.indicators keeps the recent prices of each product and the
+        # RSI / PCR / volatility over them, created on the first price
+        self.indicators = dict()
 
         # self.ema_prices keeps an exponential moving average of prices
         self.ema_prices = dict()
@@ -52,6 +71,19 @@ class Trader:
         self.RSI_WINDOW_TICKS = 50   # change to whatever is best profit
         self.PCR_WINDOW_TICKS = 50   # change to whatever is best profit
 
+        # Online fair value (src/common/fairvalue.py) and the reference price each strategy quotes around.
+        # A product's model is only updated and kept in traderData while its reference price is FAIR_VALUE
+        self.fair_values = FairValueModel([SQUID_INK, KELP], FAIR_VALUE_COEFFICIENTS)
+        self.reference_price = {
+            SQUID_INK: EMA,
+            KELP: EMA,
+        }
+
+        # Rolling market trade flow per product (src/common/tradeflow.py), for the strategies to read.
+        # No strategy reads it yet, so it is only updated and kept in traderData with use_trade_flow
+        self.trade_flow = TradeFlow([SQUID_INK, KELP])
+        self.use_trade_flow = False
+
         # Add these new parameters for dynamic spread calculation
         self.volatility_window = 50  # Number of ticks to look back for volatility
         self.min_spread = 1  # Minimum spread to maintain
@@ -72,31 +104,57 @@ class Trader:
 
         self.volatility = 0.0  # Initialize volatility variable
 
+        # Squid spread: base_spread at volatility 0, twice that at volatility_baseline
+        self.base_spread = 2
+        self.volatility_baseline = 0.8  # median SQUID_INK volatility over round 1
+
+        # self.books holds a BookSnapshot per symbol for the state being processed
+        self.books = dict()
+        self.books_state = None
+
+        # Strategy per product with its time budget and the attributes it owns (src/common/executor.py),
+        # run in this order. self.enabled_strategies switches them on and off per product
+        self.executor = StrategyExecutor()
+        # squid_strategy loses on both round 1 days (-9,917 and -9,445) with base_spread and
+        # volatility_baseline as they are, so it stays off until those are calibrated
+        self.executor.register("squid_strategy", SQUID_INK, self.squid_strategy, budget_ms=50, enabled=False,
+                               state=("volatility",))
+        self.executor.register("resin_strategy", RAINFOREST_RESIN, self.resin_strategy, budget_ms=50, enabled=False)
+        self.executor.register("kelp_strategy", KELP, self.kelp_strategy, budget_ms=50)
+        self.enabled_strategies = self.executor.enabled
+
+        # Nets and clips the orders of every product to its limit before they go out (src/common/orders.py)
+        self.order_sizer = OrderSizer(self.position_limit)
+
+        # Optional PhaseProfiler (src/common/profiler.py), attached by the backtester
+        self.profiler = None
+
+        # One log line per tick, set the level to OFF to silence it
+        self.logger = TickLogger(COMPACT)
+
     def get_position(self, product, state : TradingState):
         return state.position.get(product, 0)    
 
-    def get_mid_price(self, product, state : TradingState):
-
-        default_price = self.ema_prices[product]
-        if default_price is None:
-            default_price = DEFAULT_VALUES[product]
+    def get_books(self, state : TradingState) -> Dict[str, BookSnapshot]:
+        """
+        Book snapshots of the state, built once per state.
+        """
+        if self.books_state is not state:
+            self.books = build_books(state)
+            self.books_state = state
+        return self.books
 
-        if product not in state.order_depths:
-            return default_price
+    def get_mid_price(self, product, state : TradingState):
+        books = self.books if self.books_state is state else self.get_books(state)
+        book = books.get(product)
 
-        market_bids = state.order_depths[product].buy_orders
-        if len(market_bids) == 0:
-            # There are no bid orders in the market (midprice undefined)
-            return default_price
-        
-        market_asks = state.order_depths[product].sell_orders
-        if len(market_asks) == 0:
-            # There are no bid orders in the market (mid_price undefined)
-            return default_price
-        
-        best_bid = max(market_bids)
-        best_ask = min(market_asks)
-        return (best_bid + best_ask)/2
+        # None if there is no book or either side of it is empty (midprice undefined)
+        mid_price = book.mid if book is not None else None
+        if mid_price is None:
+            mid_price = self.ema_prices[product]
+            if mid_price is None:
+                return DEFAULT_VALUES[product]
+        return mid_price
 
     def get_value_on_product(self, product, state : TradingState):
         """
@@ -108,85 +166,60 @@ class Trader:
         """
         Updates the pnl.
         """
-        def update_cash():
-            # Update cash
-            for product in state.own_trades:
-                for trade in state.own_trades[product]:
-                    if trade.timestamp != state.timestamp - 100:
-                        # Trade was already analyzed
-                        continue
-
-                    if trade.buyer == SUBMISSION:
-                        self.cash -= trade.quantity * trade.price
-                    if trade.seller == SUBMISSION:
-                        self.cash += trade.quantity * trade.price
-        
-        def get_value_on_positions():
-            value = 0
-            for product in state.position:
-                value += self.get_value_on_product(product, state)
-            return value
-        
         # Update cash
-        update_cash()
-        return self.cash + get_value_on_positions()
+        previous_timestamp = state.timestamp - 100
+        for trades in state.own_trades.values():
+            for trade in trades:
+                if trade.timestamp != previous_timestamp:
+                    # Trade was already analyzed
+                    continue
+
+                if trade.buyer == SUBMISSION:
+                    self.cash -= trade.quantity * trade.price
+                if trade.seller == SUBMISSION:
+                    self.cash += trade.quantity * trade.price
+
+        # Value on positions
+        value = 0
+        for product, position in state.position.items():
+            value += position * self.get_mid_price(product, state)
+        return self.cash + value
+
+    def get_indicators(self, product) -> PriceIndicators:
+        """
+        Returns the indicators of a product, created with the current window settings.
+        """
+        indicators = self.indicators.get(product)
+        if indicators is None:
+            indicators = PriceIndicators(self.RSI_WINDOW_TICKS, self.PCR_WINDOW_TICKS, self.volatility_window)
+            self.indicators[product] = indicators
+        return indicators
 
     def update_price_history(self, current_timestamp: int, price: float, product) -> None:
-        """Append the current (timestamp, price) and prune any too-old data."""
-        self.past_prices[product].append((current_timestamp, price))
-        # Prune history older than the maximum window needed for our indicators.
-        max_window = max(self.RSI_WINDOW_TICKS, self.PCR_WINDOW_TICKS)
-        # Keep only the last max_window ticks of data.
-        self.past_prices[product] = self.past_prices[product][-max_window:]
-        # self.past_prices[product] = [(ts, p) for ts, p in self.past_prices[product] if current_timestamp - ts <= max_window]
+        """Append the current (timestamp, price), dropping data older than the indicator windows."""
+        self.get_indicators(product).append(current_timestamp, price)
 
     def compute_modified_rsi(self, current_timestamp: int, current_price: float, product):
         """
         Compute modified RSI as percentage change compared to the price from
         RSI_WINDOW_TICKS ago.
         """
-        target_time = current_timestamp - self.RSI_WINDOW_TICKS
-        price_old = None
-        # Look for the oldest price at or before the target_time.
-        for ts, p in self.past_prices[product]:
-            if ts <= target_time:
-                price_old = p
-            else:
-                break
-        if price_old is None:
-            return None
-        return (current_price - price_old) / price_old * 100
+        return self.get_indicators(product).rsi(current_timestamp, current_price)
 
     def compute_pcr(self, current_timestamp: int, product):
         """
         Compute the Price Change Ratio (PCR) over the PCR_WINDOW_TICKS.
         PCR = up_moves / (up_moves + down_moves)
         """
-        window_start = current_timestamp - self.PCR_WINDOW_TICKS
-        window_prices = [p for ts, p in self.past_prices[product] if ts >= window_start]
-        if len(window_prices) < 2:
-            return None
-        up_moves = 0
-        down_moves = 0
-        for i in range(1, len(window_prices)):
-            if window_prices[i] > window_prices[i - 1]:
-                up_moves += 1
-            elif window_prices[i] < window_prices[i - 1]:
-                down_moves += 1
-        total_moves = up_moves + down_moves
-        if total_moves == 0:
-            return 0.5  # Neutral if no movement
-        return up_moves / total_moves
-
-    def generate_signal(self, current_timestamp: int, current_price: float, product) -> str:
+        return self.get_indicators(product).pcr(current_timestamp)
+
+    def generate_signal(self, rsi_value, pcr_value) -> str:
         """
         Combine modified RSI and PCR indicators to produce a trading signal.
           - 'buy' if RSI < 30 and PCR > 0.7
           - 'sell' if RSI > 70 and PCR < 0.3
           - otherwise, 'hold'
         """
-        rsi_value = self.compute_modified_rsi(current_timestamp, current_price, product)
-        pcr_value = self.compute_pcr(current_timestamp, product)
         if rsi_value is None or pcr_value is None:
             return "hold"
 
@@ -217,28 +250,67 @@ class Trader:
             else:
                 self.ema_prices[product] = self.ema_param[product] * mid_price + (1-self.ema_param[product]) * self.ema_prices[product]
 
+    def update_fair_values(self, state : TradingState):
+        """
+        Feeds the book and the market trades since the last tick to the fair value model.
+        """
+        products = self.fair_value_products()
+        if not products:
+            return
+        books = self.get_books(state)
+        for product in products:
+            self.fair_values.update(product, books.get(product), state.market_trades.get(product, ()))
+
+    def update_trade_flow(self, state : TradingState):
+        """
+        Feeds the market trades since the last tick and the current mid to the trade flow features.
+        """
+        products = self.trade_flow_products()
+        if not products:
+            return
+        books = self.get_books(state)
+        for product in products:
+            book = books.get(product)
+            mid = book.mid if book is not None else None
+            self.trade_flow.update(product, state.market_trades.get(product, ()), mid)
+
+    def fair_value_products(self):
+        """
+        Products whose fair value model some strategy quotes around.
+        """
+        return [product for product in self.fair_values.products if self.reference_price.get(product) == FAIR_VALUE]
+
+    def trade_flow_products(self):
+        """
+        Products whose trade flow is tracked, none unless use_trade_flow is set.
+        """
+        return self.trade_flow.products if self.use_trade_flow else ()
+
+    def fair_value(self, product):
+        """
+        Fair value of the model, falling back to the EMA and then to DEFAULT_VALUES.
+        """
+        value = self.fair_values.fair_value(product)
+        if value is None:
+            value = self.ema_prices[product]
+        if value is None:
+            value = DEFAULT_VALUES[product]
+        return value
+
+    def get_reference_price(self, product):
+        """
+        The price a strategy quotes around, as chosen in self.reference_price.
+        """
+        if self.reference_price.get(product) == FAIR_VALUE:
+            return self.fair_value(product)
+        return self.ema_prices[product]
+
     def calculate_volatility(self, product: str, state: TradingState) -> float:
         """
         Calculate the volatility of a product based on recent price movements.
         Returns the standard deviation of recent price changes.
         """
-        if len(self.past_prices[product]) < 2:
-            return 0.0
-        
-        # Get recent prices within the volatility window
-        recent_prices = [p for ts, p in self.past_prices[product][-self.volatility_window:]]
-        
-        if len(recent_prices) < 2:
-            return 0.0
-        
-        # Calculate price changes
-        price_changes = [abs(recent_prices[i] - recent_prices[i-1]) 
-                        for i in range(1, len(recent_prices))]
-        
-        # Calculate standard deviation of price changes
-        mean = sum(price_changes) / len(price_changes)
-        variance = sum((x - mean) ** 2 for x in price_changes) / len(price_changes)
-        return math.sqrt(variance)
+        return self.get_indicators(product).volatility()
 
     def squid_strategy(self, state : TradingState) -> List[Order]:
         """
@@ -252,11 +324,11 @@ class Trader:
         # Calculate indicators
         rsi = self.compute_modified_rsi(state.timestamp, current_price, SQUID_INK)
         pcr = self.compute_pcr(state.timestamp, SQUID_INK)
-        signal = self.generate_signal(state.timestamp, current_price, SQUID_INK)
+        signal = self.generate_signal(rsi, pcr)
         
         orders = []
-        bid_volume = self.position_limit[KELP] - position_squid
-        ask_volume = -self.position_limit[KELP] - position_squid
+        bid_volume = self.position_limit[SQUID_INK] - position_squid
+        ask_volume = -self.position_limit[SQUID_INK] - position_squid
         
         # Adjust spread based on volatility
         dynamic_spread = self.base_spread * (1 + self.volatility / self.volatility_baseline)
@@ -265,8 +337,9 @@ class Trader:
         position_adjustment = (position_squid - self.target_position) * self.position_penalty_factor
         
         # Base prices adjusted for position
-        base_bid = self.ema_prices[SQUID_INK] - dynamic_spread/2 - position_adjustment
-        base_ask = self.ema_prices[SQUID_INK] + dynamic_spread/2 - position_adjustment
+        reference_price = self.get_reference_price(SQUID_INK)
+        base_bid = reference_price - dynamic_spread/2 - position_adjustment
+        base_ask = reference_price + dynamic_spread/2 - position_adjustment
       
         if signal == "buy":
             orders.append(Order(SQUID_INK, math.floor(base_bid), bid_volume))
@@ -304,21 +377,24 @@ class Trader:
         self.update_price_history(state.timestamp, current_price, KELP)
 
         position_kelp = self.get_position(KELP, state)
-        signal = self.generate_signal(state.timestamp, current_price, KELP)
+        rsi = self.compute_modified_rsi(state.timestamp, current_price, KELP)
+        pcr = self.compute_pcr(state.timestamp, KELP)
+        signal = self.generate_signal(rsi, pcr)
 
         orders = []
         bid_volume = self.position_limit[KELP] - position_kelp
         ask_volume = -self.position_limit[KELP] - position_kelp
 
-        # Use the EMA value as the reference price.
+        # Quote around the reference price (EMA unless switched to the fair value model)
+        reference_price = self.get_reference_price(KELP)
         if signal == "buy":
-            orders.append(Order(KELP, math.floor(self.ema_prices[KELP] - 1), bid_volume))
+            orders.append(Order(KELP, math.floor(reference_price - 1), bid_volume))
         elif signal == "sell":
-            orders.append(Order(KELP, math.ceil(self.ema_prices[KELP] + 1), ask_volume))
+            orders.append(Order(KELP, math.ceil(reference_price + 1), ask_volume))
         else:
             # In a neutral case, place orders on both sides.
-            orders.append(Order(KELP, math.floor(self.ema_prices[KELP] - 1), bid_volume))
-            orders.append(Order(KELP, math.ceil(self.ema_prices[KELP] + 1), ask_volume))
+            orders.append(Order(KELP, math.floor(reference_price - 1), bid_volume))
+            orders.append(Order(KELP, math.ceil(reference_price + 1), ask_volume))
         return orders
 
     def run(self, state: TradingState) -> Dict[str, List[Order]]:
@@ -326,48 +402,59 @@ class Trader:
         Only method required. It takes all buy and sell orders for all symbols as an input,
         and outputs a list of orders to be sent
         """
+        call_start = perf_counter_ns()
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start()
+
+        # A fresh instance picks up where the previous one left off
+        if self.round == 0 and state.traderData:
+            unpack_trader_state(self, state.traderData, PRODUCTS)
+
         self.round += 1
         pnl = self.update_pnl(state)
+        if profiler is not None:
+            profiler.mark("update_pnl")
         self.update_ema_prices(state)
-
-        print(f"Log round {self.round}")
-
-        print("TRADES:")
-        for product in state.own_trades:
-            for trade in state.own_trades[product]:
-                if trade.timestamp == state.timestamp - 100:
-                    print(trade)
-
-        print(f"Cash {self.cash}")
-        for product in PRODUCTS:
-            print(f" Product {product}, Position {self.get_position(product, state)}, Midprice {self.get_mid_price(product, state)}, Value {self.get_value_on_product(product, state)}, EMA {self.ema_prices[product]}, Volatility {self.volatility}")
-        print(f" PnL {pnl}")
+        if profiler is not None:
+            profiler.mark("update_ema_prices")
+        self.update_fair_values(state)
+        if profiler is not None:
+            profiler.mark("update_fair_values")
+        self.update_trade_flow(state)
+        if profiler is not None:
+            profiler.mark("update_trade_flow")
+
+        logger = self.logger
+        if logger.level:
+            for product in state.own_trades:
+                for trade in state.own_trades[product]:
+                    if trade.timestamp == state.timestamp - 100:
+                        logger.trade(trade.symbol, trade.price,
+                                     -trade.quantity if trade.seller == SUBMISSION else trade.quantity)
+            for product in PRODUCTS:
+                indicators = self.indicators.get(product)
+                position = self.get_position(product, state)
+                mid_price = self.get_mid_price(product, state)
+                logger.record(product, position, mid_price, position * mid_price, self.ema_prices[product],
+                              indicators.volatility() if indicators is not None else 0.0)
+        if profiler is not None:
+            profiler.mark("logging")
         
-        result = {}
-
-        # SQUID_INK STRATEGY
-        try:
-            result[SQUID_INK] = self.squid_strategy(state)
-        except Exception as e:
-            print("Error in squid strategy")
-            print(e)
-
-        # # RAINFOREST_RESIN STRATEGY
-        # try:
-        #     result[RAINFOREST_RESIN] = self.resin_strategy(state)
-        # except Exception as e:
-        #     print("Error in resin strategy")
-        #     print(e)
-
-        # KELP STRATEGY
-        try:
-            result[KELP] = self.kelp_strategy(state)
-        except Exception as e:
-            print("Error in kelp strategy")
-            print(e)
-                
-        traderData = state.traderData + "1"
-        traderData = 'WACK'
+        # Every enabled strategy within its budget, falling back to its last good orders
+        result = self.executor.run(state, call_start, logger.error, profiler)
+        result = self.order_sizer.apply(result, state.position)
+        if profiler is not None:
+            profiler.mark("size_orders")
+
+        traderData = pack_trader_state(self, PRODUCTS)
+        if profiler is not None:
+            profiler.mark("pack_trader_state")
+
+        logger.flush(state.timestamp, self.cash, pnl)
+        if profiler is not None:
+            profiler.mark("flush_log")
+            profiler.finish()
         
         conversions = 1 
         
@@ -0,0 +1,38 @@
+"""
+Shared setup of the test suite: puts the backtester on sys.path the way its
+scripts are run (importing backtest adds data/ and src/common) and loads the
+round 1 data and Trader once per session.
+
+    python -m pytest -q
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKTEST_DIR = os.path.join(ROOT, "src", "backtest")
+ALGORITHM = os.path.join(ROOT, "src", "round1", "trading.py")
+
+if BACKTEST_DIR not in sys.path:
+    sys.path.insert(0, BACKTEST_DIR)
+
+from backtest import load_day, load_trader  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def trader_class():
+    return load_trader(ALGORITHM)
+
+
+@pytest.fixture(scope="session")
+def trading_module(trader_class):
+    return sys.modules[trader_class.__module__]
+
+
+@pytest.fixture(scope="session")
+def day_data():
+    """
+    Round 1 day -2, shared by every test that only reads it (run_backtest copies what it changes).
+    """
+    return load_day(1, -2)
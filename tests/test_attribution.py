@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from attribution import _average_cost_pnl, _drawdown, attribute, mid_series
+from backtest import DayData, run_backtest
+
+
+def test_attribution_adds_up_to_the_backtest_pnl(trader_class, day_data):
+    result = run_backtest(trader_class(), day_data, max_ticks=3000)
+    rows = attribute(result, day_data)
+    for product, pnl in result.pnl.items():
+        row = rows[product]
+        assert row["pnl"] == pytest.approx(pnl, abs=1e-6)
+        assert row["spread_capture"] + row["inventory_drift"] == pytest.approx(pnl, abs=1e-6)
+        assert row["realized"] + row["unrealized"] == pytest.approx(pnl, abs=1e-6)
+        assert row["final_position"] == result.positions.get(product, 0)
+    assert rows["total"]["pnl"] == pytest.approx(sum(result.pnl.values()), abs=1e-6)
+    assert rows["total"]["fills"] == len(result.fills)
+
+
+def test_average_cost_pnl():
+    quantities = np.array([10, 10, -15, -10])
+    prices = np.array([100.0, 110.0, 120.0, 100.0])
+    # Average entry 105, 15 closed at 120, then 5 at 100 and the last 5 open short at 100
+    assert _average_cost_pnl(quantities, prices) == (225.0 - 25.0, 100.0)
+    assert _average_cost_pnl(np.array([5, -5]), np.array([10.0, 12.0])) == (10.0, 0.0)
+
+
+def test_drawdown():
+    assert _drawdown(np.array([0.0, 5.0, 2.0, 8.0, 1.0, 3.0])) == (7.0, 1)
+    assert _drawdown(np.array([0.0, 1.0, 2.0])) == (0.0, 0)
+    assert _drawdown(np.array([])) == (0.0, 0)
+
+
+def test_mid_series_carries_the_last_known_mid():
+    books = {
+        0: {"KELP": ({}, {}, None)},
+        100: {"KELP": ({2000: 1}, {2002: -1}, 2001.0)},
+        200: {"KELP": ({2000: 1}, {}, None)},
+        300: {},
+        400: {"KELP": ({2001: 1}, {2002: -1}, 2001.5)},
+    }
+    data = DayData(1, 0, ["KELP"], sorted(books), books, {})
+    assert mid_series(data, ["KELP"])["KELP"].tolist() == [0.0, 2001.0, 2001.0, 2001.0, 2001.5]
+    assert mid_series(data, ["KELP"], ticks=2)["KELP"].tolist() == [0.0, 2001.0]
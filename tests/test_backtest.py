@@ -0,0 +1,44 @@
+import pytest
+
+from backtest import load_day, run_backtest
+from tickstore import available_days
+
+# Round 1 PnL of src/round1/trading.py per day, KELP alone (as registered) and squid_strategy switched on
+KELP_PNL = {-2: 6549.0, 0: 6699.0}
+SQUID_PNL = {-2: -9917.0, 0: -9445.0}
+
+
+def _round_pnl(trader_class, squid: bool = None) -> dict:
+    pnl = {}
+    for day in available_days(1):
+        trader = trader_class()
+        if squid is not None:
+            trader.enabled_strategies["SQUID_INK"] = squid
+        result = run_backtest(trader, load_day(1, day))
+        assert result.rejected == 0
+        pnl[day] = result.pnl
+    return pnl
+
+
+def test_round1_pnl_as_registered(trader_class):
+    pnl = _round_pnl(trader_class)
+    assert {day: day_pnl["KELP"] for day, day_pnl in pnl.items()} == KELP_PNL
+    assert all(day_pnl.get("SQUID_INK", 0.0) == 0.0 for day_pnl in pnl.values())
+    assert sum(sum(day_pnl.values()) for day_pnl in pnl.values()) == 13248.0
+
+
+def test_round1_pnl_with_squid(trader_class):
+    pnl = _round_pnl(trader_class, squid=True)
+    assert {day: day_pnl["KELP"] for day, day_pnl in pnl.items()} == KELP_PNL
+    assert {day: day_pnl["SQUID_INK"] for day, day_pnl in pnl.items()} == SQUID_PNL
+    assert sum(sum(day_pnl.values()) for day_pnl in pnl.values()) == -6114.0
+
+
+def test_positions_stay_within_limits(trader_class, day_data):
+    result = run_backtest(trader_class(), day_data, max_ticks=2000)
+    assert all(abs(position) <= 50 for position in result.positions.values())
+
+
+@pytest.mark.parametrize("max_ticks", [1, 100])
+def test_max_ticks(trader_class, day_data, max_ticks):
+    assert run_backtest(trader_class(), day_data, max_ticks=max_ticks).ticks == max_ticks
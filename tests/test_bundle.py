@@ -0,0 +1,75 @@
+import ast
+import os
+import subprocess
+import sys
+
+import pytest
+
+from bundle import Bundler, _run_fresh, check
+from conftest import ALGORITHM, BACKTEST_DIR
+
+HELPERS = {os.path.splitext(name)[0] for name in os.listdir(os.path.join(os.path.dirname(BACKTEST_DIR), "common"))
+           if name.endswith(".py")}
+
+
+def _imported_modules(source: str) -> set:
+    modules = set()
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.ImportFrom):
+            modules.add(node.module)
+        elif isinstance(node, ast.Import):
+            modules.update(alias.name for alias in node.names)
+    return modules
+
+
+@pytest.fixture(scope="module")
+def bundle_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("dist") / "round1_bundle.py"
+    path.write_text(Bundler(ALGORITHM).build())
+    return str(path)
+
+
+def test_bundle_imports_no_helpers(bundle_path):
+    with open(bundle_path) as f:
+        source = f.read()
+    modules = _imported_modules(source)
+    assert "datamodel" in modules
+    assert not modules & HELPERS
+    assert '"""' not in source
+
+
+def test_bundle_trades_like_the_strategy(bundle_path):
+    original, bundled = check(ALGORITHM, bundle_path, 1, 1000)
+    assert original == bundled
+    assert original != 0
+
+
+def test_inlined_datamodel_bundle_runs_alone(tmp_path):
+    path = tmp_path / "standalone.py"
+    path.write_text(Bundler(ALGORITHM, inline_datamodel=True).build())
+    assert "datamodel" not in _imported_modules(path.read_text())
+    result = _run_fresh([str(path)], "import standalone\nstandalone.Trader()\n")
+    assert result.returncode == 0, result.stderr
+
+
+def test_inlined_datamodel_defers_jsonpickle(tmp_path):
+    path = tmp_path / "standalone.py"
+    path.write_text(Bundler(ALGORITHM, inline_datamodel=True).build())
+    script = ("import sys\n"
+              "import standalone\n"
+              "standalone.Trader()\n"
+              "print('jsonpickle' in sys.modules)\n"
+              "print(standalone.Observation({'SUNLIGHT': 1}, {}))\n"
+              "print('jsonpickle' in sys.modules)\n")
+    lines = _run_fresh([str(path)], script).stdout.splitlines()
+    assert lines == ["False", '(plainValueObservations: {"SUNLIGHT": 1}, conversionObservations: {})', "True"]
+
+
+def test_check_cli(tmp_path):
+    output = tmp_path / "cli_bundle.py"
+    result = subprocess.run([sys.executable, os.path.join(BACKTEST_DIR, "bundle.py"), ALGORITHM, "-o", str(output),
+                             "--check", "500"], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert output.exists()
+    # --check exits with 1 if the bundle PnL differs from the strategy's
+    assert "check over 500 ticks: original PnL" in result.stdout
@@ -0,0 +1,111 @@
+from types import SimpleNamespace
+
+import pytest
+
+from backtest import run_backtest
+from executor import StrategyExecutor
+
+
+def _state(timestamp):
+    return SimpleNamespace(timestamp=timestamp)
+
+
+class _Strategies:
+    """
+    Strategy methods with switchable failures and a value they own.
+    """
+
+    def __init__(self) -> None:
+        self.fail = False
+        self.value = 0
+
+    def quote(self, state):
+        self.value = state.timestamp
+        if self.fail:
+            raise RuntimeError("boom")
+        return [("quote", state.timestamp)]
+
+    def hedge(self, state):
+        return [("hedge", state.timestamp)]
+
+
+def test_error_falls_back_to_the_last_good_orders_and_state():
+    strategies = _Strategies()
+    executor = StrategyExecutor(max_stale_ticks=2)
+    executor.register("quote", "KELP", strategies.quote, state=("value",))
+    errors = []
+    assert executor.run(_state(0)) == {"KELP": [("quote", 0)]}
+    strategies.fail = True
+    assert executor.run(_state(100), on_error=errors.append) == {"KELP": [("quote", 0)]}
+    # The half done update of the failed call is undone
+    assert executor.state("quote") == {"value": 0}
+    assert executor.run(_state(200)) == {"KELP": [("quote", 0)]}
+    # Too old to send
+    assert executor.run(_state(300)) == {}
+    assert errors == ["quote: RuntimeError('boom')"]
+    row = executor.summary()["quote"]
+    assert (row["calls"], row["errors"], row["fallbacks"]) == (4, 3, 3)
+
+
+def test_overruns_drop_orders_only_when_enforced():
+    strategies = _Strategies()
+    executor = StrategyExecutor()
+    executor.register("quote", "KELP", strategies.quote, budget_ms=0)
+    errors = []
+    assert executor.run(_state(0), on_error=errors.append) == {}
+    assert len(errors) == 1 and "over its 0ms budget" in errors[0]
+
+    executor.deterministic = True
+    assert executor.run(_state(100), on_error=errors.append) == {"KELP": [("quote", 100)]}
+    assert len(errors) == 2
+    assert executor.summary()["quote"]["overruns"] == 2
+
+
+def test_spent_call_budget_skips_strategies_only_when_enforced():
+    strategies = _Strategies()
+    executor = StrategyExecutor(call_budget_ms=0)
+    executor.register("quote", "KELP", strategies.quote)
+    assert executor.run(_state(0)) == {}
+    assert executor.summary()["quote"]["calls"] == 0
+
+    executor.deterministic = True
+    assert executor.run(_state(100)) == {"KELP": [("quote", 100)]}
+    assert executor.summary()["quote"]["calls"] == 1
+
+
+def test_strategies_of_one_product_are_merged():
+    strategies = _Strategies()
+    executor = StrategyExecutor()
+    executor.register("quote", "KELP", strategies.quote)
+    executor.register("hedge", "KELP", strategies.hedge, enabled=False)
+    assert executor.enabled == {"KELP": True}
+    assert executor.run(_state(0)) == {"KELP": [("quote", 0), ("hedge", 0)]}
+    strategies.fail = True
+    assert executor.run(_state(100)) == {"KELP": [("quote", 0), ("hedge", 100)]}
+    # Merging did not grow the kept orders
+    assert executor.strategies["quote"].last_orders == [("quote", 0)]
+    executor.enabled["KELP"] = False
+    assert executor.run(_state(200)) == {}
+    assert list(executor.summary()) == ["quote", "hedge"]
+
+
+def test_register_rejects_duplicates():
+    strategies = _Strategies()
+    executor = StrategyExecutor()
+    executor.register("quote", "KELP", strategies.quote, state=("value",))
+    with pytest.raises(ValueError):
+        executor.register("quote", "SQUID_INK", strategies.hedge)
+    with pytest.raises(ValueError):
+        executor.register("hedge", "SQUID_INK", strategies.hedge, state=("value",))
+    with pytest.raises(ValueError):
+        executor.register("function", "SQUID_INK", lambda state: [], state=("value",))
+    # The same attribute name on another object is another strategy's own
+    executor.register("other", "SQUID_INK", _Strategies().quote, state=("value",))
+
+
+def test_backtest_runs_the_executor_deterministically(trader_class, day_data):
+    trader = trader_class()
+    run_backtest(trader, day_data, max_ticks=10)
+    assert trader.executor.deterministic
+    run_backtest(trader, day_data, max_ticks=10, enforce_budgets=True)
+    assert not trader.executor.deterministic
@@ -0,0 +1,82 @@
+import random
+
+import numpy as np
+import pytest
+
+from book import BookSnapshot
+from fairvalue import N_FEATURES, TRADE_FLOW_SCALE, FairValueModel, RecursiveLeastSquares
+from fairvalue_fit import feature_rows, fit, online_error
+from fastmodel import OrderDepth, Trade
+
+
+def _book(bid, ask, bid_volume=10, ask_volume=10):
+    return BookSnapshot(OrderDepth.of({bid: bid_volume} if bid else {}, {ask: -ask_volume} if ask else {}))
+
+
+def test_rls_without_forgetting_is_ridge_least_squares():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, 4))
+    y = X @ np.array([0.5, -1.0, 2.0, 0.0]) + rng.normal(scale=0.1, size=200)
+    delta = 100.0
+    rls = RecursiveLeastSquares(4, forgetting=1.0, delta=delta)
+    for x, target in zip(X.tolist(), y.tolist()):
+        rls.update(x, target)
+    expected = np.linalg.solve(X.T @ X + np.eye(4) / delta, X.T @ y)
+    np.testing.assert_allclose(rls.theta, expected, rtol=1e-9, atol=1e-12)
+    P = np.array(rls.P)
+    np.testing.assert_array_equal(P, P.T)
+    np.testing.assert_allclose(P, np.linalg.inv(X.T @ X + np.eye(4) / delta), rtol=1e-8, atol=1e-14)
+
+
+def test_rls_forgets_an_old_regime():
+    rng = random.Random(1)
+    rls = RecursiveLeastSquares(2, forgetting=0.95)
+    for coefficient in (1.0, -1.0):
+        for _ in range(500):
+            x = [1.0, rng.uniform(-1, 1)]
+            rls.update(x, coefficient * x[1])
+    assert rls.theta == pytest.approx([0.0, -1.0], abs=1e-6)
+
+
+def test_update_learns_from_the_move_that_followed():
+    model = FairValueModel(["KELP"])
+    # Cold model: the first fair value is the mid, a one-sided book keeps the last one
+    assert model.update("KELP", _book(2000, 2002)) == 2001
+    assert model.update("KELP", _book(2000, None)) == 2001
+    assert model.update("KELP", None) == 2001
+    state = model.models["KELP"]
+    features = list(state.features)
+    model.update("KELP", _book(2002, 2004))
+    assert state.features != features
+    assert state.rls.theta != [0.0] * N_FEATURES
+    assert model.fair_value("KELP") == state.mid + state.rls.predict(state.features)
+    model.reset("KELP")
+    assert model.fair_value("KELP") is None
+    assert model.fair_value("SQUID_INK") is None
+
+
+def test_features():
+    model = FairValueModel(["KELP"])
+    state = model.models["KELP"]
+    state.mid = 2001.0
+    state.ema = 2000.0
+    trades = [Trade("KELP", 2003, 4), Trade("KELP", 1999, 1), Trade("KELP", 2001, 7)]
+    x, mid = model.features(state, _book(2002, 2004, bid_volume=30, ask_volume=10), trades)
+    assert mid == 2003.0
+    bias, microprice, imbalance, move, reversion, flow = x
+    assert bias == 1.0
+    assert microprice == pytest.approx(0.5)
+    assert imbalance == pytest.approx(0.5)
+    assert move == 2.0
+    assert reversion == pytest.approx(2003.0 - (2000.0 + 0.1 * 3.0))
+    # Above the previous mid bought, below sold, at it neither
+    assert flow == (4 - 1) / TRADE_FLOW_SCALE
+
+
+def test_warm_start_is_fitted_offline(day_data):
+    X, y = feature_rows(day_data, "KELP")
+    assert X.shape == (len(y), N_FEATURES)
+    coefficients = fit(X, y)
+    # The offline fit beats quoting the mid, and warm-starting with it beats a cold start
+    assert np.mean((X @ coefficients - y) ** 2) < np.mean(y ** 2)
+    assert online_error(day_data, "KELP", coefficients.tolist()) < online_error(day_data, "KELP")
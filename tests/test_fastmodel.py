@@ -0,0 +1,43 @@
+import pytest
+
+import datamodel
+import fastmodel
+from bench import _fast_tick_state, _tick_state
+
+
+def _observations(model):
+    return model.Observation({"SUNLIGHT": 2500}, {"ORCHIDS": model.ConversionObservation(
+        1000.5, 1002.0, 1.5, 9.5, -5.0, 200.0, 2500.0)})
+
+
+def test_to_json_matches_datamodel(day_data):
+    official_listings = {product: datamodel.Listing(product, product, "SEASHELLS") for product in day_data.products}
+    fast_listings = {product: fastmodel.Listing(product, product, "SEASHELLS") for product in day_data.products}
+    official_observations = _observations(datamodel)
+    fast_observations = _observations(fastmodel)
+    for timestamp in day_data.timestamps[:300]:
+        official = _tick_state(datamodel, day_data, timestamp, official_listings, official_observations, "a\"bé")
+        fast = _fast_tick_state(day_data, timestamp, fast_listings, fast_observations, "a\"bé")
+        official.position = fast.position = {"SQUID_INK": -3, "KELP": 5}
+        trade = ("KELP", 2030, 2, "SUBMISSION", "", timestamp - 100)
+        official.own_trades = {"KELP": [datamodel.Trade(*trade)]}
+        fast.own_trades = {"KELP": [fastmodel.Trade(*trade)]}
+        assert fast.toJSON() == official.toJSON()
+
+
+# datamodel calls jsonpickle.encode without keys=, which newer jsonpickle warns about
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+def test_observation_str_matches_jsonpickle():
+    assert str(_observations(fastmodel)) == str(_observations(datamodel))
+
+
+def test_order_depth_over_copies_on_first_read():
+    buy_orders = {10: 5}
+    sell_orders = {11: -3}
+    depth = fastmodel.order_depth_over(buy_orders, sell_orders)
+    depth.buy_orders[9] = 1
+    depth.sell_orders.pop(11)
+    assert buy_orders == {10: 5} and sell_orders == {11: -3}
+    assert depth.buy_orders == {10: 5, 9: 1} and depth.sell_orders == {}
+    depth.buy_orders = {1: 1}
+    assert depth.buy_orders == {1: 1}
@@ -0,0 +1,79 @@
+import pytest
+
+from backtest import run_backtest
+from conftest import ALGORITHM
+from hyperband import Optimizer, Study
+from sweep import apply_config
+
+
+@pytest.fixture
+def optimizer(tmp_path):
+    return Optimizer(ALGORITHM, 1, [-2], Study(str(tmp_path / "study.jsonl")), workers=1, progress=False)
+
+
+def _fake_evaluate(optimizer, calls):
+    """
+    Scores every config by its "x" without backtesting, recording (configs, max_ticks) of every call.
+    """
+    def evaluate(configs, max_ticks):
+        calls.append((len(configs), max_ticks))
+        return [float(config["x"]) for config in configs]
+    optimizer.evaluate = evaluate
+
+
+def test_study_resumes_and_skips_cut_lines(tmp_path):
+    path = str(tmp_path / "study.jsonl")
+    study = Study(path)
+    study.record({"key": "a", "score": 1.0})
+    study.record({"key": "b", "score": 2.0})
+    study.close()
+    with open(path, "a") as f:
+        f.write('{"key": "c", "sco')
+    again = Study(path)
+    assert sorted(again.results) == ["a", "b"]
+    assert again.get("b")["score"] == 2.0
+    again.close()
+
+
+def test_budgets(optimizer):
+    assert optimizer.full_ticks == 10000
+    assert optimizer.budgets(370) == [370, 1110, 3330, 9990, None]
+    assert optimizer.budgets(5000) == [5000, None]
+    assert optimizer.budgets(None) == [None]
+
+
+def test_successive_halving_keeps_the_best_third(optimizer):
+    calls = []
+    _fake_evaluate(optimizer, calls)
+    results = optimizer.successive_halving([{"x": x} for x in (4, 8, 1, 9, 3, 7, 2, 6, 5)], 1110)
+    assert calls == [(9, 1110), (3, 3330), (1, 9990), (1, None)]
+    assert results == [(9.0, {"x": 9})]
+
+
+def test_hyperband_brackets(optimizer):
+    calls = []
+    _fake_evaluate(optimizer, calls)
+    space = {"x": (0, 1000)}
+    results = optimizer.hyperband(space, min_ticks=370)
+    brackets = [[]]
+    for count, ticks in calls:
+        brackets[-1].append((count, ticks))
+        if ticks is None:
+            brackets.append([])
+    # Five brackets, from 81 configs on 370 ticks to 5 configs on full days
+    assert [bracket[0] for bracket in brackets[:-1]] == [(81, 370), (34, 1110), (15, 3330), (8, 9990), (5, None)]
+    assert brackets[0] == [(81, 370), (27, 1110), (9, 3330), (3, 9990), (1, None)]
+    assert [score for score, _ in results] == sorted((score for score, _ in results), reverse=True)
+
+
+def test_evaluate_backtests_once(optimizer, trader_class, day_data):
+    configs = [{"ema_param.KELP": 0.08}, {}, {"ema_param.KELP": 0.08}]
+    with optimizer:
+        scores = optimizer.evaluate(configs, 300)
+        assert optimizer.evaluations == 2
+        assert optimizer.evaluate(configs, 300) == scores
+        assert optimizer.evaluations == 2
+    trader = trader_class()
+    apply_config(trader, configs[0])
+    assert scores[0] == scores[2] == run_backtest(trader, day_data, max_ticks=300).total_pnl
+    assert optimizer.ticks_run == 600
@@ -0,0 +1,85 @@
+import math
+import random
+
+import pytest
+
+from indicators import PriceIndicators
+
+
+class RescanIndicators:
+    """
+    The list based indicators trading.py used before PriceIndicators, rescanning the history on every call.
+    """
+
+    def __init__(self, rsi_window, pcr_window, volatility_window):
+        self.rsi_window = rsi_window
+        self.pcr_window = pcr_window
+        self.volatility_window = volatility_window
+        self.history = []
+
+    def append(self, timestamp, price):
+        self.history.append((timestamp, price))
+        self.history = self.history[-max(self.rsi_window, self.pcr_window):]
+
+    def rsi(self, timestamp, price):
+        price_old = None
+        for tick_timestamp, tick_price in self.history:
+            if tick_timestamp > timestamp - self.rsi_window:
+                break
+            price_old = tick_price
+        return None if price_old is None else (price - price_old) / price_old * 100
+
+    def pcr(self, timestamp):
+        prices = [price for tick_timestamp, price in self.history if tick_timestamp >= timestamp - self.pcr_window]
+        if len(prices) < 2:
+            return None
+        up_moves = sum(after > before for before, after in zip(prices, prices[1:]))
+        down_moves = sum(after < before for before, after in zip(prices, prices[1:]))
+        return 0.5 if up_moves + down_moves == 0 else up_moves / (up_moves + down_moves)
+
+    def volatility(self):
+        prices = [price for _, price in self.history[-self.volatility_window:]]
+        if len(prices) < 2:
+            return 0.0
+        changes = [abs(after - before) for before, after in zip(prices, prices[1:])]
+        mean = sum(changes) / len(changes)
+        return math.sqrt(sum((change - mean) ** 2 for change in changes) / len(changes))
+
+
+@pytest.mark.parametrize("windows", [(1, 1, 1), (50, 50, 50), (100, 250, 3), (1000, 50, 400), (50, 5000, 2)])
+def test_matches_rescanning_the_history(windows):
+    rng = random.Random(sum(windows))
+    indicators = PriceIndicators(*windows)
+    reference = RescanIndicators(*windows)
+    timestamp = 0
+    price = 2000.0
+    for _ in range(1500):
+        timestamp += rng.choice([50, 100, 100, 100, 200, 300])
+        price += rng.choice([-1, -0.5, 0, 0, 0.5, 1, 2.5])
+        assert indicators.volatility() == pytest.approx(reference.volatility(), rel=0, abs=1e-9)
+        indicators.append(timestamp, price)
+        reference.append(timestamp, price)
+        assert indicators.rsi(timestamp, price) == reference.rsi(timestamp, price)
+        assert indicators.pcr(timestamp) == reference.pcr(timestamp)
+        assert indicators.history() == reference.history
+
+
+def test_flat_window_after_moves_has_zero_volatility():
+    indicators = PriceIndicators(50, 50, 20)
+    for tick in range(200):
+        indicators.append(tick * 100, 2000.0 + (tick % 2) * 0.5 if tick < 100 else 2000.0)
+    assert indicators.volatility() == 0.0
+
+
+def test_history_keeps_the_larger_window():
+    indicators = PriceIndicators(30, 10, 50)
+    assert indicators.capacity == 30
+    assert indicators.volatility_window == 30
+    assert indicators.last_price() is None
+    for tick in range(100):
+        indicators.append(tick * 100, float(tick))
+    assert len(indicators) == 30
+    timestamps, prices = indicators.ordered()
+    assert timestamps == [tick * 100 for tick in range(70, 100)]
+    assert prices == [float(tick) for tick in range(70, 100)]
+    assert indicators.last_price() == 99.0
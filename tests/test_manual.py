@@ -0,0 +1,67 @@
+import importlib.util
+import itertools
+import os
+import random
+
+import pytest
+
+MANUAL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "round1", "manual.py")
+
+
+@pytest.fixture(scope="module")
+def manual():
+    spec = importlib.util.spec_from_file_location("manual", MANUAL)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _enumerate_cycles(matrix, start, max_hops):
+    """
+    Every cycle from start back to start with at most max_hops trades and no identity trade, by brute force.
+    """
+    n = len(matrix)
+    cycles = []
+    for hops in range(1, max_hops + 1):
+        for middle in itertools.product(range(n), repeat=hops - 1):
+            path = (start, *middle, start)
+            if any(source == target or matrix[source][target] <= 0 for source, target in zip(path, path[1:])):
+                continue
+            multiplier = 1.0
+            for source, target in zip(path, path[1:]):
+                multiplier *= matrix[source][target]
+            cycles.append((multiplier, path))
+    return sorted(cycles, reverse=True)
+
+
+def test_rate_matrix(manual):
+    currencies, matrix = manual.rate_matrix(manual.conversions)
+    assert currencies == ["nugget", "pizza", "shell", "snowball"]
+    assert matrix[currencies.index("snowball")][currencies.index("pizza")] == 1.45
+    assert all(matrix[i][i] == 1.0 for i in range(len(currencies)))
+
+
+def test_best_cycles_match_brute_force(manual):
+    currencies, matrix = manual.rate_matrix(manual.conversions)
+    shell = currencies.index("shell")
+    results = manual.best_cycles(matrix, shell, manual.max_hops, manual.top_n)
+    expected = _enumerate_cycles(matrix, shell, manual.max_hops)[:manual.top_n]
+    assert [multiplier for multiplier, _ in results] == pytest.approx([multiplier for multiplier, _ in expected])
+    assert results[0][1] == expected[0][1]
+    assert [currencies[i] for i in results[0][1]] == ["shell", "snowball", "nugget", "pizza", "snowball", "shell"]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_best_cycles_on_random_markets(manual, seed):
+    rng = random.Random(seed)
+    n = rng.randint(2, 5)
+    # Some markets missing (rate 0)
+    matrix = [[1.0 if i == j else (rng.uniform(0.3, 3.0) if rng.random() < 0.8 else 0.0) for j in range(n)]
+              for i in range(n)]
+    max_hops = rng.randint(1, 5)
+    top_n = rng.randint(1, 8)
+    results = manual.best_cycles(matrix, 0, max_hops, top_n)
+    expected = _enumerate_cycles(matrix, 0, max_hops)[:top_n]
+    assert [multiplier for multiplier, _ in results] == pytest.approx([multiplier for multiplier, _ in expected])
+    for multiplier, path in results:
+        assert path[0] == path[-1] == 0 and len(path) - 1 <= max_hops
@@ -0,0 +1,105 @@
+import pytest
+
+from datamodel import Order
+from fastmodel import OrderDepth, Trade
+from matching import AGGRESSIVE_ONLY, ALL, PROBABILISTIC, SUBMISSION, TRADE_THROUGH, MatchingEngine, exceeds_limit
+
+
+def _depth(buy_orders, sell_orders) -> OrderDepth:
+    return OrderDepth.of(dict(buy_orders), dict(sell_orders))
+
+
+def _fills(fills):
+    return [(fill.price, fill.quantity, fill.buyer == SUBMISSION) for fill in fills]
+
+
+def _trade(price, quantity):
+    return Trade("KELP", price, quantity, "A", "B", 100)
+
+
+BOOK = ({2000: 10, 1999: 5}, {2003: -4, 2004: -6})
+
+
+def test_crosses_every_level_up_to_the_price():
+    engine = MatchingEngine(AGGRESSIVE_ONLY)
+    fills = engine.match([Order("KELP", 2004, 8)], _depth(*BOOK), [], 100)
+    assert _fills(fills) == [(2003, 4, True), (2004, 4, True)]
+
+
+def test_taken_levels_are_consumed_for_later_orders():
+    engine = MatchingEngine(AGGRESSIVE_ONLY)
+    fills = engine.match([Order("KELP", 2000, -8), Order("KELP", 2000, -8)], _depth(*BOOK), [], 100)
+    assert _fills(fills) == [(2000, 8, False), (2000, 2, False)]
+
+
+@pytest.mark.parametrize("fill_model, expected", [
+    (AGGRESSIVE_ONLY, []),
+    (ALL, [(2001, 3, True), (2001, 2, True)]),
+    (TRADE_THROUGH, [(2001, 2, True)]),
+])
+def test_passive_fill_models(fill_model, expected):
+    # Resting bid at 2001: one trade at our price, one through it
+    trades = [_trade(2001, 3), _trade(2000, 2)]
+    fills = MatchingEngine(fill_model).match([Order("KELP", 2001, 10)], _depth(*BOOK), trades, 100)
+    assert _fills(fills) == expected
+
+
+def test_trades_above_a_resting_bid_do_not_fill_it():
+    fills = MatchingEngine(ALL).match([Order("KELP", 2001, 10)], _depth(*BOOK), [_trade(2002, 5)], 100)
+    assert fills == []
+
+
+def test_probabilistic_fills_at_our_price_with_the_given_probability():
+    filled = 0
+    engine = MatchingEngine(PROBABILISTIC, fill_probability=0.3, seed=1)
+    for _ in range(2000):
+        fills = engine.match([Order("KELP", 2001, 1)], _depth(*BOOK), [_trade(2001, 1)], 100)
+        filled += len(fills)
+    assert 0.25 < filled / 2000 < 0.35
+    # Trades through our price always fill
+    engine = MatchingEngine(PROBABILISTIC, fill_probability=0.0)
+    assert _fills(engine.match([Order("KELP", 2001, 1)], _depth(*BOOK), [_trade(2000, 1)], 100)) == \
+        [(2001, 1, True)]
+
+
+def test_matched_trade_volume_is_consumed():
+    trades = [_trade(2001, 3)]
+    engine = MatchingEngine(ALL)
+    fills = engine.match([Order("KELP", 2001, 2), Order("KELP", 2001, 2)], _depth(*BOOK), trades, 100)
+    assert _fills(fills) == [(2001, 2, True), (2001, 1, True)]
+    assert trades[0].quantity == 0
+
+
+def test_queue_position_waits_behind_the_displayed_volume():
+    # 10 lots displayed at 2000 ahead of us, a trade of 12 at 2000 leaves 2 for us
+    engine = MatchingEngine(ALL, queue_position=True)
+    trades = [_trade(2000, 12)]
+    fills = engine.match([Order("KELP", 2000, 5)], _depth(*BOOK), trades, 100)
+    assert _fills(fills) == [(2000, 2, True)]
+    assert trades[0].quantity == 0
+
+
+def test_queue_absorbed_volume_is_not_reused_by_a_second_order():
+    # The first order gets 1 of the 4 lots past the queue of 10, the queue of the second eats the other 3
+    engine = MatchingEngine(ALL, queue_position=True)
+    trades = [_trade(2000, 14)]
+    fills = engine.match([Order("KELP", 2000, 1), Order("KELP", 2000, 5)], _depth(*BOOK), trades, 100)
+    assert _fills(fills) == [(2000, 1, True)]
+    assert trades[0].quantity == 0
+
+
+def test_trades_through_the_price_skip_the_queue():
+    engine = MatchingEngine(ALL, queue_position=True)
+    fills = engine.match([Order("KELP", 2000, 5)], _depth(*BOOK), [_trade(1999, 3)], 100)
+    assert _fills(fills) == [(2000, 3, True)]
+
+
+def test_unknown_fill_model():
+    with pytest.raises(ValueError):
+        MatchingEngine("everything")
+
+
+def test_exceeds_limit():
+    assert not exceeds_limit([Order("KELP", 2000, 30), Order("KELP", 2003, -70)], 20, 50)
+    assert exceeds_limit([Order("KELP", 2000, 31)], 20, 50)
+    assert exceeds_limit([Order("KELP", 2003, -71)], 20, 50)
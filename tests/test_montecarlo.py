@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from backtest import DayData, run_backtest
+from montecarlo import LEVELS, ProductCalibration, _mid_path, calibrate, day_data, generate_day, summarize
+
+
+def _ou_day(day, level2, reversion, seed, ticks=5000):
+    """
+    A KELP day whose mid (in half ticks) reverts toward level2 at the given rate, with a one tick spread.
+    """
+    rng = np.random.default_rng(seed)
+    mid2 = level2
+    timestamps = [tick * 100 for tick in range(ticks)]
+    books = {}
+    for timestamp in timestamps:
+        bid = (mid2 - 2) // 2
+        books[timestamp] = {"KELP": ({bid: 10}, {mid2 - bid: -10}, mid2 / 2)}
+        mid2 += round(reversion * (mid2 - level2) + rng.normal(scale=2.0))
+    return DayData(1, day, ["KELP"], timestamps, books, {})
+
+
+@pytest.fixture(scope="module")
+def calibration(day_data):
+    return calibrate({-2: day_data})
+
+
+def test_calibrate_recovers_the_reversion():
+    fitted = calibrate({0: _ou_day(0, 4000, -0.1, 0), 1: _ou_day(1, 4100, -0.1, 1)}).products["KELP"]
+    assert fitted.reversion == pytest.approx(-0.1, abs=0.02)
+    assert fitted.start_mids.tolist() == [4000, 4100]
+    assert fitted.mean_mids == pytest.approx([4000, 4100], abs=5)
+
+
+def test_path_reverts_toward_the_day_mean():
+    # Starts 40 half ticks below the mean of its day and has no shocks
+    fitted = ProductCalibration("KELP", np.array([4000.0]), np.array([4040.0]), -0.2, np.zeros(200),
+                                {0: np.zeros((0, 4 * LEVELS)), 1: np.zeros((0, 4 * LEVELS))},
+                                np.zeros(1, dtype=np.int64), {0: np.zeros((0, 2)), 1: np.zeros((0, 2))})
+    path = _mid_path(fitted, np.random.default_rng(0), 100)
+    assert path[0] == 4000
+    assert abs(path[-1] - 4040) <= 2
+
+
+class _Flat:
+
+    def run(self, state):
+        return {}, 0, ""
+
+
+def test_generated_day_is_a_valid_market(calibration):
+    arrays = generate_day(calibration, np.random.default_rng([0, 1]), 2000)
+    again = generate_day(calibration, np.random.default_rng([0, 1]), 2000)
+    assert all(np.array_equal(arrays[name], again[name]) for name in arrays)
+
+    data = day_data(calibration, arrays, 7)
+    assert data.products == sorted(calibration.products) and len(data.timestamps) == 2000
+    for timestamp in data.timestamps[::50]:
+        for buy_orders, sell_orders, mid in data.books[timestamp].values():
+            if buy_orders and sell_orders:
+                assert max(buy_orders) < min(sell_orders)
+                assert mid == (max(buy_orders) + min(sell_orders)) / 2
+    assert np.all(np.diff(arrays["trade_tick"]) >= 0)
+    result = run_backtest(_Flat(), data)
+    assert result.ticks == 2000 and result.total_pnl == 0
+
+
+def test_summarize():
+    values = np.arange(-10.0, 90.0)
+    row = summarize(values, tail=0.1)
+    assert row["mean"] == pytest.approx(39.5)
+    assert row["loss_probability"] == pytest.approx(0.1)
+    assert row["var"] == pytest.approx(-np.quantile(values, 0.1))
+    assert row["expected_shortfall"] == pytest.approx(-values[values <= np.quantile(values, 0.1)].mean())
@@ -0,0 +1,78 @@
+from datamodel import Order
+from matching import exceeds_limit
+from orders import OrderSizer
+
+
+def _quotes(orders):
+    return [(order.price, order.quantity) for order in orders]
+
+
+def test_buys_clipped_best_price_first():
+    sizer = OrderSizer({"KELP": 50})
+    orders = [Order("KELP", 2000, 30), Order("KELP", 2002, 30)]
+    sized = sizer.size(orders, 10, 50)
+    assert _quotes(sized) == [(2002, 30), (2000, 10)]
+    assert sizer.clipped == 1
+    assert sizer.clipped_quantity == 20
+
+
+def test_sells_clipped_best_price_first():
+    sizer = OrderSizer({"KELP": 50})
+    orders = [Order("KELP", 2005, -40), Order("KELP", 2003, -40)]
+    assert _quotes(sizer.size(orders, -20, 50)) == [(2003, -30)]
+    assert sizer.clipped == 2
+    assert sizer.clipped_quantity == 50
+
+
+def test_full_limit_on_both_sides_is_kept():
+    sizer = OrderSizer({"KELP": 50})
+    orders = [Order("KELP", 1999, 70), Order("KELP", 2003, -30)]
+    sized = sizer.size(orders, -20, 50)
+    assert _quotes(sized) == [(1999, 70), (2003, -30)]
+    assert sized is orders
+    assert not exceeds_limit(sized, -20, 50)
+
+
+def test_same_price_orders_are_netted():
+    sizer = OrderSizer({"KELP": 50})
+    orders = [Order("KELP", 2000, 5), Order("KELP", 2000, 3), Order("KELP", 2001, 4), Order("KELP", 2001, -4)]
+    assert _quotes(sizer.size(orders, 0, 50)) == [(2000, 8)]
+    assert sizer.netted == 2
+
+
+def test_invalid_orders_dropped_and_zero_quantities_ignored():
+    sizer = OrderSizer({"KELP": 50})
+    orders = [Order("KELP", 2000, 0), Order("KELP", 2000.5, 1), Order("KELP", -1, 1), Order("KELP", 2000, 1.5),
+              Order("KELP", 2001.0, 2)]
+    sized = sizer.size(orders, 0, 50)
+    assert _quotes(sized) == [(2001, 2)]
+    assert type(sized[0].price) is int
+    assert sizer.invalid == 3
+
+
+def test_apply_never_sends_orders_over_the_limit():
+    sizer = OrderSizer({"KELP": 50, "SQUID_INK": 50})
+    positions = {"KELP": 45, "SQUID_INK": -50}
+    result = {
+        "KELP": [Order("KELP", 2000, 50), Order("KELP", 2004, -50)],
+        "SQUID_INK": [Order("SQUID_INK", 1900, 20), Order("SQUID_INK", 1905, -20)],
+        "UNLISTED": [Order("UNLISTED", 10, 500)],
+    }
+    sized = sizer.apply(result, positions)
+    for product in ("KELP", "SQUID_INK"):
+        assert not exceeds_limit(sized[product], positions[product], 50)
+    assert _quotes(sized["KELP"]) == [(2000, 5), (2004, -50)]
+    assert _quotes(sized["SQUID_INK"]) == [(1900, 20)]
+    assert sized["UNLISTED"] is result["UNLISTED"]
+
+
+def test_fits_only_orders_size_would_keep():
+    sizer = OrderSizer({"KELP": 50})
+    assert sizer.fits([Order("KELP", 2001, 10), Order("KELP", 2000, 5), Order("KELP", 2003, -20)], 0, 50)
+    # Worse bid first, a sell at a bid's price, a float price, over the limit
+    assert not sizer.fits([Order("KELP", 2000, 5), Order("KELP", 2001, 10)], 0, 50)
+    assert not sizer.fits([Order("KELP", 2001, 10), Order("KELP", 2001, -10)], 0, 50)
+    assert not sizer.fits([Order("KELP", 2001.0, 10)], 0, 50)
+    assert not sizer.fits([Order("KELP", 2001, 10)], 45, 50)
+    orders = [Order("KELP", 2000, 5), Order("KELP", 2001, 10)]
+    assert _quotes(sizer.size(orders, 0, 50)) == [(2001, 10), (2000, 5)]
@@ -0,0 +1,67 @@
+import pickle
+
+import pytest
+
+import shmserver
+from backtest import day_data_from_store, load_day, run_backtest, shared_day_data
+from shmserver import MarketDataServer, SharedBooks, SharedTrades, attach, block_name
+from test_tickstore import DAYS, _assert_same_day, _csv_day
+from tickstore import StoreDay, convert_round, day_store_path
+
+
+@pytest.fixture(scope="module")
+def csv_days():
+    convert_round(1)
+    return {day: _csv_day(day) for day in DAYS}
+
+
+@pytest.fixture
+def server():
+    with MarketDataServer([1]) as server:
+        yield server
+
+
+def test_block_name():
+    assert block_name(1, -2) == "prosperity_r1_dm2"
+    assert block_name(3, 0) == "prosperity_r3_d0"
+
+
+def test_shared_memory_round_trip(trader_class, csv_days):
+    assert attach(1, -2) is None
+    with MarketDataServer([1]) as server:
+        assert server.nbytes > 0
+        for day in DAYS:
+            shared = attach(1, day)
+            assert shared is not None and not shared.stale
+            data = shared_day_data(1, day)
+            assert isinstance(data.books, SharedBooks) and isinstance(data.trades, SharedTrades)
+            _assert_same_day(data, csv_days[day])
+            # Workers get the books and trades pickled as plain dicts
+            assert pickle.loads(pickle.dumps(data.books)) == csv_days[day].books
+            shared.close()
+
+        data = load_day(1, -2)
+        assert isinstance(data.books, SharedBooks)
+        loaded = run_backtest(trader_class(), data, max_ticks=1000)
+        stored = run_backtest(trader_class(), day_data_from_store(StoreDay(day_store_path(1, -2))), max_ticks=1000)
+        assert loaded.pnl == stored.pnl
+    assert attach(1, -2) is None
+    assert not isinstance(load_day(1, -2).books, SharedBooks)
+
+
+def test_order_depths_of_a_tick(server, csv_days):
+    shared = attach(1, -2)
+    timestamp = csv_days[-2].timestamps[123]
+    depths = shared.order_depths(timestamp)
+    assert {product: (depth.buy_orders, depth.sell_orders) for product, depth in depths.items()} == \
+        {product: (buy_orders, sell_orders) for product, (buy_orders, sell_orders, _)
+         in csv_days[-2].books[timestamp].items()}
+    # The views are read-only, a client cannot change the server's copy
+    with pytest.raises(ValueError):
+        shared.column("prices", "mid_price")[0] = 0.0
+    shared.close()
+
+
+def test_stale_block_is_ignored(server, monkeypatch):
+    monkeypatch.setattr(shmserver, "_source_stamp", lambda path: [0, 0])
+    assert attach(1, -2) is None
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from indicators import PriceIndicators
+from signals import BUY, HOLD, SELL, ema_series, indicator_series, signal_series
+
+
+def _mid_series(data, product):
+    timestamps = [timestamp for timestamp in data.timestamps if data.books[timestamp][product][2] is not None]
+    return np.array(timestamps, dtype=np.int64), np.array([data.books[timestamp][product][2]
+                                                           for timestamp in timestamps])
+
+
+@pytest.mark.parametrize("product", ["KELP", "SQUID_INK"])
+@pytest.mark.parametrize("windows", [(50, 50, 50), (100, 200, 20), (500, 50, 3)])
+def test_indicators_match_streaming(day_data, product, windows):
+    rsi_window, pcr_window, volatility_window = windows
+    timestamps, prices = _mid_series(day_data, product)
+    batch = indicator_series(timestamps, prices, 0.0451, rsi_window, pcr_window, volatility_window)
+
+    indicators = PriceIndicators(rsi_window, pcr_window, volatility_window)
+    rsi, pcr, volatility = [], [], []
+    for timestamp, price in zip(timestamps.tolist(), prices.tolist()):
+        indicators.append(timestamp, price)
+        value = indicators.rsi(timestamp, price)
+        rsi.append(np.nan if value is None else value)
+        value = indicators.pcr(timestamp)
+        pcr.append(np.nan if value is None else value)
+        volatility.append(indicators.volatility())
+
+    np.testing.assert_array_equal(np.array(rsi), batch["rsi"])
+    np.testing.assert_array_equal(np.array(pcr), batch["pcr"])
+    # Two-pass against rolling Welford updates: equal up to rounding, flat windows exactly 0 in both
+    volatility = np.array(volatility)
+    np.testing.assert_allclose(volatility, batch["volatility"], rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(volatility == 0, batch["volatility"] == 0)
+
+
+@pytest.mark.parametrize("alpha", [0.0115, 0.0451, 0.5])
+def test_ema_matches_update_ema_prices(day_data, alpha):
+    _, prices = _mid_series(day_data, "KELP")
+    ema = None
+    expected = []
+    for price in prices.tolist():
+        ema = price if ema is None else alpha * price + (1 - alpha) * ema
+        expected.append(ema)
+    np.testing.assert_array_equal(ema_series(prices, alpha), expected)
+    assert len(ema_series(np.empty(0), alpha)) == 0
+
+
+def test_signal_thresholds_and_missing_indicators():
+    rsi = np.array([20.0, 80.0, 20.0, np.nan, 50.0])
+    pcr = np.array([0.8, 0.2, 0.5, 0.8, np.nan])
+    assert signal_series(rsi, pcr).tolist() == [BUY, SELL, HOLD, HOLD, HOLD]
@@ -0,0 +1,121 @@
+import pytest
+
+from backtest import run_backtest
+from matching import PROBABILISTIC, MatchingEngine
+from snapshot import CHECKPOINT_EVERY, IndexedDay, TickIndex, checkpoint_key, lookback_ticks, snapshot
+
+
+class _Recorder:
+    """
+    Runs the wrapped trader and keeps the state it saw at one timestamp and the orders it sent there.
+    """
+
+    def __init__(self, trader, timestamp: int) -> None:
+        self.trader = trader
+        self.timestamp = timestamp
+        self.state = None
+        self.trader_data = None
+        self.orders = None
+
+    def run(self, state):
+        if state.timestamp != self.timestamp:
+            return self.trader.run(state)
+        self.state = state
+        self.trader_data = state.traderData
+        result = self.trader.run(state)
+        self.orders = result[0]
+        return result
+
+
+def _orders(orders):
+    return {product: [(order.price, order.quantity) for order in product_orders]
+            for product, product_orders in orders.items()}
+
+
+def _trades(trades):
+    return {product: [(trade.price, trade.quantity, trade.buyer, trade.seller) for trade in product_trades]
+            for product, product_trades in trades.items()}
+
+
+@pytest.fixture(scope="module")
+def index():
+    return TickIndex.load(1, -2)
+
+
+def test_index_covers_every_tick(index, day_data):
+    assert index.timestamps.tolist() == day_data.timestamps
+    assert index.tick(734500) == day_data.timestamps.index(734500)
+    with pytest.raises(KeyError):
+        index.tick(734550)
+
+
+def test_indexed_range_matches_loaded_day(index, day_data):
+    start = index.tick(500000)
+    indexed = list(IndexedDay(index, start, start + 100).ticks())
+    loaded = list(day_data.ticks())[start:start + 100]
+    assert [(timestamp, books) for timestamp, books, _ in indexed] == \
+        [(timestamp, books) for timestamp, books, _ in loaded]
+    assert [sorted((trade.symbol, trade.price, trade.quantity) for trade in trades) for _, _, trades in indexed] == \
+        [sorted((trade.symbol, trade.price, trade.quantity) for trade in trades) for _, _, trades in loaded]
+
+
+@pytest.mark.parametrize("timestamp", [0, 100, 734500])
+def test_snapshot_matches_replay_from_start(trader_class, day_data, index, timestamp):
+    recorder = _Recorder(trader_class(), timestamp)
+    run_backtest(recorder, day_data, max_ticks=day_data.timestamps.index(timestamp) + 1)
+    expected = recorder.state
+
+    snap = snapshot(trader_class, 1, -2, timestamp, index=index)
+    assert snap.exact
+    state = snap.state
+    assert state.timestamp == timestamp
+    assert state.position == expected.position
+    assert state.traderData == recorder.trader_data
+    assert _trades(state.own_trades) == _trades(expected.own_trades)
+    assert _trades(state.market_trades) == _trades(expected.market_trades)
+    assert {product: (depth.buy_orders, depth.sell_orders) for product, depth in state.order_depths.items()} == \
+        {product: (depth.buy_orders, depth.sell_orders) for product, depth in expected.order_depths.items()}
+    assert _orders(snap.run()[0]) == _orders(recorder.orders)
+
+
+def test_lookback_snapshot_is_an_approximation(trader_class, index):
+    trader = trader_class()
+    snap = snapshot(trader_class, 1, -2, 734500, lookback=lookback_ticks(trader), index=index)
+    assert not snap.exact
+    assert snap.replayed == lookback_ticks(trader) == 51
+    assert snap.state.position != snapshot(trader_class, 1, -2, 734500, index=index).state.position
+
+
+def test_resumed_backtest_matches_the_full_run(trader_class, day_data, index):
+    checkpoints = []
+    full = run_backtest(trader_class(), day_data, max_ticks=1000, checkpoint_every=300, checkpoints=checkpoints)
+    assert [checkpoint.tick for checkpoint in checkpoints] == [300, 600, 900]
+    resumed = run_backtest(trader_class(), IndexedDay(index, 600, 1000), resume=checkpoints[1])
+    assert resumed.ticks == 400
+    assert resumed.pnl == full.pnl
+    assert resumed.positions == full.positions
+
+
+def test_snapshot_resumes_from_a_checkpoint(trader_class, tmp_path):
+    first = snapshot(trader_class, 1, -2, 734500, index=TickIndex.load(1, -2, str(tmp_path)))
+    assert (first.start, first.replayed) == (0, 7345)
+    first_orders = _orders(first.run()[0])
+
+    # A fresh index reads the checkpoints the first replay left
+    index = TickIndex.load(1, -2, str(tmp_path))
+    checkpoints = index.checkpoints(checkpoint_key(trader_class))
+    assert sorted(checkpoints) == list(range(CHECKPOINT_EVERY, 7345, CHECKPOINT_EVERY))
+    snap = snapshot(trader_class, 1, -2, 734500, index=index)
+    assert snap.exact
+    assert (snap.start, snap.replayed) == (7300, 45)
+    assert snap.state.position == first.state.position
+    assert snap.state.traderData == first.state.traderData
+    assert _trades(snap.state.own_trades) == _trades(first.state.own_trades)
+    assert _trades(snap.state.market_trades) == _trades(first.state.market_trades)
+    assert _orders(snap.run()[0]) == first_orders
+    assert snap.elapsed < first.elapsed / 10
+
+
+def test_random_fills_are_not_checkpointed(trader_class):
+    assert checkpoint_key(trader_class, engine=MatchingEngine(PROBABILISTIC)) is None
+    assert checkpoint_key(trader_class) != checkpoint_key(trader_class, position_limits={"KELP": 20})
@@ -0,0 +1,74 @@
+import math
+import random
+
+import pytest
+
+from backtest import run_backtest
+from bench import _use_every_model, trader_state_dict, warm_trader
+from indicators import PriceIndicators
+from statecodec import _pack_history, _pack_indicators, pack_trader_state, unpack_trader_state
+
+
+@pytest.mark.parametrize("capacity", [1, 2, 50])
+def test_incremental_history_matches_full_pack(capacity):
+    rng = random.Random(capacity)
+    indicators = PriceIndicators(capacity, capacity, capacity)
+    timestamp = 0
+    price = 2000.0
+    for _ in range(400):
+        timestamp += rng.choice([100, 100, 100, 70000])
+        price += rng.choice([-1, -0.5, 0, 0.5, 1])
+        # Off the half tick grid, NaN and out of int16 range now and then force raw windows
+        indicators.append(timestamp, rng.choices([price, price + 0.3, math.nan, price + 40000],
+                                                 [0.94, 0.02, 0.02, 0.02])[0])
+        if rng.random() < 0.7:
+            assert _pack_indicators(indicators) == _pack_history(*indicators.ordered())
+
+
+def _squid_and_every_model(trader) -> None:
+    trader.enabled_strategies["SQUID_INK"] = True
+    _use_every_model(trader)
+
+
+@pytest.mark.parametrize("configure", [None, _use_every_model, _squid_and_every_model],
+                         ids=["as configured", "every model", "squid and every model"])
+def test_round_trip(trader_class, trading_module, configure):
+    products = trading_module.PRODUCTS
+    trader = warm_trader(trader_class, day=-2, ticks=500, configure=configure)
+    packed = pack_trader_state(trader, products)
+
+    fresh = trader_class()
+    if configure is not None:
+        configure(fresh)
+    assert unpack_trader_state(fresh, packed, products)
+    assert trader_state_dict(fresh, products) == trader_state_dict(trader, products)
+    assert pack_trader_state(fresh, products) == packed
+
+
+def test_fresh_trader_every_tick_trades_the_same(trader_class, day_data):
+    # The platform may hand every tick to a new instance, which then only has traderData to go on
+    class FreshEveryTick:
+        def run(self, state):
+            return trader_class().run(state)
+
+    kept = run_backtest(trader_class(), day_data, max_ticks=1000)
+    fresh = run_backtest(FreshEveryTick(), day_data, max_ticks=1000)
+    assert fresh.pnl == kept.pnl
+    assert [(fill.price, fill.quantity, fill.timestamp) for fill in fresh.fills] == \
+        [(fill.price, fill.quantity, fill.timestamp) for fill in kept.fills]
+
+
+def test_models_not_in_use_are_not_packed(trader_class, trading_module):
+    products = trading_module.PRODUCTS
+    trader = warm_trader(trader_class, day=-2, ticks=500)
+    everything = warm_trader(trader_class, day=-2, ticks=500, configure=_use_every_model)
+    assert len(pack_trader_state(trader, products)) < len(pack_trader_state(everything, products))
+
+
+@pytest.mark.parametrize("trader_data", ["", "not base64!", "AAAA", "BQ=="])
+def test_foreign_data_leaves_trader_untouched(trader_class, trading_module, trader_data):
+    products = trading_module.PRODUCTS
+    trader = warm_trader(trader_class, day=-2, ticks=200)
+    before = trader_state_dict(trader, products)
+    assert not unpack_trader_state(trader, trader_data, products)
+    assert trader_state_dict(trader, products) == before
@@ -0,0 +1,57 @@
+import pytest
+
+from backtest import run_backtest
+from stream import MarketStream, StreamedDay, stream_days
+
+
+def _ticks(ticks):
+    # The tick store groups a tick's trades by product, the CSVs interleave them; per product the order is kept
+    return [(timestamp, books, sorted(((trade.symbol, trade.price, trade.quantity, trade.buyer, trade.seller)
+                                       for trade in trades), key=lambda trade: trade[0]))
+            for timestamp, books, trades in ticks]
+
+
+def test_streamed_day_matches_loaded_day(day_data):
+    streamed = StreamedDay(1, -2)
+    assert streamed.products == day_data.products
+    assert _ticks(streamed.ticks(2000)) == _ticks(day_data.ticks(2000))
+
+
+@pytest.mark.parametrize("timestamp", [0, 100, 499900, 734550, 999900])
+def test_seek_matches_full_load(day_data, timestamp):
+    stream = MarketStream(stream_days([1], [-2, 0]), buffer_size=4096)
+    stream.seek(1, -2, timestamp)
+    start = next(i for i, tick_timestamp in enumerate(day_data.timestamps) if tick_timestamp >= timestamp)
+    ticks = stream.ticks()
+    expected = list(day_data.ticks())[start:start + 50]
+    got = [next(ticks)[2:] for _ in expected]
+    assert _ticks(got) == _ticks(expected)
+    # The rest of the stream moves on to the next day
+    first_of_next_day = next(tick for tick in ticks if tick[1] == 0)
+    assert first_of_next_day[2] == 0
+
+
+def test_streamed_backtest_matches_loaded_backtest(trader_class, day_data):
+    streamed = run_backtest(trader_class(), StreamedDay(1, -2), max_ticks=2000)
+    loaded = run_backtest(trader_class(), day_data, max_ticks=2000)
+    assert streamed.pnl == loaded.pnl
+    assert streamed.positions == loaded.positions
+
+
+def test_products_listed_after_the_first_tick(trader_class, tmp_path, monkeypatch):
+    import stream
+
+    with open(stream.prices_path(1, -2)) as f:
+        header, *rows = f.read().splitlines()
+    # KELP only starts being listed at the 11th tick
+    late = [row for row in rows if not (row.split(";")[2] == "KELP" and int(row.split(";")[1]) < 1000)]
+    path = tmp_path / "prices.csv"
+    path.write_text("\n".join([header, *late]) + "\n")
+    monkeypatch.setattr(stream, "prices_path", lambda round_num, day: str(path))
+
+    day = StreamedDay(1, -2)
+    assert "KELP" not in day.products
+    result = run_backtest(trader_class(), day, max_ticks=500)
+    assert day.products == ["KELP", "RAINFOREST_RESIN", "SQUID_INK"]
+    assert set(result.pnl) == {"KELP", "RAINFOREST_RESIN", "SQUID_INK"}
+    assert result.pnl["KELP"] != 0
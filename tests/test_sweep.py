@@ -0,0 +1,36 @@
+import pytest
+
+from sweep import DEFAULT_SPACE, apply_config, grid_configs, random_configs
+
+
+def test_default_space_only_sets_what_the_trader_has(trader_class):
+    trader = trader_class()
+    config = next(random_configs(DEFAULT_SPACE, 1, seed=0))
+    apply_config(trader, config)
+    for name, value in config.items():
+        attribute, _, key = name.partition(".")
+        assert (getattr(trader, attribute)[key] if key else getattr(trader, attribute)) == value
+
+
+def test_unknown_attribute_raises(trader_class):
+    with pytest.raises(AttributeError):
+        apply_config(trader_class(), {"spread_multipler": 2.0})
+
+
+def test_unknown_dotted_key_raises(trader_class):
+    trader = trader_class()
+    with pytest.raises(KeyError):
+        apply_config(trader, {"ema_param.PEARLS": 0.1})
+    assert "PEARLS" not in trader.ema_param
+
+
+def test_grid_covers_every_combination():
+    space = {"a": [1, 2], "b": [3, 4, 5]}
+    assert len({tuple(sorted(config.items())) for config in grid_configs(space)}) == 6
+
+
+def test_default_space_leaves_out_squid_while_disabled(trader_class):
+    assert not trader_class().enabled_strategies["SQUID_INK"]
+    squid_knobs = {"ema_param.SQUID_INK", "target_position", "position_penalty_factor", "base_spread",
+                   "volatility_baseline"}
+    assert not squid_knobs & set(DEFAULT_SPACE)
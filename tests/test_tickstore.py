@@ -0,0 +1,56 @@
+import pytest
+
+from backtest import DayData, day_data_from_store, load_day, read_prices, read_trades, run_backtest
+from tickstore import StoreDay, TickStore, convert_round, day_store_path, is_converted, prices_path, trades_path
+
+DAYS = (-2, 0)
+
+
+def _csv_day(day: int) -> DayData:
+    products, timestamps, books = read_prices(prices_path(1, day))
+    return DayData(1, day, products, timestamps, books, read_trades(trades_path(1, day)))
+
+
+def _trades(trades):
+    # Per timestamp, grouped by product: the store keeps the CSV order within a product
+    return {timestamp: sorted(((trade.symbol, trade.price, trade.quantity, trade.buyer, trade.seller, trade.timestamp)
+                               for trade in tick_trades), key=lambda trade: trade[0])
+            for timestamp, tick_trades in trades.items() if tick_trades}
+
+
+def _assert_same_day(data: DayData, expected: DayData) -> None:
+    assert data.products == expected.products
+    assert list(data.timestamps) == expected.timestamps
+    assert {timestamp: data.books[timestamp] for timestamp in expected.timestamps} == expected.books
+    assert _trades({timestamp: data.trades.get(timestamp, []) for timestamp in expected.timestamps}) == \
+        _trades({timestamp: expected.trades.get(timestamp, []) for timestamp in expected.timestamps})
+
+
+@pytest.fixture(scope="module")
+def csv_days():
+    convert_round(1)
+    return {day: _csv_day(day) for day in DAYS}
+
+
+@pytest.mark.parametrize("day", DAYS)
+def test_store_round_trip(csv_days, day):
+    assert is_converted(1, day)
+    _assert_same_day(day_data_from_store(StoreDay(day_store_path(1, day))), csv_days[day])
+
+
+def test_store_columns_per_product():
+    store = TickStore(1, convert=False)
+    assert store.days == list(DAYS)
+    store_day = store.day(-2)
+    for product in store_day.products:
+        columns = store_day.prices(product)
+        timestamps = columns["timestamp"]
+        assert (timestamps[1:] > timestamps[:-1]).all()
+        row = store_day.price_row(product, int(timestamps[10]))
+        assert store_day.column("prices", "mid_price")[row] == columns["mid_price"][10]
+    assert store_day.price_row("KELP", 50) == -1
+
+
+def test_store_backtest_matches_csv(trader_class, csv_days):
+    stored = run_backtest(trader_class(), load_day(1, -2), max_ticks=1000)
+    assert run_backtest(trader_class(), csv_days[-2], max_ticks=1000).pnl == stored.pnl
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from fastmodel import Trade
+from tradeflow import BUY, SELL, ProductFlow
+from tradeflow_series import SERIES, flow_series, streamed_series
+
+
+@pytest.mark.parametrize("product", ["KELP", "SQUID_INK", "RAINFOREST_RESIN"])
+@pytest.mark.parametrize("window", [1, 20, 100])
+def test_trade_flow_matches_batch_series(day_data, product, window):
+    batch = flow_series(day_data, product, window)
+    streamed = streamed_series(day_data, product, window)
+    for name in SERIES:
+        np.testing.assert_allclose(batch[name], streamed[name], rtol=1e-12, atol=1e-9, equal_nan=True,
+                                   err_msg=name)
+
+
+def test_classify_by_mid_then_tick_test():
+    flow = ProductFlow()
+    # No mid and no previous trade: no side
+    assert flow.classify(2000) == 0
+    flow.mid = 2000.5
+    assert flow.classify(2001) == BUY
+    assert flow.classify(2000) == SELL
+    # At the mid: the same price as the previous trade carries its side, a move decides
+    flow.mid = 2000.0
+    assert flow.classify(2000.0) == SELL
+    flow.mid = 2001.0
+    assert flow.classify(2001.0) == BUY
+    assert flow.classify(2001.0) == BUY
+
+
+def test_window_drops_old_ticks():
+    flow = ProductFlow(window=2)
+    flow.update([Trade("KELP", 2000, 4)], 2000.5)
+    # Unclassified (no mid yet), so in the volume but on neither side
+    assert flow.volume_sum == 4 and flow.vwap == 2000 and flow.imbalance == 0.0
+    flow.update([Trade("KELP", 2001, 2), Trade("KELP", 2000, 1)], 2000.5)
+    assert (flow.buy_volume, flow.sell_volume, flow.signed_volume) == (2, 1, 1)
+    assert flow.arrival_rate == 1.5
+    flow.update([], None)
+    # The first tick left the window, the mid of a one-sided book is not taken
+    assert flow.volume_sum == 3 and flow.mid == 2000.5
+    assert flow.vwap == pytest.approx((2001 * 2 + 2000) / 3)
+    assert flow.imbalance == pytest.approx(1 / 3)
+    flow.update([], 2001.0)
+    flow.update([], 2001.0)
+    assert (flow.volume_sum, flow.trade_count, flow.notional_sum, flow.arrival_rate) == (0, 0, 0.0, 0.0)
+    assert flow.vwap is None
@@ -0,0 +1,70 @@
+import pytest
+
+import walkforward
+from conftest import ALGORITHM
+from walkforward import EXPANDING, LEAVE_ONE_OUT, ROLLING, Cache, WalkForward, folds
+
+PARAMS = {"ema_alpha": 0.0451, "rsi_window": 50, "pcr_window": 50, "volatility_window": 50}
+
+
+def test_folds():
+    days = [0, -2, -1]
+    assert folds(days, ROLLING) == [([-2], -1), ([-1], 0)]
+    assert folds(days, ROLLING, train_days=2) == [([-2, -1], 0)]
+    assert folds(days, EXPANDING) == [([-2], -1), ([-2, -1], 0)]
+    assert folds(days, LEAVE_ONE_OUT) == [([-1, 0], -2), ([-2, 0], -1), ([-2, -1], 0)]
+    with pytest.raises(ValueError):
+        folds(days, "random")
+
+
+def test_indicators_cached_until_signals_change(day_data, tmp_path, monkeypatch):
+    signals = tmp_path / "signals.py"
+    signals.write_text("# v1\n")
+    monkeypatch.setattr(walkforward, "SIGNAL_SOURCES", [str(signals)])
+
+    cache = Cache(str(tmp_path / "cache"))
+    series = cache.indicators(day_data, "day", "KELP", PARAMS)
+    cached = Cache(str(tmp_path / "cache")).indicators(day_data, "day", "KELP", PARAMS)
+    assert sorted(cached) == sorted(series)
+    assert (cached["rsi"][50:] == series["rsi"][50:]).all()
+
+    signals.write_text("# v2\n")
+    edited = Cache(str(tmp_path / "cache"))
+    edited.indicators(day_data, "day", "KELP", PARAMS)
+    assert (edited.hits, edited.misses) == (0, 1)
+    assert len(list((tmp_path / "cache" / "indicators").iterdir())) == 2
+
+
+def test_day_cached_until_the_loader_changes(tmp_path, monkeypatch):
+    loader = tmp_path / "tickstore.py"
+    loader.write_text("# v1\n")
+    monkeypatch.setattr(walkforward, "DAY_SOURCES", [str(loader)])
+    monkeypatch.setattr(walkforward, "shared_day_data", lambda round_num, day: None)
+
+    Cache(str(tmp_path)).day(1, -2, "day")
+    cache = Cache(str(tmp_path))
+    data = cache.day(1, -2, "day")
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert data.day == -2
+
+    loader.write_text("# v2\n")
+    cache = Cache(str(tmp_path))
+    cache.day(1, -2, "day")
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+def test_rerun_only_reads_the_cache(tmp_path):
+    configs = [{"ema_param.KELP": 0.08}, {"RSI_WINDOW_TICKS": 200}]
+    first = WalkForward(ALGORITHM, 1, [-2, 0], Cache(str(tmp_path)), workers=1, max_ticks=300)
+    rows = first.run(configs)
+    # Three configs on the training day, then the picked one and the defaults (once if they are the same) on the test day
+    assert first.computed == 3 + (1 if rows[0]["config"] == {} else 2)
+    assert [(row["train_days"], row["test_day"]) for row in rows] == [([-2], 0)]
+    assert rows[0]["train_pnl"] >= rows[0]["train_pnl_default"]
+
+    again = WalkForward(ALGORITHM, 1, [-2, 0], Cache(str(tmp_path)), workers=1, max_ticks=300)
+    # The signal summaries hold NaN means, compare the rest
+    fields = ("config", "train_pnl", "train_pnl_default", "test_pnl", "test_pnl_default")
+    assert [[row[field] for field in fields] for row in again.run(configs)] == \
+        [[row[field] for field in fields] for row in rows]
+    assert again.computed == 0